@@ -0,0 +1,64 @@
+"""Sales analytics computed by the database.
+
+Every report is a single GROUP BY query: tickets are counted per session in a
+subquery that reads only the (session_id, seat) index, and sessions are then
+grouped by film, hall, day or genre together with hall capacity and price. No
+ticket or session rows are loaded into Python.
+"""
+from sqlalchemy import func, select
+
+from app.models import TicketModel, SessionModel, FilmModel, HallModel, session
+
+GROUPS = {
+    'film': (FilmModel.id.label('film_id'), FilmModel.name.label('film')),
+    'hall': (HallModel.id.label('hall_id'), HallModel.name.label('hall')),
+    'day': (func.date(SessionModel.started_at).label('day'),),
+    'genre': (FilmModel.genre.label('genre'),),
+}
+GROUP_MESSAGE = 'Please, choose "group_by" from: film, hall, day, genre.'
+
+
+def sales(group_by, film_id=None, date_from=None, date_to=None):
+    """
+        Number of sessions, sold tickets, occupancy (% of hall capacity) and revenue grouped by
+        film, hall, day or genre. Raises ValueError for unknown group_by.
+            Returns:
+                List of dictionaries, e.g. for group_by='genre':
+                [{"genre": "drama", "sessions": 12, "sold": 340, "capacity": 600, "occupancy": 56.67,
+                "revenue": 2550.0}]
+    """
+    if group_by not in GROUPS:
+        raise ValueError(GROUP_MESSAGE)
+    keys = GROUPS[group_by]
+    sold = select(TicketModel.session_id, func.count().label('sold')) \
+        .group_by(TicketModel.session_id).subquery()
+    sold_seats = func.coalesce(sold.c.sold, 0)
+    query = session.query(
+        *keys,
+        func.count(SessionModel.id).label('sessions'),
+        func.sum(sold_seats).label('sold'),
+        func.sum(func.coalesce(HallModel.capacity, 0)).label('capacity'),
+        func.sum(sold_seats * func.coalesce(SessionModel.price, 0)).label('revenue')) \
+        .select_from(SessionModel) \
+        .join(FilmModel, SessionModel.film_id == FilmModel.id) \
+        .outerjoin(HallModel, SessionModel.hall_id == HallModel.id) \
+        .outerjoin(sold, sold.c.session_id == SessionModel.id)
+    if film_id is not None:
+        query = query.filter(SessionModel.film_id == film_id)
+    if date_from is not None:
+        query = query.filter(SessionModel.started_at >= date_from)
+    if date_to is not None:
+        query = query.filter(SessionModel.started_at < date_to)
+    rows = query.group_by(*keys).order_by(*keys).all()
+
+    result = []
+    for row in rows:
+        item = row._asdict()
+        item['sold'] = int(item['sold'] or 0)
+        item['capacity'] = int(item['capacity'] or 0)
+        item['revenue'] = round(float(item['revenue'] or 0), 2)
+        item['occupancy'] = round(100 * item['sold'] / item['capacity'], 2) if item['capacity'] else 0
+        if group_by == 'day':
+            item['day'] = str(item['day'])
+        result.append(item)
+    return result
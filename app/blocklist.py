@@ -0,0 +1,150 @@
+"""Revoked JWT lookup served from memory.
+
+All revoked jti are kept in a set with a Bloom filter in front, so a token that was
+never revoked (almost every request) is answered without touching the set or the
+database. Every JWT_BLOCKLIST_SYNC_INTERVAL seconds one request re-reads all revoked
+tokens, which picks up tokens revoked by other processes, while the rest keep using
+the set in memory. Rows of expired tokens are purged by a background thread every
+JWT_BLOCKLIST_PURGE_INTERVAL seconds, so requests never write to the database.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+
+from app.config import Config
+from app.database.database import session
+from app.models import RevokedTokenModel
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter(object):
+    def __init__(self, capacity=10000, error_rate=0.01):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little')
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position // 8] |= 1 << (position % 8)
+
+    def __contains__(self, key):
+        return all(self._bits[position // 8] & (1 << (position % 8)) for position in self._positions(key))
+
+
+class RevokedTokens(object):
+    def __init__(self, sync_interval=30, purge_interval=3600):
+        self.sync_interval = sync_interval
+        self.purge_interval = purge_interval
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._jtis = set()
+        self._bloom = BloomFilter()
+        self._revoked_during_sync = None
+        self._synced_at = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def load(self):
+        """Purge expired rows and read all revoked tokens from DB"""
+        self.purge()
+        self._sync()
+
+    def start(self):
+        """Start background purge of expired rows, does nothing when purge_interval is 0 or it is already running"""
+        if self.purge_interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='revoked-tokens-purge', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def purge(self):
+        """Delete rows of tokens that can't be used anymore. Returns number of deleted rows"""
+        now = datetime.utcnow()
+        longest_lifetime = max(Config.JWT_ACCESS_TOKEN_EXPIRES, Config.JWT_REFRESH_TOKEN_EXPIRES)
+        return RevokedTokenModel.delete_expired(now, now - timedelta(seconds=longest_lifetime))
+
+    def revoke(self, jwt_payload):
+        """Save token as revoked in DB and in memory"""
+        RevokedTokenModel(jti=jwt_payload['jti'], expires_at=datetime.utcfromtimestamp(jwt_payload['exp'])).add()
+        with self._lock:
+            self._add(jwt_payload['jti'])
+
+    def is_revoked(self, jti):
+        """Check if token with selected jti was revoked"""
+        with self._lock:
+            now = time.monotonic()
+            sync = self._synced_at is None or now - self._synced_at >= self.sync_interval
+            if sync:
+                # other requests keep checking the current set while this one reads DB
+                self._synced_at = now
+        if sync:
+            self._sync(blocking=False)
+        with self._lock:
+            return jti in self._bloom and jti in self._jtis
+
+    def _add(self, jti):
+        self._jtis.add(jti)
+        if self._revoked_during_sync is not None:
+            self._revoked_during_sync.add(jti)
+        if len(self._jtis) > self._bloom.capacity:
+            self._bloom = self._build_bloom(self._jtis)
+        else:
+            self._bloom.add(jti)
+
+    @staticmethod
+    def _build_bloom(jtis):
+        bloom = BloomFilter(capacity=max(10000, 2 * len(jtis)))
+        for jti in jtis:
+            bloom.add(jti)
+        return bloom
+
+    def _sync(self, blocking=True):
+        """
+            Replace tokens in memory with all rows of DB. Unlike reading rows after the last seen id,
+            this doesn't miss rows whose ids were committed out of order
+        """
+        if not self._sync_lock.acquire(blocking=blocking):
+            return
+        try:
+            with self._lock:
+                self._revoked_during_sync = set()
+            jtis = set(RevokedTokenModel.find_jtis())
+            bloom = self._build_bloom(jtis)
+            with self._lock:
+                for jti in self._revoked_during_sync - jtis:
+                    jtis.add(jti)
+                    bloom.add(jti)
+                self._jtis, self._bloom = jtis, bloom
+                self._synced_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._revoked_during_sync = None
+            self._sync_lock.release()
+
+    def _run(self):
+        while not self._stopped.wait(self.purge_interval):
+            try:
+                self.purge()
+                self._sync()
+            except Exception:
+                logger.exception('Purge of revoked tokens failed')
+            finally:
+                session.remove()
+
+
+revoked_tokens = RevokedTokens(sync_interval=Config.JWT_BLOCKLIST_SYNC_INTERVAL,
+                               purge_interval=Config.JWT_BLOCKLIST_PURGE_INTERVAL)
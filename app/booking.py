@@ -0,0 +1,165 @@
+"""Ticket purchase engine shared by the JSON API and the website.
+
+A purchase runs in one transaction: the session row is locked (SQLite has no row
+locks, there the whole database is locked for writes up front), seats are checked
+against the seat map, one conditional update moves seats from ``number_seats`` to
+``sold_seats`` (only while enough seats are left) and writes the new seat map, and
+all tickets are inserted with one bulk insert. Seats held by other users (see
+app.holds) count as taken. The unique index on ``(session_id, seat)`` is the last
+line of defence against double-selling, and lock conflicts are retried.
+"""
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app.database.database import lock_for_write
+from app.holds import seat_holds, SeatHeldError
+from app.models import SessionModel, TicketModel, session
+from app.seat_map import SeatMap
+
+MAX_RETRIES = 3
+
+
+class BookingError(Exception):
+    """Base class for purchase failures"""
+
+
+class SessionNotFoundError(BookingError):
+    """Selected session doesn't exist"""
+
+
+class SoldOutError(BookingError):
+    """There are not enough seats left for the session"""
+
+
+class NoAdjacentSeatsError(BookingError):
+    """There is no block of free seats next to each other big enough for the group"""
+
+
+class InvalidSeatError(BookingError):
+    """Some of selected seats are not numbers of seats of the hall"""
+
+    def __init__(self, seats, capacity):
+        super().__init__(seats, capacity)
+        self.seats = seats
+        self.capacity = capacity
+
+
+class SeatTakenError(BookingError):
+    """Some of selected seats are already sold"""
+
+    def __init__(self, taken):
+        super().__init__(taken)
+        self.taken = taken
+
+
+def buy_seats(session_id, user_id, seats=None, count=None):
+    """
+        Buy tickets for selected seats of a session in a single transaction.
+        Instead of seats you can pass count, then the best block of count adjacent free seats is bought.
+        Retries when the database reports a lock conflict.
+            Returns:
+                List of (id, seat) rows of created tickets
+            Raises:
+                SessionNotFoundError, InvalidSeatError, SeatTakenError, SoldOutError, NoAdjacentSeatsError
+    """
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            return _buy_seats(session_id, user_id, seats, count)
+        except IntegrityError:
+            session.rollback()
+            seats_ = SessionModel.find_seats(session_id)
+            raise SeatTakenError(seats_[2].taken() if seats_ else [])
+        except OperationalError:
+            session.rollback()
+            if attempt == MAX_RETRIES:
+                raise
+        except BookingError:
+            session.rollback()
+            raise
+
+
+def _buy_seats(session_id, user_id, seats, count):
+    lock_for_write(session.connection())
+    found = SessionModel.find_seats(session_id, for_update=True)
+    if found is None:
+        raise SessionNotFoundError(session_id)
+
+    number_seats, sold_seats, seat_map = found
+    held = seat_holds.held_seats(session_id, user_id)
+    if seats is None:
+        if number_seats < count:
+            raise SoldOutError(session_id)
+        seats = _unavailable(session_id, user_id, seat_map).adjacent(count, number_seats + sold_seats)
+        if seats is None:
+            raise NoAdjacentSeatsError(session_id)
+    check_seats(seats, number_seats + sold_seats)
+    seats = sorted(set(seats))
+    if any(seat_map.is_taken(seat) or seat in held for seat in seats):
+        raise SeatTakenError(sorted(set(seat_map.taken()) | held))
+    if number_seats < len(seats):
+        raise SoldOutError(session_id)
+
+    for seat in seats:
+        seat_map.take(seat)
+    updated = session.query(SessionModel) \
+        .filter(SessionModel.id == session_id, SessionModel.number_seats >= len(seats)) \
+        .update({SessionModel.number_seats: SessionModel.number_seats - len(seats),
+                 SessionModel.sold_seats: func.coalesce(SessionModel.sold_seats, 0) + len(seats),
+                 SessionModel.seat_map: seat_map.to_bytes()}, synchronize_session=False)
+    if not updated:
+        raise SoldOutError(session_id)
+
+    tickets = TicketModel.__table__
+    session.execute(insert(tickets), [{"seat": seat, "user_id": user_id, "session_id": session_id} for seat in seats])
+    created = session.execute(select(tickets.c.id, tickets.c.seat)
+                              .where(tickets.c.session_id == session_id, tickets.c.seat.in_(seats))
+                              .order_by(tickets.c.seat)).all()
+    session.commit()
+    seat_holds.release_seats(session_id, seats)
+    return created
+
+
+def check_seats(seats, capacity):
+    """Raise InvalidSeatError unless every seat is an integer from 1 to capacity"""
+    invalid = [seat for seat in seats
+               if not isinstance(seat, int) or isinstance(seat, bool) or not 1 <= seat <= capacity]
+    if invalid:
+        raise InvalidSeatError(invalid, capacity)
+
+
+def _unavailable(session_id, user_id, seat_map):
+    unavailable = SeatMap(seat_map.to_bytes())
+    for seat in seat_holds.held_seats(session_id, user_id):
+        unavailable.take(seat)
+    return unavailable
+
+
+def hold_seats(session_id, user_id, seats=None, count=None):
+    """
+        Hold free seats of an upcoming session for user during checkout, see app.holds.
+        Instead of seats you can pass count, then the best block of count adjacent free seats is held.
+            Returns:
+                Hold
+            Raises:
+                SessionNotFoundError, InvalidSeatError, SeatTakenError, NoAdjacentSeatsError
+    """
+    found = SessionModel.find_seats(session_id, upcoming=True)
+    if found is None:
+        raise SessionNotFoundError(session_id)
+    number_seats, sold_seats, seat_map = found
+    capacity = number_seats + sold_seats
+
+    unavailable = _unavailable(session_id, user_id, seat_map)
+    if seats is None:
+        seats = unavailable.adjacent(count, capacity)
+        if seats is None:
+            raise NoAdjacentSeatsError(session_id)
+    else:
+        check_seats(seats, capacity)
+        if any(unavailable.is_taken(seat) for seat in seats):
+            raise SeatTakenError(unavailable.taken())
+
+    try:
+        return seat_holds.hold(session_id, user_id, seats)
+    except SeatHeldError as e:
+        raise SeatTakenError(e.held)
@@ -0,0 +1,89 @@
+"""In-process cache with LRU eviction and TTL, used for catalogue reads and rendered pages.
+
+Keys are tuples whose first element is a namespace ('films', 'halls', ...), so all
+entries of one model can be dropped at once after a write.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from app.config import Config
+
+
+class TTLCache(object):
+    def __init__(self, maxsize=128, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """Return cached value or default if it is missing or expired"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        """Store value, evicting the least recently used entry when cache is full"""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def follow_versions(self, versions):
+        """
+            Drop entries of namespaces whose version in {namespace: version} changed since the last call,
+            so writes of other processes are seen as soon as their version is read
+        """
+        with self._lock:
+            for namespace, version in versions.items():
+                if self._versions.get(namespace, version) != version:
+                    for key in [key for key in self._data if key[0] == namespace]:
+                        del self._data[key]
+                self._versions[namespace] = version
+
+    def invalidate(self, namespace=None):
+        """Drop all entries of namespace, or everything if namespace is not given"""
+        with self._lock:
+            if namespace is None:
+                self._data.clear()
+                return
+            for key in [key for key in self._data if key[0] == namespace]:
+                del self._data[key]
+
+
+catalogue_cache = TTLCache(maxsize=Config.CATALOGUE_CACHE_SIZE, ttl=Config.CATALOGUE_CACHE_TTL)
+
+
+def cached(namespace, cache=catalogue_cache):
+    """
+        Cache results of a model classmethod that returns dictionaries.
+        Calls with to_dict=False return ORM objects and are never cached.
+        Cached values are shared between callers and must not be modified.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(cls, *args, **kwargs):
+            if kwargs.get('to_dict') is False:
+                return func(cls, *args, **kwargs)
+            key = (namespace, func.__name__, args, tuple(sorted(kwargs.items())))
+            result = cache.get(key)
+            if result is None:
+                result = func(cls, *args, **kwargs)
+                cache.put(key, result)
+            return result
+        return wrapper
+    return decorator
@@ -1,23 +1,45 @@
 import flask_login
 from datetime import datetime
 
-from flask import Blueprint, render_template, redirect, url_for, flash
+from flask import Blueprint, render_template, redirect, url_for, flash, jsonify
+from markupsafe import Markup
 from flask_login import login_user, logout_user, login_required
 
-from app.models import UserModel, FilmModel, SessionModel, session, TicketModel
+from app.models import UserModel, FilmModel, SessionModel, TicketModel, ActorModel
+from app.cache import catalogue_cache
+from app.datatables import datatables_args, datatables_query, DATATABLES_ARGS_MESSAGE
+from app.config import Config
+from app.holds import seat_holds
+from app.http_cache import conditional
+from app.booking import buy_seats, hold_seats, BookingError, SeatTakenError, NoAdjacentSeatsError
 from .forms import RegisterForm, LoginForm, SeatForm
 
 cinema_bp = Blueprint('cinema', __name__)
 
+SCHEDULE_COLUMNS = {
+    'sess_id': SessionModel.id,
+    'started_at': SessionModel.started_at,
+    'hall_id': SessionModel.hall_id,
+    'name': FilmModel.name,
+    'genre': FilmModel.genre,
+    'director': FilmModel.director,
+    'number_seats': SessionModel.number_seats,
+}
+SCHEDULE_SEARCH = (FilmModel.name, FilmModel.genre, FilmModel.director)
+SCHEDULE_ORDER = (('started_at', 'asc'),)
+SCHEDULE_PAGE_LENGTH = 10
+
 
 @cinema_bp.route('/', methods=['GET', 'POST'])
 @cinema_bp.route('/home')
+@conditional('films', 'actors', per_user=True)
 def index():
     """Demonstrates films and give opportunity
         to buy a movie ticket."""
 
     result = FilmModel.return_all()
-    return render_template('index.html', title="Home page", result=result)
+    casts = ActorModel.find_by_film_ids([film['id'] for film in result])
+    return render_template('index.html', title="Home page", result=result, casts=casts)
 
 
 @cinema_bp.route('/schedule', methods=['GET', 'POST'])
@@ -25,21 +47,45 @@ def index():
 def schedule():
     """Demonstrates all available sessions and give opportunity
             to buy a ticket on some session. Only logged-in users can see this page.
-            Otherwise, user redirects for logination. """
-    sess = session.query(SessionModel, FilmModel).join(FilmModel, SessionModel.film_id == FilmModel.id)\
-        .filter(SessionModel.started_at >= datetime.now()).all()
-    sess_list = []
-    for sess_, film in sess:
-        sess_list.append({
-            'sess_id': sess_.id,
-            'started_at': sess_.started_at,
-            'hall_id': sess_.hall_id,
-            'number_seats': sess_.number_seats,
-            'name': film.name,
-            'genre': film.genre,
-            'director': film.director
-        })
-    return render_template('schedule.html', title="Sessions page", sess_list=sess_list)
+            Otherwise, user redirects for logination.
+            Only the first page of the table is rendered, once a minute, and cached until sessions or films change,
+            so available seats may be up to a minute old. Other pages are loaded from /schedule/data """
+    minute = datetime.now().replace(second=0, microsecond=0)
+    key = ('schedule', 'rows', minute)
+    cached_page = catalogue_cache.get(key)
+    if cached_page is None:
+        rows, total, _ = datatables_query(SessionModel.schedule_query(minute), SCHEDULE_COLUMNS, SCHEDULE_SEARCH,
+                                          SessionModel.id, length=SCHEDULE_PAGE_LENGTH, order=SCHEDULE_ORDER)
+        cached_page = (render_template('schedule_rows.html', sess_list=rows), total)
+        catalogue_cache.put(key, cached_page)
+    rows, total = cached_page
+    return render_template('schedule.html', title="Sessions page", rows=Markup(rows), total=total,
+                           page_length=SCHEDULE_PAGE_LENGTH)
+
+
+@cinema_bp.route('/schedule/data', methods=['GET'])
+@login_required
+def schedule_data():
+    """
+        Server-side processing of the schedule table: DataTables sends "draw", "start", "length", "search[value]"
+        and "order", one page of sessions is selected, searched and ordered by the database.
+            Example:
+                >> /schedule/data?draw=2&start=10&length=10&search[value]=dra&order[0][column]=1&order[0][dir]=asc
+                &columns[1][data]=started_at
+            Returns:
+                "draw": 2, "recordsTotal": 120, "recordsFiltered": 14, "data": [{"sess_id": 5, ...}, ...]
+        """
+    try:
+        args = datatables_args(SCHEDULE_COLUMNS, SCHEDULE_ORDER)
+    except ValueError:
+        return jsonify({"message": DATATABLES_ARGS_MESSAGE}), 400
+    minute = datetime.now().replace(second=0, microsecond=0)
+    rows, total, filtered = datatables_query(SessionModel.schedule_query(minute), SCHEDULE_COLUMNS, SCHEDULE_SEARCH,
+                                             SessionModel.id, args['start'], args['length'], args['search'],
+                                             args['order'])
+    data = [{name: str(getattr(row, name)) if name == 'started_at' else getattr(row, name) for name in SCHEDULE_COLUMNS}
+            for row in rows]
+    return jsonify({"draw": args['draw'], "recordsTotal": total, "recordsFiltered": filtered, "data": data})
 
 
 @cinema_bp.route("/schedule/<int:id_>", methods=["GET"])
@@ -53,7 +99,7 @@ def get_schedule(id_):
             Returns:
                 Sessions for film with selected id.
         """
-    schedules = SessionModel.find_by_film_id(id_, offset=0, limit=100)
+    schedules = SessionModel.find_by_film_id(id_, limit=100)
     return render_template('schedule_id.html', title="Sessions page", sess_list=schedules)
 
 
@@ -61,7 +107,9 @@ def get_schedule(id_):
 @login_required
 def buy_ticket(id_):
     """
-        Page to purchase a ticket. Only authorized user can buy ticket.
+        Page to purchase tickets. Only authorized user can buy ticket. User can choose several seats
+        or ask for a number of seats next to each other, all of them are bought at once. Seats can be held
+        for a few minutes before buying, so that nobody else buys them meanwhile.
             Args:
                 id_: id of session which film you want to watch.
             Returns:
@@ -69,32 +117,33 @@ def buy_ticket(id_):
         """
     film = FilmModel.find_by_session_id(id_)
 
-    blocked = session.query(TicketModel).filter(TicketModel.session_id == id_).all()
-    lst = []
-    lst_seats = []
-    for s in blocked:
-        lst.append(s.seat)
-    session_ = session.query(SessionModel).filter(SessionModel.id == id_).first()
-    count_seats = len(lst) + session_.number_seats
-    for i in range(1, count_seats + 1):
-        if i not in lst:
-            lst_seats.append(i)
-    available_seats = str(lst_seats)[1:-1]
+    number_seats, sold_seats, seat_map = SessionModel.find_seats(id_)
+    count_seats = number_seats + sold_seats
+    held = seat_holds.held_seats(id_, flask_login.current_user.id)
+    available_seats = str([seat for seat in seat_map.free(count_seats) if seat not in held])[1:-1]
     form = SeatForm()
     if form.validate_on_submit():
-        user_id = flask_login.current_user.id
-        if session_.number_seats > 0 and form.seat.data not in lst:
-            ticket = TicketModel(
-                seat=form.seat.data, user_id=user_id, session_id=id_)
-            ticket.save_to_db()
-            session_.number_seats -= 1
-            session_.save_to_db()
-            flash("Congratulations! You bought a ticket", category='success')
-            return redirect(url_for('cinema.index'))
-        if form.seat.data in lst:
+        seats = form.seat_numbers()
+        count = None if seats else form.count.data
+        try:
+            if form.hold.data:
+                hold = hold_seats(id_, flask_login.current_user.id, seats=seats or None, count=count)
+            else:
+                buy_seats(id_, flask_login.current_user.id, seats=seats or None, count=count)
+        except SeatTakenError:
             flash('Please, choose another seat.This place is already reserved', category='warning')
-        else:
+        except NoAdjacentSeatsError:
+            flash('Sorry, there are not enough free seats next to each other', category='warning')
+        except BookingError:
             flash('Error occurred. Maybe we have not available seat for this session', category='danger')
+        else:
+            if not form.hold.data:
+                flash("Congratulations! You bought your tickets", category='success')
+                return redirect(url_for('cinema.index'))
+            form.seats.data = str(sorted(hold.seats))[1:-1]
+            flash(f"Seats {form.seats.data} are yours for {Config.SEAT_HOLD_TTL // 60} minutes", category='success')
+    for err_msg in form.errors.values():
+        flash(f'There was an error with buying a ticket:{err_msg}', category='danger')
     return render_template('ticket.html', title='Purchase ticket', film=film, available_seats=available_seats,
                            form=form)
 
@@ -110,7 +159,7 @@ def get_my_tickets(id_):
             Returns:
                 Ticket purchase history
         """
-    tickets = TicketModel.find_by_user_id(id_, 0, 10)
+    tickets = TicketModel.find_by_user_id(id_, limit=10)
     return render_template('mytickets.html', title="Purchase history", tickets=tickets)
 
 
@@ -147,10 +196,9 @@ def register_page():
 def login_page():
     """Method for user to login using form."""
     form = LoginForm()
-    current_user = UserModel.find_by_username(form.username.data, to_dict=False)
     if form.validate_on_submit():
         attempted_user = UserModel.find_by_username(form.username.data, to_dict=False)
-        if attempted_user and UserModel.verify_hash(form.password.data, current_user.hashed_password):
+        if attempted_user and attempted_user.check_password(form.password.data):
             login_user(attempted_user)
             flash(f'Success! You are logged in as: {attempted_user.username}', category='success')
             return redirect(url_for('cinema.schedule'))
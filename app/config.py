@@ -13,5 +13,49 @@ class Config(object):
 
     JWT_ACCESS_TOKEN_EXPIRES = 3000  # seconds
     JWT_REFRESH_TOKEN_EXPIRES = 800_000
+    JWT_BLOCKLIST_SYNC_INTERVAL = int(os.environ.get('JWT_BLOCKLIST_SYNC_INTERVAL', 30))  # seconds
+    JWT_BLOCKLIST_PURGE_INTERVAL = int(os.environ.get('JWT_BLOCKLIST_PURGE_INTERVAL', 3600))  # seconds
     SQLALCHEMY_DATABASE_URI = (os.environ.get('SQLALCHEMY_DATABASE_URI')
                                or 'sqlite:///' + os.path.abspath("app/database/database.db"))
+    # connection pool, used for PostgreSQL only
+    SQLALCHEMY_POOL_SIZE = int(os.environ.get('SQLALCHEMY_POOL_SIZE', 5))
+    SQLALCHEMY_MAX_OVERFLOW = int(os.environ.get('SQLALCHEMY_MAX_OVERFLOW', 10))
+    SQLALCHEMY_POOL_TIMEOUT = int(os.environ.get('SQLALCHEMY_POOL_TIMEOUT', 30))  # seconds
+    SQLALCHEMY_POOL_RECYCLE = int(os.environ.get('SQLALCHEMY_POOL_RECYCLE', 1800))  # seconds
+
+    # in-process cache for films, halls and actors
+    CATALOGUE_CACHE_SIZE = int(os.environ.get('CATALOGUE_CACHE_SIZE', 256))
+    CATALOGUE_CACHE_TTL = int(os.environ.get('CATALOGUE_CACHE_TTL', 60))  # seconds
+
+    # password hashing pool
+    PASSWORD_HASH_ROUNDS = int(os.environ.get('PASSWORD_HASH_ROUNDS', 29000))
+    PASSWORD_HASH_POOL = os.environ.get('PASSWORD_HASH_POOL', 'thread')  # 'thread' or 'process'
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 2))
+    PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', 32))
+    PASSWORD_HASH_TIMEOUT = int(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))  # seconds
+
+    # keyset pagination of list endpoints
+    PAGE_LIMIT_DEFAULT = int(os.environ.get('PAGE_LIMIT_DEFAULT', 100))
+    PAGE_LIMIT_MAX = int(os.environ.get('PAGE_LIMIT_MAX', 1000))
+
+    # group booking
+    GROUP_BOOKING_MAX = int(os.environ.get('GROUP_BOOKING_MAX', 10))
+
+    # seat holds during checkout
+    SEAT_HOLD_TTL = int(os.environ.get('SEAT_HOLD_TTL', 300))  # seconds
+
+    # background fix of drifted seat counters, 0 disables it
+    OCCUPANCY_RECONCILE_INTERVAL = int(os.environ.get('OCCUPANCY_RECONCILE_INTERVAL', 300))  # seconds
+
+    # in-process search index
+    SEARCH_INDEX_REBUILD_INTERVAL = int(os.environ.get('SEARCH_INDEX_REBUILD_INTERVAL', 300))  # seconds
+
+    # bulk scheduling
+    BULK_SESSIONS_MAX = int(os.environ.get('BULK_SESSIONS_MAX', 2000))
+
+    # request and SQL metrics served by /metrics, 0 disables them
+    METRICS_ENABLED = int(os.environ.get('METRICS_ENABLED', 1))
+    SLOW_QUERY_THRESHOLD = int(os.environ.get('SLOW_QUERY_THRESHOLD', 500))  # milliseconds
+
+    # JSON encoding of responses
+    JSON_BACKEND = os.environ.get('JSON_BACKEND', 'auto')  # 'auto', 'orjson' or 'json'
@@ -1,11 +1,37 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from app.config import Config
+
+
+def engine_options(config):
+    """Connection options for selected database: SQLite or pooled PostgreSQL"""
+    if make_url(config.SQLALCHEMY_DATABASE_URI).get_backend_name() == 'sqlite':
+        return {'connect_args': {'check_same_thread': False}}
+    return {
+        'pool_size': config.SQLALCHEMY_POOL_SIZE,
+        'max_overflow': config.SQLALCHEMY_MAX_OVERFLOW,
+        'pool_timeout': config.SQLALCHEMY_POOL_TIMEOUT,
+        'pool_recycle': config.SQLALCHEMY_POOL_RECYCLE,
+        'pool_pre_ping': True,
+    }
+
+
+def lock_for_write(connection):
+    """
+        Take the write lock of SQLite at the start of a read-modify-write transaction. SQLite ignores
+        SELECT ... FOR UPDATE and the driver begins transactions at the first write, so rows read before it
+        could be changed by another connection meanwhile. Other databases lock rows with FOR UPDATE instead
+    """
+    if connection.dialect.name == 'sqlite' and not connection.connection.in_transaction:
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
 
-from app.main import Config
 
 db_string = Config.SQLALCHEMY_DATABASE_URI
-db = create_engine(db_string, connect_args={'check_same_thread': False})
+db = create_engine(db_string, **engine_options(Config))
 base = declarative_base()
-Session = sessionmaker(db)
-session = Session()
+# every thread (i.e. every request) gets its own session, removed on app context teardown
+Session = scoped_session(sessionmaker(db))
+session = Session
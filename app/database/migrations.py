@@ -0,0 +1,216 @@
+"""Schema migrations applied instead of a bare base.metadata.create_all.
+
+Migrations are plain functions taking a connection, registered in order with
+@migration. Applied versions are stored in the schema_version table, so every
+migration runs once per database. They also have to work on databases created by
+create_all before migrations existed, so they only add what is missing. Every
+process applies pending migrations on start, so upgrade takes a database lock and
+concurrent processes apply them one after another.
+"""
+import logging
+from datetime import datetime
+
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Integer, MetaData, String, Table, func, inspect, \
+    insert, select, text, update
+
+from app.database.database import lock_for_write
+from app.models import TicketModel, SessionModel, FilmModel, UserModel, RevokedTokenModel, film_actor, \
+    catalogue_versions
+
+schema_version = Table('schema_version', MetaData(),
+                       Column('version', Integer, primary_key=True),
+                       Column('name', String(100), nullable=False),
+                       Column('applied_at', DateTime, default=datetime.utcnow))
+
+MIGRATIONS = []
+# key of the PostgreSQL advisory lock held while migrations are applied
+LOCK_KEY = 7203481
+
+logger = logging.getLogger(__name__)
+
+
+def migration(func):
+    """Register function as the next schema migration"""
+    MIGRATIONS.append(func)
+    return func
+
+
+def add_column(connection, table, column):
+    """Add column to existing table if it isn't there yet"""
+    if column.name in {c['name'] for c in inspect(connection).get_columns(table.name)}:
+        return
+    column_type = column.type.compile(dialect=connection.dialect)
+    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+
+def create_indexes(connection, table):
+    """
+        Create indexes declared on table that don't exist yet.
+        Indexes on columns added by later migrations are left for those migrations
+    """
+    columns = {c['name'] for c in inspect(connection).get_columns(table.name)}
+    existing = {index['name'] for index in inspect(connection).get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name in existing or not all(column.name in columns for column in index.columns):
+            continue
+        names = [column.name for column in index.columns]
+        found = index.unique and duplicates(connection, table, names)
+        if found:
+            # a unique index can't be built until duplicates are resolved by hand, lookups still need an index
+            logger.warning('Table %s has %s rows with duplicated (%s), for example %s. Created %s as non-unique index, '
+                           'remove duplicates and recreate it as unique', table.name, len(found), ', '.join(names),
+                           found[:10], index.name)
+            connection.execute(text(f'CREATE INDEX {index.name} ON {table.name} ({", ".join(names)})'))
+        else:
+            index.create(connection)
+
+
+def duplicates(connection, table, names):
+    """Values of columns with selected names that more than one row of table has"""
+    columns = [table.c[name] for name in names]
+    rows = connection.execute(select(*columns).group_by(*columns).having(func.count() > 1)).all()
+    return [tuple(row) for row in rows]
+
+
+def lock(connection):
+    """Block other processes that apply migrations until the transaction of connection ends"""
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': LOCK_KEY})
+    else:
+        lock_for_write(connection)
+
+
+def current_version(connection):
+    """Number of the last applied migration, 0 for a new database"""
+    schema_version.create(connection, checkfirst=True)
+    return connection.execute(select(schema_version.c.version).order_by(schema_version.c.version.desc())).scalar() or 0
+
+
+def upgrade(engine):
+    """Apply all pending migrations in one locked transaction. Returns names of applied migrations"""
+    applied = []
+    with engine.begin() as connection:
+        lock(connection)
+        version = current_version(connection)
+        for number, step in enumerate(MIGRATIONS, start=1):
+            if number <= version:
+                continue
+            step(connection)
+            connection.execute(insert(schema_version).values(version=number, name=step.__name__))
+            applied.append(step.__name__)
+    return applied
+
+
+@migration
+def initial_schema(connection):
+    """
+        Tables as base.metadata.create_all created them before migrations existed.
+        They are frozen here, columns and indexes added to models later are created by the migrations below
+    """
+    metadata = MetaData()
+    Table('users', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('name', String(30), nullable=False),
+          Column('age', Integer, nullable=False),
+          Column('username', String(30), nullable=False),
+          Column('email', String(30), nullable=False),
+          Column('hashed_password', String(50), nullable=False),
+          Column('is_admin', Boolean()))
+    Table('halls', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('name', String(30), nullable=False),
+          Column('capacity', Integer, nullable=False))
+    Table('films', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('name', String(30), nullable=False),
+          Column('genre', String(30), nullable=False),
+          Column('director', String(30), nullable=False),
+          Column('image', String(200), nullable=False),
+          Column('rating', Float, nullable=False))
+    Table('actors', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('name', String(30), nullable=False),
+          Column('surname', String(30), nullable=False))
+    Table('association', metadata,
+          Column('films_id', Integer, ForeignKey('films.id'), primary_key=True),
+          Column('actors_id', Integer, ForeignKey('actors.id'), primary_key=True))
+    Table('sessions', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('started_at', DateTime()),
+          Column('number_seats', Integer),
+          Column('hall_id', Integer, ForeignKey('halls.id')),
+          Column('film_id', Integer, ForeignKey('films.id')))
+    Table('tickets', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('seat', Integer, nullable=False),
+          Column('user_id', Integer, ForeignKey('users.id')),
+          Column('session_id', Integer, ForeignKey('sessions.id')))
+    Table('revoked_tokens', metadata,
+          Column('id_', Integer, primary_key=True),
+          Column('jti', String(120)),
+          Column('blacklisted_on', DateTime))
+    metadata.create_all(connection)
+
+
+@migration
+def session_seat_map(connection):
+    """Seat occupancy bitmap per session"""
+    add_column(connection, SessionModel.__table__, SessionModel.__table__.c.seat_map)
+
+
+@migration
+def hot_lookup_indexes(connection):
+    """Indexes and unique constraints for columns used in lookups and joins"""
+    for model in (TicketModel, SessionModel, FilmModel, UserModel, RevokedTokenModel):
+        create_indexes(connection, model.__table__)
+
+
+@migration
+def revoked_token_expiry(connection):
+    """Expiry time of revoked tokens, used to purge them"""
+    add_column(connection, RevokedTokenModel.__table__, RevokedTokenModel.__table__.c.expires_at)
+    create_indexes(connection, RevokedTokenModel.__table__)
+
+
+@migration
+def film_duration(connection):
+    """Film duration in minutes, used to find overlapping sessions"""
+    films = FilmModel.__table__
+    add_column(connection, films, films.c.duration)
+    connection.execute(update(films).where(films.c.duration.is_(None)).values(duration=120))
+    create_indexes(connection, films)
+
+
+@migration
+def session_price(connection):
+    """Ticket price of a session, used for revenue analytics"""
+    sessions = SessionModel.__table__
+    add_column(connection, sessions, sessions.c.price)
+    connection.execute(update(sessions).where(sessions.c.price.is_(None)).values(price=0))
+
+
+@migration
+def session_sold_seats(connection):
+    """Counter of sold seats per session, filled from tickets. number_seats already counts seats left"""
+    sessions, tickets = SessionModel.__table__, TicketModel.__table__
+    add_column(connection, sessions, sessions.c.sold_seats)
+    sold = select(func.count()).where(tickets.c.session_id == sessions.c.id).scalar_subquery()
+    connection.execute(update(sessions).values(sold_seats=sold))
+
+
+@migration
+def cast_indexes(connection):
+    """Index for films of an actor, casts of a film use the primary key of the association table"""
+    create_indexes(connection, film_actor)
+
+
+@migration
+def catalogue_versions_table(connection):
+    """Versions of films, halls and actors for conditional GET. Their rows are created here, writes only update them"""
+    catalogue_versions.create(connection, checkfirst=True)
+    existing = set(connection.execute(select(catalogue_versions.c.namespace)).scalars())
+    now = datetime.utcnow().replace(microsecond=0)
+    rows = [{'namespace': namespace, 'version': 0, 'updated_at': now}
+            for namespace in ('films', 'halls', 'actors') if namespace not in existing]
+    if rows:
+        connection.execute(insert(catalogue_versions), rows)
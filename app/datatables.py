@@ -0,0 +1,72 @@
+"""Server-side processing for DataTables tables.
+
+DataTables sends "draw", "start", "length", "search[value]" and "order[i][column]"
+/"order[i][dir]" with "columns[i][data]" naming the ordered column. They are turned
+into one SQL query: search is a case-insensitive prefix match on the searchable
+columns, ordering is allowed only on whitelisted columns, and the number of
+matching rows and of all rows are selected together with the page by a window
+count and a scalar subquery.
+"""
+from flask import request
+from sqlalchemy import func, or_
+
+from app.config import Config
+
+DATATABLES_ARGS_MESSAGE = '"draw", "start", "length" and "order" should be integers.'
+
+
+def datatables_args(columns, default_order=()):
+    """
+        Read DataTables request from query string. columns is the list of names of orderable columns.
+        Returns dict with draw, start, length, search and order (list of (name, 'asc'|'desc')),
+        raises ValueError for malformed values
+    """
+    args = request.args
+    start = int(args.get('start', 0))
+    length = int(args.get('length', 10))
+    if start < 0:
+        raise ValueError(DATATABLES_ARGS_MESSAGE)
+    if length < 1 or length > Config.PAGE_LIMIT_MAX:
+        length = Config.PAGE_LIMIT_MAX
+
+    order = []
+    i = 0
+    while f'order[{i}][column]' in args:
+        name = args.get(f'columns[{int(args[f"order[{i}][column]"])}][data]')
+        direction = 'desc' if args.get(f'order[{i}][dir]') == 'desc' else 'asc'
+        if name in columns:
+            order.append((name, direction))
+        i += 1
+
+    return {
+        'draw': int(args.get('draw', 0)),
+        'start': start,
+        'length': length,
+        'search': args.get('search[value]', '').strip(),
+        'order': order or list(default_order),
+    }
+
+
+def datatables_query(query, columns, searchable, key, start=0, length=10, search='', order=()):
+    """
+        Select one page of query for DataTables.
+            Args:
+                query: query selecting labeled columns
+                columns: dict of orderable column name -> column expression
+                searchable: column expressions matched against search
+                key: unique column added to ordering so that pages are stable
+            Returns:
+                tuple (rows, records_total, records_filtered)
+    """
+    total = query.with_entities(func.count()).order_by(None).correlate(None).scalar_subquery()
+    if search:
+        pattern = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        query = query.filter(or_(*(column.ilike(pattern, escape='\\') for column in searchable)))
+    ordering = [columns[name].desc() if direction == 'desc' else columns[name].asc() for name, direction in order]
+    rows = query.add_columns(func.count().over().label('records_filtered'), total.label('records_total')) \
+        .order_by(*ordering, key).offset(start).limit(length).all()
+    if rows:
+        return rows, rows[0].records_total, rows[0].records_filtered
+    # page after the last one, counts can't be read from rows
+    records_total = query.session.query(total).scalar()
+    return rows, records_total, query.order_by(None).count() if start else 0
@@ -0,0 +1,72 @@
+"""JSON encoding of responses.
+
+Dates and times are written as ISO 8601 ("2022-06-01T10:00:00") instead of Flask's
+RFC 822 strings. When orjson is installed it encodes responses, which is several
+times faster than the json module on large lists; anything it can't encode falls
+back to the json module with the same output. JSON_BACKEND selects "orjson",
+"json" or "auto" (orjson if installed). Large result sets are streamed as a JSON
+array in chunks instead of being built as one string.
+"""
+from datetime import date, datetime, time
+
+from flask import json
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+BACKENDS = ('auto', 'orjson', 'json')
+BATCH_SIZE = 1000
+
+
+class JSONEncoder(json.JSONEncoder):
+    def default(self, o):
+        if isinstance(o, (datetime, date, time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class OrjsonEncoder(JSONEncoder):
+    def encode(self, o):
+        if self.indent not in (None, 2):
+            return super().encode(o)
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self.indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(o, default=self.default, option=option).decode()
+        except orjson.JSONEncodeError:
+            return super().encode(o)
+
+
+def encoder_class(backend='auto'):
+    """
+        Encoder for app.json_encoder.
+        Raises ValueError for unknown backend or "orjson" when it isn't installed
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f'JSON_BACKEND should be one of {", ".join(BACKENDS)}, not {backend!r}')
+    if backend == 'orjson' and orjson is None:
+        raise ValueError('JSON_BACKEND is "orjson", but orjson is not installed')
+    if backend != 'json' and orjson is not None:
+        return OrjsonEncoder
+    return JSONEncoder
+
+
+def json_array_chunks(items, encode, batch_size=BATCH_SIZE):
+    """Encode items as one JSON array, yielding it in chunks of batch_size items"""
+    yield '['
+    batch = []
+    separator = ''
+    for item in items:
+        batch.append(encode(item))
+        if len(batch) == batch_size:
+            yield separator + ','.join(batch)
+            separator = ','
+            batch = []
+    if batch:
+        yield separator + ','.join(batch)
+    yield ']\n'
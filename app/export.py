@@ -0,0 +1,84 @@
+"""Streaming NDJSON, CSV and JSON array export of large tables.
+
+Rows are read with yield_per (a server-side cursor on PostgreSQL) as plain column
+tuples and written to the response in chunks, so memory stays flat however many
+rows are exported. NDJSON and CSV can also be requested with the Accept header,
+a JSON array only with ?format=json, as plain application/json stays a regular page.
+"""
+import csv
+import io
+
+from flask import Response, current_app, request, stream_with_context
+
+from app.encoding import json_array_chunks
+from app.models import projection
+
+FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv', 'json': 'application/json'}
+ACCEPTED_FORMATS = ('ndjson', 'csv')
+FORMAT_MESSAGE = 'Please, choose "ndjson", "csv" or "json" format.'
+BATCH_SIZE = 1000
+
+
+def export_format():
+    """
+        Export format requested with ?format= or Accept header.
+        Returns "ndjson", "csv" or None for a regular JSON response, raises ValueError for unknown format
+    """
+    fmt = request.args.get('format')
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(FORMAT_MESSAGE)
+        return fmt
+    accepted = set(request.accept_mimetypes.values())
+    for fmt in ACCEPTED_FORMATS:
+        if FORMATS[fmt] in accepted:
+            return fmt
+    return None
+
+
+def _encoder():
+    return current_app.json_encoder(separators=(',', ':'), sort_keys=current_app.config['JSON_SORT_KEYS'])
+
+
+def _ndjson_chunks(rows, to_dict):
+    encode = _encoder().encode
+    lines = []
+    for row in rows:
+        lines.append(encode(to_dict(row)))
+        if len(lines) == BATCH_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def _csv_chunks(rows, to_dict, fields):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    for number, row in enumerate(rows, start=1):
+        writer.writerow(to_dict(row))
+        if number % BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_export(query, model, fmt, name):
+    """
+        Stream all rows of query in selected format.
+        Only columns used by model.to_dict are selected, rows are not loaded as ORM objects
+    """
+    columns = projection(model)
+    fields = [column.key for column in columns]
+    rows = query.with_entities(*columns).yield_per(BATCH_SIZE)
+    if fmt == 'csv':
+        chunks = _csv_chunks(rows, model.to_dict, fields)
+    elif fmt == 'json':
+        encode = _encoder().encode
+        chunks = json_array_chunks((model.to_dict(row) for row in rows), encode, BATCH_SIZE)
+    else:
+        chunks = _ndjson_chunks(rows, model.to_dict)
+    return Response(stream_with_context(chunks), mimetype=FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename={name}.{fmt}'})
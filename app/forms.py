@@ -1,6 +1,8 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, IntegerField, SubmitField, BooleanField
-from wtforms.validators import Length, EqualTo, DataRequired, ValidationError
+from wtforms.validators import Length, EqualTo, DataRequired, ValidationError, Optional, NumberRange
+
+from .config import Config
 
 from .models import UserModel
 
@@ -36,6 +38,24 @@ class LoginForm(FlaskForm):
 
 
 class SeatForm(FlaskForm):
-    """Form to reserve a seat"""
-    seat = IntegerField(label='Your seat:', validators=[DataRequired()])
+    """Form to reserve one or several seats: list of seats or number of seats next to each other"""
+
+    def validate_seats(self, seats_to_check):
+        if not seats_to_check.data and not self.count.data:
+            raise ValidationError('Please, choose seats or how many seats you need')
+        try:
+            seats = self.seat_numbers()
+        except ValueError:
+            raise ValidationError('Seats should be numbers separated by commas')
+        if len(seats) > Config.GROUP_BOOKING_MAX or any(seat < 1 for seat in seats):
+            raise ValidationError(f'You can buy from 1 to {Config.GROUP_BOOKING_MAX} seats at once')
+
+    def seat_numbers(self):
+        """Seats entered as "5, 6, 7" """
+        return [int(seat) for seat in (self.seats.data or '').replace(' ', '').split(',') if seat]
+
+    seats = StringField(label='Your seats:')
+    count = IntegerField(label='Or how many seats next to each other:',
+                         validators=[Optional(), NumberRange(min=1, max=Config.GROUP_BOOKING_MAX)])
+    hold = SubmitField(label=f'Hold for {Config.SEAT_HOLD_TTL // 60} minutes')
     submit = SubmitField(label='Buy')
@@ -0,0 +1,85 @@
+"""Password hashing executed in a bounded worker pool.
+
+pbkdf2 is CPU bound, so a burst of logins could occupy every request thread. Hashes
+are computed by a fixed number of thread or process workers instead, and when too
+many requests are already waiting for a worker new ones fail fast with
+HashingOverloadedError, which the app turns into 503.
+"""
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+
+from passlib.hash import pbkdf2_sha256
+
+from app.config import Config
+
+
+class HashingOverloadedError(Exception):
+    """Too many passwords are waiting to be hashed"""
+
+
+def _hash(password, rounds):
+    return pbkdf2_sha256.using(rounds=rounds).hash(password)
+
+
+def _verify(password, hash_, rounds):
+    if not pbkdf2_sha256.verify(password, hash_):
+        return False, None
+    if pbkdf2_sha256.using(rounds=rounds).needs_update(hash_):
+        return True, _hash(password, rounds)
+    return True, None
+
+
+class PasswordHasher(object):
+    def __init__(self, rounds=29000, workers=4, queue_limit=32, pool='thread', timeout=10):
+        self.rounds = rounds
+        self.workers = workers
+        self.pool = pool
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                executor_class = ProcessPoolExecutor if self.pool == 'process' else ThreadPoolExecutor
+                self._executor = executor_class(max_workers=self.workers)
+            return self._executor
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingOverloadedError()
+        try:
+            future = self._get_executor().submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # the slot is given back when the work is finished or cancelled, not when the caller stops waiting
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise HashingOverloadedError()
+
+    def hash_password(self, password):
+        """Hash password with configured number of rounds"""
+        return self._run(_hash, password, self.rounds)
+
+    def verify(self, password, hash_):
+        """Check password against hash"""
+        return self._run(_verify, password, hash_, self.rounds)[0]
+
+    def verify_and_update(self, password, hash_):
+        """
+            Check password against hash.
+            Returns tuple (is_valid, new_hash), new_hash is not None when hash was made with other rounds
+        """
+        return self._run(_verify, password, hash_, self.rounds)
+
+
+password_hasher = PasswordHasher(rounds=Config.PASSWORD_HASH_ROUNDS,
+                                 workers=Config.PASSWORD_HASH_WORKERS,
+                                 queue_limit=Config.PASSWORD_HASH_QUEUE_LIMIT,
+                                 pool=Config.PASSWORD_HASH_POOL,
+                                 timeout=Config.PASSWORD_HASH_TIMEOUT)
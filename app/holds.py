@@ -0,0 +1,130 @@
+"""Temporary seat holds kept in memory while a user goes through checkout.
+
+A hold reserves seats of a session for one user for SEAT_HOLD_TTL seconds. Held
+seats are hidden from other users and can't be bought by them, the holder buys
+them as usual. Expiry times are kept in a heap, so every call only pops the holds
+that have already expired instead of scanning all of them. Holds live in the
+memory of one process: with several workers requests of one checkout have to
+reach the same worker.
+"""
+import heapq
+import threading
+import time
+import uuid
+
+from app.config import Config
+
+
+class HoldError(Exception):
+    """Base class for hold failures"""
+
+
+class SeatHeldError(HoldError):
+    """Some of selected seats are held by another user"""
+
+    def __init__(self, held):
+        super().__init__(held)
+        self.held = held
+
+
+class HoldNotFoundError(HoldError):
+    """Hold doesn't exist, has expired or belongs to another user"""
+
+
+class Hold(object):
+    __slots__ = ('id', 'session_id', 'user_id', 'seats', 'expires_at')
+
+    def __init__(self, id_, session_id, user_id, seats, expires_at):
+        self.id = id_
+        self.session_id = session_id
+        self.user_id = user_id
+        self.seats = set(seats)
+        self.expires_at = expires_at
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "session_id": self.session_id,
+            "seats": sorted(self.seats),
+            "expires_in": max(0, round(self.expires_at - time.monotonic()))
+        }
+
+
+class SeatHolds(object):
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._holds = {}
+        self._seats = {}  # session_id -> {seat: hold}
+        self._expiry = []  # heap of (expires_at, hold_id)
+
+    def __len__(self):
+        with self._lock:
+            self._sweep()
+            return len(self._holds)
+
+    def hold(self, session_id, user_id, seats, ttl=None):
+        """
+            Hold seats of a session for user.
+            Returns Hold, raises SeatHeldError when some seats are held by another user
+        """
+        with self._lock:
+            self._sweep()
+            held = sorted(seat for seat, hold in self._seats.get(session_id, {}).items()
+                          if seat in seats and hold.user_id != user_id)
+            if held:
+                raise SeatHeldError(held)
+            for seat in seats:
+                self._release_seat(session_id, seat)
+            hold = Hold(uuid.uuid4().hex, session_id, user_id, seats, time.monotonic() + (ttl or self.ttl))
+            self._holds[hold.id] = hold
+            session_seats = self._seats.setdefault(session_id, {})
+            for seat in seats:
+                session_seats[seat] = hold
+            heapq.heappush(self._expiry, (hold.expires_at, hold.id))
+            return hold
+
+    def release(self, hold_id, user_id=None):
+        """Drop hold, raises HoldNotFoundError if it doesn't exist or belongs to another user"""
+        with self._lock:
+            self._sweep()
+            hold = self._holds.get(hold_id)
+            if hold is None or (user_id is not None and hold.user_id != user_id):
+                raise HoldNotFoundError(hold_id)
+            for seat in list(hold.seats):
+                self._release_seat(hold.session_id, seat)
+
+    def held_seats(self, session_id, user_id=None):
+        """Seats of a session held by everybody except user"""
+        with self._lock:
+            self._sweep()
+            return {seat for seat, hold in self._seats.get(session_id, {}).items() if hold.user_id != user_id}
+
+    def release_seats(self, session_id, seats):
+        """Forget holds of seats that were bought"""
+        with self._lock:
+            for seat in seats:
+                self._release_seat(session_id, seat)
+
+    def _release_seat(self, session_id, seat):
+        session_seats = self._seats.get(session_id)
+        if not session_seats or seat not in session_seats:
+            return
+        hold = session_seats.pop(seat)
+        hold.seats.discard(seat)
+        if not hold.seats:
+            self._holds.pop(hold.id, None)
+        if not session_seats:
+            del self._seats[session_id]
+
+    def _sweep(self):
+        now = time.monotonic()
+        while self._expiry and self._expiry[0][0] <= now:
+            _, hold_id = heapq.heappop(self._expiry)
+            hold = self._holds.get(hold_id)
+            if hold is not None:
+                for seat in list(hold.seats):
+                    self._release_seat(hold.session_id, seat)
+
+
+seat_holds = SeatHolds(ttl=Config.SEAT_HOLD_TTL)
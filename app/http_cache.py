@@ -0,0 +1,120 @@
+"""Conditional GET for catalogue endpoints.
+
+Every flush that adds, changes or deletes films, halls or actors bumps the version
+and time of their namespace in the catalogue_versions table, in the same
+transaction, so admin panel writes are counted too. Responses of @conditional views
+get a strong ETag built from the versions they depend on and the request URL, and
+Last-Modified from the time of the last write. A request with a matching
+If-None-Match (or, without it, an If-Modified-Since not older than the last write)
+gets 304 after one primary key lookup through the engine, before the view runs.
+
+Bodies come from catalogue_cache, so it has to follow the same versions: a commit
+that bumped a namespace drops its cached entries in this process, and versions read
+by a request drop entries cached before writes of other processes.
+"""
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+from flask import current_app, request, session as cookie_session
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from app.database.database import db
+from app.cache import catalogue_cache
+from app.models import ActorModel, FilmModel, HallModel, catalogue_versions
+
+VERSIONED = {FilmModel: 'films', HallModel: 'halls', ActorModel: 'actors'}
+
+
+def bump(connection, namespaces, now=None):
+    """
+        Increase versions of namespaces after a write made with connection (or session).
+        Rows of namespaces are created by the catalogue_versions_table migration, so concurrent writes only update them
+    """
+    now = (now or datetime.utcnow()).replace(microsecond=0)
+    for namespace in sorted(namespaces):
+        connection.execute(update(catalogue_versions).where(catalogue_versions.c.namespace == namespace)
+                           .values(version=catalogue_versions.c.version + 1, updated_at=now))
+
+
+def versions(namespaces):
+    """
+        Read versions of namespaces with one query.
+        Returns tuple (list of versions in order of namespaces, time of the last write or None)
+    """
+    with db.connect() as connection:
+        rows = {row.namespace: row for row in connection.execute(
+            select(catalogue_versions).where(catalogue_versions.c.namespace.in_(namespaces)))}
+    numbers = [rows[namespace].version if namespace in rows else 0 for namespace in namespaces]
+    return numbers, max((row.updated_at for row in rows.values()), default=None)
+
+
+@event.listens_for(Session, 'before_flush')
+def _bump_versions(db_session, flush_context, instances):
+    namespaces = {VERSIONED[type(obj)] for obj in db_session.new | db_session.deleted if type(obj) in VERSIONED}
+    namespaces |= {VERSIONED[type(obj)] for obj in db_session.dirty
+                   if type(obj) in VERSIONED and db_session.is_modified(obj)}
+    if namespaces:
+        bump(db_session, namespaces)
+        db_session.info.setdefault('bumped_namespaces', set()).update(namespaces)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_cache(db_session):
+    for namespace in db_session.info.pop('bumped_namespaces', ()):
+        catalogue_cache.invalidate(namespace)
+        # the schedule page shows names of films and halls
+        catalogue_cache.invalidate('schedule')
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_bumps(db_session):
+    db_session.info.pop('bumped_namespaces', None)
+
+
+def _etag(namespaces, numbers, per_user):
+    parts = [f'{namespace}:{number}' for namespace, number in zip(namespaces, numbers)]
+    parts += [request.full_path, current_app.json_encoder.__name__]
+    if per_user:
+        parts += [str(cookie_session.get('_user_id')), request.cookies.get('remember_token', '')]
+    return hashlib.sha1('\n'.join(parts).encode()).hexdigest()
+
+
+def _not_modified(etag, updated_at, per_user):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    # Last-Modified doesn't tell which user a page was rendered for
+    return not per_user and updated_at is not None and request.if_modified_since is not None \
+        and updated_at <= request.if_modified_since.replace(tzinfo=None)
+
+
+def conditional(*namespaces, per_user=False):
+    """
+        Answer GET requests with 304 when catalogue namespaces haven't changed since the client's copy.
+        per_user=True for pages rendered differently for logged in users of the website
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or (per_user and '_flashes' in cookie_session):
+                return func(*args, **kwargs)
+            numbers, updated_at = versions(namespaces)
+            catalogue_cache.follow_versions(dict(zip(namespaces, numbers)))
+            etag = _etag(namespaces, numbers, per_user)
+            if _not_modified(etag, updated_at, per_user):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(func(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            # a write later in the same second would have the same Last-Modified
+            if updated_at is not None and updated_at < datetime.utcnow().replace(microsecond=0):
+                response.last_modified = updated_at
+            response.headers['Cache-Control'] = 'private, no-cache'
+            if per_user:
+                response.vary.add('Cookie')
+            return response
+        return wrapper
+    return decorator
@@ -1,4 +1,4 @@
-from flask import Flask
+from flask import Flask, jsonify
 from flask_jwt_extended import JWTManager
 from app.config import Config
 from flask_admin import Admin
@@ -8,25 +8,63 @@ from flask_cors import CORS
 from flask_swagger_ui import get_swaggerui_blueprint
 from app.models import UserModel, FilmModel, SessionModel, TicketModel, HallModel, ActorModel, session
 from app.cinema import page_not_found
+from app.hashing import HashingOverloadedError
+from app.encoding import encoder_class
 
 
 def setup_database(app):
     with app.app_context():
         @app.before_first_request
         def create_tables():
-            from app.database.database import db, base
-            base.metadata.create_all(db)
+            from app.database.database import db
+            from app.database.migrations import upgrade
+            from app.blocklist import revoked_tokens
+            from app.occupancy import occupancy_reconciler
+            from app.search import search_index
+            upgrade(db)
+            revoked_tokens.load()
+            revoked_tokens.start()
+            occupancy_reconciler.start()
+            search_index.start()
+
+    @app.cli.command('upgrade-db')
+    def upgrade_db():
+        """Apply pending schema migrations"""
+        from app.database.database import db
+        from app.database.migrations import upgrade
+        for name in upgrade(db):
+            print(f'Applied {name}')
+
+    @app.cli.command('reconcile-occupancy')
+    def reconcile_occupancy():
+        """Recount sold seats of all sessions and fix drifted counters"""
+        from app.database.database import db
+        from app.occupancy import reconcile
+        with db.begin() as connection:
+            print(f'Fixed {reconcile(connection)} sessions')
+
+    @app.teardown_appcontext
+    def remove_session(exception=None):
+        session.remove()
+
+
+def setup_metrics(app):
+    if not app.config['METRICS_ENABLED']:
+        return
+    from app.database.database import db
+    from app.metrics import request_metrics
+    request_metrics.init_app(app, db)
 
 
 def setup_jwt(app):
     jwt = JWTManager(app)
 
-    from app.models import RevokedTokenModel
+    from app.blocklist import revoked_tokens
 
     @jwt.token_in_blocklist_loader
     def check_if_token_in_blacklist(jwt_header, jwt_payload):
         jti = jwt_payload['jti']
-        return RevokedTokenModel.is_jti_blacklisted(jti)
+        return revoked_tokens.is_revoked(jti)
 
 
 def setup_swagger(app):
@@ -52,11 +90,18 @@ def setup_admin(app):
     admin.add_view(ModelView(ActorModel, session, name='Actor'))
 
 
+def service_overloaded(error):
+    """Shed load when too many passwords are waiting to be hashed"""
+    return jsonify({"message": "Server is busy, please try again later"}), 503, {'Retry-After': '1'}
+
+
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
     app.config['SECRET_KEY'] = 'Sokyrka12031990403'
+    app.json_encoder = encoder_class(app.config['JSON_BACKEND'])
     app.register_error_handler(404, page_not_found)
+    app.register_error_handler(HashingOverloadedError, service_overloaded)
     login_manager = LoginManager(app)
     login_manager.login_view = "cinema.login_page"
     login_manager.login_message_category = "info"
@@ -70,11 +115,13 @@ def create_app():
 
     # database first, then blueprints!
     setup_database(app)
+    setup_metrics(app)
     setup_jwt(app)
     setup_admin(app)
     setup_swagger(app)
 
     from .views import users_bp, auth_bp, films_bp, sessions_bp, halls_bp, tickets_bp, actors_bp
+    from .views import holds_bp, analytics_bp, search_bp
     from .cinema import cinema_bp
     app.register_blueprint(users_bp)
     app.register_blueprint(auth_bp)
@@ -84,4 +131,7 @@ def create_app():
     app.register_blueprint(tickets_bp)
     app.register_blueprint(cinema_bp)
     app.register_blueprint(actors_bp)
+    app.register_blueprint(holds_bp)
+    app.register_blueprint(analytics_bp)
+    app.register_blueprint(search_bp)
     return app
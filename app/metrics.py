@@ -0,0 +1,187 @@
+"""Request latency and SQL instrumentation exposed in Prometheus text format.
+
+Every request is timed between before_request and after_request and labeled with
+its endpoint (the view name, so URLs with ids don't blow up the number of series).
+SQLAlchemy engine events count statements executed while a request is handled and
+add up their time, so a view that suddenly runs dozens of queries (N+1) shows up in
+cinema_http_request_queries. Statements slower than SLOW_QUERY_THRESHOLD are logged
+with their text, without parameters. Metrics are kept in memory of one process and
+served by GET /metrics.
+"""
+import bisect
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+WHITESPACE = re.compile(r'\s+')
+
+
+class Histogram(object):
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Pairs (upper bound, number of observations not greater than it), ending with +Inf"""
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, **extra):
+    pairs = list(zip(names, values)) + list(extra.items())
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class RequestMetrics(object):
+    def __init__(self, slow_query_threshold=0.5):
+        self.slow_query_threshold = slow_query_threshold
+        self._lock = threading.Lock()
+        self._engines = set()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._requests = defaultdict(int)  # (endpoint, method, status) -> count
+            self._latency = {}  # (endpoint, method) -> Histogram
+            self._queries = {}
+            self._query_time = {}
+            self._statements = 0
+            self._statement_time = 0
+            self._slow_queries = 0
+
+    def init_app(self, app, engine):
+        """Time requests of app and count SQL statements executed on engine"""
+        self.instrument(engine)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule('/metrics', 'metrics', self.export)
+
+    def instrument(self, engine):
+        """Listen to statements of engine, once per engine"""
+        if engine in self._engines:
+            return
+        self._engines.add(engine)
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def observe_request(self, endpoint, method, status, duration, queries=0, query_time=0):
+        with self._lock:
+            key = (endpoint, method)
+            self._requests[(endpoint, method, status)] += 1
+            if key not in self._latency:
+                self._latency[key] = Histogram(LATENCY_BUCKETS)
+                self._queries[key] = Histogram(QUERY_BUCKETS)
+                self._query_time[key] = Histogram(LATENCY_BUCKETS)
+            self._latency[key].observe(duration)
+            self._queries[key].observe(queries)
+            self._query_time[key].observe(query_time)
+
+    def observe_statement(self, statement, duration):
+        with self._lock:
+            self._statements += 1
+            self._statement_time += duration
+            slow = duration >= self.slow_query_threshold
+            if slow:
+                self._slow_queries += 1
+        if slow:
+            endpoint = request.endpoint if has_request_context() else None
+            logger.warning('Slow query (%.1f ms) in %s: %s', duration * 1000, endpoint or 'background',
+                           WHITESPACE.sub(' ', statement).strip())
+
+    def render(self):
+        """All metrics in Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            lines += ['# HELP cinema_http_requests_total Handled requests.',
+                      '# TYPE cinema_http_requests_total counter']
+            for labels, count in sorted(self._requests.items()):
+                lines.append(f'cinema_http_requests_total{_labels(("endpoint", "method", "status"), labels)} {count}')
+            for name, help_, histograms in (
+                    ('cinema_http_request_duration_seconds', 'Time spent handling requests.', self._latency),
+                    ('cinema_http_request_queries', 'SQL statements executed per request.', self._queries),
+                    ('cinema_http_request_query_duration_seconds', 'Time spent in SQL per request.',
+                     self._query_time)):
+                lines += [f'# HELP {name} {help_}', f'# TYPE {name} histogram']
+                for labels, histogram in sorted(histograms.items()):
+                    for bound, count in histogram.cumulative():
+                        bucket_labels = _labels(('endpoint', 'method'), labels, le=_number(bound))
+                        lines.append(f'{name}_bucket{bucket_labels} {count}')
+                    lines.append(f'{name}_sum{_labels(("endpoint", "method"), labels)} {_number(histogram.sum)}')
+                    lines.append(f'{name}_count{_labels(("endpoint", "method"), labels)} {histogram.count}')
+            lines += ['# HELP cinema_sql_statements_total SQL statements executed, including background jobs.',
+                      '# TYPE cinema_sql_statements_total counter',
+                      f'cinema_sql_statements_total {self._statements}',
+                      '# HELP cinema_sql_statement_duration_seconds_total Time spent in SQL statements.',
+                      '# TYPE cinema_sql_statement_duration_seconds_total counter',
+                      f'cinema_sql_statement_duration_seconds_total {_number(float(self._statement_time))}',
+                      '# HELP cinema_sql_slow_statements_total Statements slower than SLOW_QUERY_THRESHOLD.',
+                      '# TYPE cinema_sql_slow_statements_total counter',
+                      f'cinema_sql_slow_statements_total {self._slow_queries}']
+        return '\n'.join(lines) + '\n'
+
+    def export(self):
+        """GET /metrics"""
+        return Response(self.render(), mimetype=CONTENT_TYPE)
+
+    @staticmethod
+    def _start_request():
+        g.metrics_started_at = time.perf_counter()
+        g.metrics_queries = 0
+        g.metrics_query_time = 0
+
+    def _finish_request(self, response):
+        started_at = g.pop('metrics_started_at', None)
+        if started_at is not None:
+            self.observe_request(request.endpoint or 'unmatched', request.method, response.status_code,
+                                 time.perf_counter() - started_at, g.metrics_queries, g.metrics_query_time)
+        return response
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_started_at', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('metrics_started_at')
+        if not started:
+            return
+        duration = time.perf_counter() - started.pop()
+        if has_request_context() and 'metrics_started_at' in g:
+            g.metrics_queries += 1
+            g.metrics_query_time += duration
+        self.observe_statement(statement, duration)
+
+
+request_metrics = RequestMetrics(slow_query_threshold=Config.SLOW_QUERY_THRESHOLD / 1000)
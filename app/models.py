@@ -1,21 +1,38 @@
 from datetime import datetime
+from functools import lru_cache
 
-from passlib.hash import pbkdf2_sha256 as sha256
-from sqlalchemy import Column, String, Integer, Float, DateTime, Boolean, ForeignKey, Table
+from sqlalchemy import Column, String, Integer, Float, DateTime, Boolean, ForeignKey, Table, LargeBinary, Index
+from sqlalchemy import and_, event, func, inspect, or_, select
 from sqlalchemy.orm import relationship
 from flask_login import UserMixin
 
-from app.database.database import base, session
+from app.database.database import base, lock_for_write, session
+from app.cache import cached, catalogue_cache
+from app.hashing import password_hasher
+from app.pagination import keyset
+from app.seat_map import SeatMap
 
 """All models used: TicketModel, SessionModel, FilmModel, ActorModel, HallModel, UserModel, RevokedTokenModel"""
 
 
+@lru_cache(maxsize=None)
+def projection(model):
+    """
+        Columns of model.projected_columns, the ones read by model.to_dict. Read-only queries select them instead of
+        whole entities, so rows skip the identity map and instance state, and to_dict reads them from plain Row tuples
+    """
+    return tuple(getattr(model, name) for name in model.projected_columns)
+
+
 class TicketModel(base):
     __tablename__ = "tickets"
+    __table_args__ = (Index('ix_tickets_session_seat', 'session_id', 'seat', unique=True),)
     id = Column(Integer, primary_key=True)
     seat = Column(Integer, nullable=False)
-    user_id = Column(Integer, ForeignKey('users.id'))
+    user_id = Column(Integer, ForeignKey('users.id'), index=True)
     session_id = Column(Integer, ForeignKey('sessions.id'))
+    # columns read by to_dict, list queries select only them (see projection)
+    projected_columns = ('id', 'seat', 'user_id', 'session_id')
     user = relationship("UserModel", back_populates='tickets')
     session = relationship("SessionModel", back_populates='tickets')
 
@@ -31,29 +48,42 @@ class TicketModel(base):
             return ticket
 
     @classmethod
-    def find_by_user_id(cls, user_id, offset, limit):
+    def find_by_user_id(cls, user_id, after=None, limit=10):
         """
-            Method for finding selected ticket by user_id
+            Method for finding selected ticket by user_id, one page after selected ticket id
             Returns list of dictionaries
         """
-        tickets = session.query(cls).filter_by(user_id=user_id) \
-            .order_by(cls.id).offset(offset).limit(limit).all()
+        tickets = keyset(session.query(*projection(cls)).filter(cls.user_id == user_id), cls.id, after, limit)
         return [cls.to_dict(s) for s in tickets]
 
     @classmethod
-    def find_by_session_id(cls, session_id, offset, limit):
+    def find_by_session_id(cls, session_id, after=None, limit=75):
         """
-            Method for finding selected ticket by session_id
+            Method for finding selected ticket by session_id, one page after selected ticket id
             Returns list of dictionaries
         """
-        tickets = session.query(cls).filter_by(session_id=session_id) \
-            .order_by(cls.id).offset(offset).limit(limit).all()
+        tickets = keyset(session.query(*projection(cls)).filter(cls.session_id == session_id), cls.id, after, limit)
         return [cls.to_dict(s) for s in tickets]
 
+    @classmethod
+    def count_by_film_id(cls, film_id):
+        """Method for counting all tickets sold for sessions of selected film with one query"""
+        return session.query(func.count(cls.id)).join(SessionModel, cls.session_id == SessionModel.id) \
+            .filter(SessionModel.film_id == film_id).scalar()
+
+    @classmethod
+    def return_page(cls, after=None, limit=100):
+        """
+            Method to return one page of tickets ordered by id, starting after selected id
+            Returns list of dictionaries
+        """
+        tickets = keyset(session.query(*projection(cls)), cls.id, after, limit)
+        return [cls.to_dict(ticket) for ticket in tickets]
+
     @classmethod
     def return_all(cls):
         """Method to return all tickets"""
-        tickets = session.query(cls).order_by(cls.id).all()
+        tickets = session.query(*projection(cls)).order_by(cls.id).all()
         return [cls.to_dict(ticket) for ticket in tickets]
 
     @classmethod
@@ -85,11 +115,16 @@ class TicketModel(base):
 
 class SessionModel(base):
     __tablename__ = "sessions"
+    __table_args__ = (Index('ix_sessions_hall_started', 'hall_id', 'started_at'),)
     id = Column(Integer, primary_key=True)
-    started_at = Column(DateTime())
-    number_seats = Column(Integer)
+    started_at = Column(DateTime(), index=True)
+    number_seats = Column(Integer)  # seats left
+    sold_seats = Column(Integer, default=0)
+    price = Column(Float, default=0)
+    seat_map = Column(LargeBinary)
     hall_id = Column(Integer, ForeignKey('halls.id'))
-    film_id = Column(Integer, ForeignKey('films.id'))
+    film_id = Column(Integer, ForeignKey('films.id'), index=True)
+    projected_columns = ('id', 'started_at', 'film_id', 'hall_id', 'number_seats', 'price')
     film = relationship("FilmModel", back_populates='sessions')
     hall = relationship("HallModel", back_populates='sessions')
     tickets = relationship(TicketModel, lazy='dynamic',
@@ -108,15 +143,41 @@ class SessionModel(base):
             return sess
 
     @classmethod
-    def find_by_film_id(cls, film_id, offset, limit):
+    def find_seats(cls, id_, upcoming=False, for_update=False):
+        """
+            Method for reading seat occupancy of selected session without loading tickets.
+            With for_update=True the session row stays locked until the caller commits.
+            Capacity of the session is number_seats + sold_seats.
+            Returns tuple (number_seats, sold_seats, SeatMap) or None if session doesn't exist
+        """
+        query = session.query(cls.number_seats, cls.sold_seats, cls.seat_map).filter(cls.id == id_)
+        if upcoming:
+            query = query.filter(cls.started_at >= datetime.now())
+        if for_update:
+            query = query.with_for_update()
+        row = query.first()
+        if not row:
+            return None
+        if row.seat_map is None:
+            seats = session.query(TicketModel.seat).filter(TicketModel.session_id == id_)
+            seat_map = SeatMap.from_seats(seat for seat, in seats)
+            session.query(cls).filter(cls.id == id_).update({cls.seat_map: seat_map.to_bytes()},
+                                                            synchronize_session=False)
+            if not for_update:
+                session.commit()
+            return row.number_seats, row.sold_seats or 0, seat_map
+        return row.number_seats, row.sold_seats or 0, SeatMap(row.seat_map)
+
+    @classmethod
+    def find_by_film_id(cls, film_id, after=None, limit=100):
         """
-            Method for finding sessions by film_id
+            Method for finding upcoming sessions by film_id, one page after selected session id
             Returns list of dictionaries
         """
         from_date = datetime(year=datetime.now().year, month=datetime.now().month, day=datetime.now().day,
                              hour=datetime.now().hour, minute=datetime.now().minute, second=datetime.now().second)
-        sessions = session.query(cls).filter(SessionModel.started_at >= from_date).filter_by(film_id=film_id) \
-            .order_by(cls.id).offset(offset).limit(limit).all()
+        query = session.query(*projection(cls)).filter(cls.started_at >= from_date, cls.film_id == film_id)
+        sessions = keyset(query, cls.id, after, limit)
         return [cls.to_dict(s) for s in sessions]
 
     @classmethod
@@ -126,6 +187,7 @@ class SessionModel(base):
         if session_:
             session.delete(session_)
             session.commit()
+            catalogue_cache.invalidate('schedule')
             return 200
         else:
             return 404
@@ -135,77 +197,77 @@ class SessionModel(base):
         """Method to return all sessions"""
         from_date = datetime(year=datetime.now().year, month=datetime.now().month, day=datetime.now().day,
                              hour=datetime.now().hour, minute=datetime.now().minute, second=datetime.now().second)
-        sessions = session.query(cls).filter(SessionModel.started_at >= from_date).order_by(cls.id).all()
+        sessions = session.query(*projection(cls)).filter(cls.started_at >= from_date).order_by(cls.id).all()
         return [cls.to_dict(sess) for sess in sessions]
 
     @classmethod
-    def find_by_genre(cls, genre):
+    def find_upcoming_by_film_ids(cls, film_ids, limit=100):
         """
-            Method for finding sessions by genre
+            Method for finding upcoming sessions of several films with one query, ordered by date
             Returns list of dictionaries
         """
-        if genre:
-            sessions = session.query(cls).join(FilmModel).filter(FilmModel.genre == genre).all()
-        else:
-            sessions = cls.return_all()
+        sessions = session.query(*projection(cls)).filter(cls.film_id.in_(film_ids), cls.started_at >= datetime.now()) \
+            .order_by(cls.started_at, cls.id).limit(limit).all()
         return [cls.to_dict(sess) for sess in sessions]
 
     @classmethod
-    def find_by_name(cls, name):
+    def schedule_query(cls, since):
         """
-            Method for finding sessions by film name
-            Returns list of dictionaries
+            Method to build the query of upcoming schedule, selecting only displayed columns:
+            sess_id, started_at, hall_id, number_seats, name, genre, director
         """
-        if name:
-            sessions = session.query(cls).join(FilmModel).filter(FilmModel.name == name).all()
-        else:
-            sessions = cls.return_all()
-        return [cls.to_dict(sess) for sess in sessions]
+        return session.query(cls.id.label('sess_id'), cls.started_at, cls.hall_id, cls.number_seats,
+                             FilmModel.name, FilmModel.genre, FilmModel.director) \
+            .select_from(cls) \
+            .join(FilmModel, cls.film_id == FilmModel.id) \
+            .filter(cls.started_at >= since)
 
     @classmethod
-    def find_by_actor(cls, actor_name):
+    def search(cls, genre=None, film_name=None, actor_name=None, director=None, started_at=None,
+               sort=False, after=None, limit=None):
         """
-            Method for finding sessions by actor
+            Method for finding upcoming sessions with one SQL query.
+            All given filters are combined with AND, sort=True orders sessions by date.
+            Page starts after the session with id "after" in the selected order
             Returns list of dictionaries
         """
-        if actor_name:
-            sessions = session.query(SessionModel).join(FilmModel).join(film_actor).join(ActorModel).filter(
-                ActorModel.name == actor_name).all()
-        else:
-            sessions = cls.return_all()
+        query = cls.search_query(genre, film_name, actor_name, director, started_at, sort, after)
+        sessions = query.with_entities(*projection(cls)).limit(limit).all()
         return [cls.to_dict(sess) for sess in sessions]
 
     @classmethod
-    def find_by_director(cls, director):
-        """
-            Method for finding sessions by director
-            Returns list of dictionaries
-        """
+    def search_query(cls, genre=None, film_name=None, actor_name=None, director=None, started_at=None,
+                     sort=False, after=None):
+        """Method to build the query used by search, without limit"""
+        query = session.query(cls).filter(cls.started_at >= datetime.now())
+        if genre or film_name or director or actor_name:
+            query = query.join(FilmModel, cls.film_id == FilmModel.id)
+        if genre:
+            query = query.filter(FilmModel.genre == genre)
+        if film_name:
+            query = query.filter(FilmModel.name == film_name)
         if director:
-            sessions = session.query(cls).join(FilmModel).filter(FilmModel.director == director).all()
-        else:
-            sessions = cls.return_all()
-        return [cls.to_dict(sess) for sess in sessions]
-
-    @classmethod
-    def find_by_date(cls, started_at):
-        """
-            Method for finding sessions by date
-            Returns list of dictionaries
-        """
+            query = query.filter(FilmModel.director == director)
+        if actor_name:
+            query = query.filter(FilmModel.actors.any(ActorModel.name == actor_name))
         if started_at:
-            from_date = datetime(year=datetime.now().year, month=datetime.now().month, day=datetime.now().day,
-                                 hour=datetime.now().hour, minute=datetime.now().minute, second=datetime.now().second)
-            sessions = session.query(SessionModel).filter(SessionModel.started_at == started_at) \
-                .filter(SessionModel.started_at >= from_date).all()
+            query = query.filter(cls.started_at == started_at)
+        if sort:
+            if after is not None:
+                anchor = session.query(cls.started_at).filter(cls.id == after).scalar_subquery()
+                query = query.filter(or_(cls.started_at > anchor, and_(cls.started_at == anchor, cls.id > after)))
+            query = query.order_by(cls.started_at, cls.id)
         else:
-            sessions = cls.return_all()
-        return [cls.to_dict(sess) for sess in sessions]
+            if after is not None:
+                query = query.filter(cls.id > after)
+            query = query.order_by(cls.id)
+        return query
 
     def save_to_db(self):
         """Method to save changes into DB"""
         session.add(self)
         session.commit()
+        catalogue_cache.invalidate('schedule')
 
     @staticmethod
     def to_dict(session_):
@@ -215,24 +277,88 @@ class SessionModel(base):
             "started_at": session_.started_at,
             "film_id": session_.film_id,
             "hall_id": session_.hall_id,
-            "number_seats": session_.number_seats
+            "number_seats": session_.number_seats,
+            "price": session_.price
         }
 
 
+def _sync_seat_map(connection, session_id, seat=None, taken=True):
+    """
+        Keep sessions.seat_map and seat counters in sync with tickets inside the current transaction.
+        With seat the map and counters are moved by one seat, without it they are rebuilt from tickets.
+        The session row is locked first, like in app.booking, so concurrent writes of the map are serialized.
+        On SQLite the ticket write that triggered the sync already holds the database write lock
+    """
+    if session_id is None:
+        return
+    lock_for_write(connection)
+    sessions = SessionModel.__table__
+    tickets = TicketModel.__table__
+    data = connection.execute(select(sessions.c.seat_map).where(sessions.c.id == session_id)
+                              .with_for_update()).scalar()
+    if seat is None:
+        sold = select(func.count()).where(tickets.c.session_id == session_id).scalar_subquery()
+        capacity = sessions.c.number_seats + func.coalesce(sessions.c.sold_seats, 0)
+        counters = {sessions.c.number_seats: capacity - sold, sessions.c.sold_seats: sold}
+    else:
+        step = 1 if taken else -1
+        counters = {sessions.c.number_seats: sessions.c.number_seats - step,
+                    sessions.c.sold_seats: func.coalesce(sessions.c.sold_seats, 0) + step}
+    if data is None or seat is None:
+        seats = connection.execute(select(tickets.c.seat).where(tickets.c.session_id == session_id)).scalars()
+        seat_map = SeatMap.from_seats(seats)
+    else:
+        seat_map = SeatMap(data)
+        if taken:
+            seat_map.take(seat)
+        else:
+            seat_map.release(seat)
+    connection.execute(sessions.update().where(sessions.c.id == session_id)
+                       .values({sessions.c.seat_map: seat_map.to_bytes(), **counters}))
+
+
+@event.listens_for(TicketModel, 'after_insert')
+def _ticket_inserted(mapper, connection, target):
+    _sync_seat_map(connection, target.session_id, target.seat, taken=True)
+
+
+@event.listens_for(TicketModel, 'after_delete')
+def _ticket_deleted(mapper, connection, target):
+    _sync_seat_map(connection, target.session_id, target.seat, taken=False)
+
+
+@event.listens_for(TicketModel, 'after_update')
+def _ticket_updated(mapper, connection, target):
+    history = inspect(target).attrs.session_id.history
+    for session_id in set(history.deleted or ()) | {target.session_id}:
+        _sync_seat_map(connection, session_id)
+
+
 film_actor = Table('association', base.metadata,
                    Column('films_id', Integer, ForeignKey('films.id'), primary_key=True),
-                   Column('actors_id', Integer, ForeignKey('actors.id'), primary_key=True)
+                   Column('actors_id', Integer, ForeignKey('actors.id'), primary_key=True),
+                   # primary key (films_id, actors_id) serves casts, this one serves films of an actor
+                   Index('ix_association_actor_film', 'actors_id', 'films_id')
                    )
 
+# version and time of the last write of films, halls and actors, used for ETag and Last-Modified
+catalogue_versions = Table('catalogue_versions', base.metadata,
+                           Column('namespace', String(30), primary_key=True),
+                           Column('version', Integer, nullable=False),
+                           Column('updated_at', DateTime, nullable=False)
+                           )
+
 
 class FilmModel(base):
     __tablename__ = "films"
     id = Column(Integer, primary_key=True)
-    name = Column(String(30), nullable=False)
-    genre = Column(String(30), nullable=False)
-    director = Column(String(30), nullable=False)
+    name = Column(String(30), nullable=False, index=True)
+    genre = Column(String(30), nullable=False, index=True)
+    director = Column(String(30), nullable=False, index=True)
     image = Column(String(200), nullable=False)
     rating = Column(Float, nullable=False)
+    duration = Column(Integer, default=120, index=True)  # minutes
+    projected_columns = ('id', 'name', 'genre', 'director', 'image', 'rating', 'duration')
     sessions = relationship(SessionModel, lazy='dynamic',
                             cascade="all, delete-orphan",
                             foreign_keys="SessionModel.film_id")
@@ -242,6 +368,7 @@ class FilmModel(base):
         back_populates="films")
 
     @classmethod
+    @cached('films')
     def find_by_id(cls, id_, to_dict=True):
         """Method for finding selected film by id"""
         film = session.query(cls).filter_by(id=id_).first()
@@ -258,16 +385,27 @@ class FilmModel(base):
             Method for finding film by session id
             Returns list of dictionaries
         """
-        if id_:
-            films = session.query(cls).join(SessionModel).filter(SessionModel.id == id_).all()
-        else:
-            films = cls.return_all()
-        return [cls.to_dict(sess) for sess in films]
+        if not id_:
+            return cls.return_all()
+        films = session.query(*projection(cls)).join(SessionModel, SessionModel.film_id == cls.id) \
+            .filter(SessionModel.id == id_).all()
+        return [cls.to_dict(film) for film in films]
 
     @classmethod
+    @cached('films')
+    def return_page(cls, after=None, limit=100):
+        """
+            Method to return one page of films ordered by id, starting after selected id
+            Returns list of dictionaries
+        """
+        films = keyset(session.query(*projection(cls)), cls.id, after, limit)
+        return [cls.to_dict(film) for film in films]
+
+    @classmethod
+    @cached('films')
     def return_all(cls):
         """Method to return all films"""
-        films = session.query(cls).order_by(cls.id).all()
+        films = session.query(*projection(cls)).order_by(cls.id).all()
         return [cls.to_dict(film) for film in films]
 
     @classmethod
@@ -277,6 +415,8 @@ class FilmModel(base):
         if film:
             session.delete(film)
             session.commit()
+            catalogue_cache.invalidate('films')
+            catalogue_cache.invalidate('schedule')
             return 200
         else:
             return 404
@@ -285,6 +425,8 @@ class FilmModel(base):
         """Method to save changes into DB"""
         session.add(self)
         session.commit()
+        catalogue_cache.invalidate('films')
+        catalogue_cache.invalidate('schedule')
 
     @staticmethod
     def to_dict(film):
@@ -295,7 +437,8 @@ class FilmModel(base):
             "genre": film.genre,
             "director": film.director,
             "image": film.image,
-            "rating": film.rating
+            "rating": film.rating,
+            "duration": film.duration
         }
 
 
@@ -304,25 +447,55 @@ class ActorModel(base):
     id = Column(Integer, primary_key=True)
     name = Column(String(30), nullable=False)
     surname = Column(String(30), nullable=False)
+    projected_columns = ('id', 'name', 'surname')
     films = relationship(
         "FilmModel",
         secondary=film_actor,
         back_populates="actors")
 
     @classmethod
-    def find_by_film_id(cls, film_id, offset, limit):
+    def find_by_film_id(cls, film_id, after=None, limit=100):
+        """
+            Method for finding cast of selected film through the association table, one page after selected actor id
+            Returns list of dictionaries
+        """
+        query = session.query(*projection(cls)) \
+            .join(film_actor, film_actor.c.actors_id == cls.id) \
+            .filter(film_actor.c.films_id == film_id)
+        return [cls.to_dict(actor) for actor in keyset(query, cls.id, after, limit)]
+
+    @classmethod
+    def find_by_film_ids(cls, film_ids):
         """
-            Method for finding actors by film_id
+            Method for finding casts of several films with one query
+            Returns dictionary film id -> list of dictionaries
+        """
+        casts = {film_id: [] for film_id in film_ids}
+        if not casts:
+            return casts
+        rows = session.query(film_actor.c.films_id, *projection(cls)) \
+            .join(cls, film_actor.c.actors_id == cls.id) \
+            .filter(film_actor.c.films_id.in_(list(casts))) \
+            .order_by(film_actor.c.films_id, cls.id).all()
+        for row in rows:
+            casts[row.films_id].append(cls.to_dict(row))
+        return casts
+
+    @classmethod
+    @cached('actors')
+    def return_page(cls, after=None, limit=100):
+        """
+            Method to return one page of actors ordered by id, starting after selected id
             Returns list of dictionaries
         """
-        actors = session.query(cls).filter_by(film_id=film_id) \
-            .order_by(cls.id).offset(offset).limit(limit).all()
-        return [cls.to_dict(s) for s in actors]
+        actors = keyset(session.query(*projection(cls)), cls.id, after, limit)
+        return [cls.to_dict(actor) for actor in actors]
 
     @classmethod
+    @cached('actors')
     def return_all(cls):
         """Method to return all actors"""
-        actors = session.query(cls).order_by(cls.id).all()
+        actors = session.query(*projection(cls)).order_by(cls.id).all()
         return [cls.to_dict(actor) for actor in actors]
 
     @classmethod
@@ -332,6 +505,7 @@ class ActorModel(base):
         if actor:
             session.delete(actor)
             session.commit()
+            catalogue_cache.invalidate('actors')
             return 200
         else:
             return 404
@@ -340,6 +514,7 @@ class ActorModel(base):
         """Method to save changes into DB"""
         session.add(self)
         session.commit()
+        catalogue_cache.invalidate('actors')
 
     @staticmethod
     def to_dict(actor):
@@ -356,11 +531,13 @@ class HallModel(base):
     id = Column(Integer, primary_key=True)
     name = Column(String(30), nullable=False)
     capacity = Column(Integer, nullable=False)
+    projected_columns = ('id', 'name', 'capacity')
     sessions = relationship(SessionModel, lazy='dynamic',
                             cascade="all, delete-orphan",
                             foreign_keys="SessionModel.hall_id")
 
     @classmethod
+    @cached('halls')
     def find_by_id(cls, id_, to_dict=True):
         """Method for finding selected hall by id"""
         hall = session.query(cls).filter_by(id=id_).first()
@@ -372,9 +549,20 @@ class HallModel(base):
             return hall
 
     @classmethod
+    @cached('halls')
+    def return_page(cls, after=None, limit=100):
+        """
+            Method to return one page of halls ordered by id, starting after selected id
+            Returns list of dictionaries
+        """
+        halls = keyset(session.query(*projection(cls)), cls.id, after, limit)
+        return [cls.to_dict(hall) for hall in halls]
+
+    @classmethod
+    @cached('halls')
     def return_all(cls):
         """Method to return all halls"""
-        halls = session.query(cls).order_by(cls.id).all()
+        halls = session.query(*projection(cls)).order_by(cls.id).all()
         return [cls.to_dict(hall) for hall in halls]
 
     @classmethod
@@ -384,6 +572,7 @@ class HallModel(base):
         if hall:
             session.delete(hall)
             session.commit()
+            catalogue_cache.invalidate('halls')
             return 200
         else:
             return 404
@@ -392,6 +581,7 @@ class HallModel(base):
         """Method to save changes into DB"""
         session.add(self)
         session.commit()
+        catalogue_cache.invalidate('halls')
 
     @staticmethod
     def to_dict(hall):
@@ -409,10 +599,11 @@ class UserModel(base, UserMixin):
     id = Column(Integer, primary_key=True)
     name = Column(String(30), nullable=False)
     age = Column(Integer, nullable=False)
-    username = Column(String(30), nullable=False)
-    email = Column(String(30), nullable=False)
+    username = Column(String(30), nullable=False, unique=True, index=True)
+    email = Column(String(30), nullable=False, unique=True, index=True)
     hashed_password = Column(String(50), nullable=False)
     is_admin = Column(Boolean(), default=False)
+    projected_columns = ('id', 'name', 'age', 'username', 'email', 'is_admin')
     tickets = relationship(TicketModel, lazy='dynamic',
                            cascade="all, delete-orphan",
                            foreign_keys="TicketModel.user_id")
@@ -439,6 +630,12 @@ class UserModel(base, UserMixin):
         else:
             return user
 
+    @classmethod
+    def find_id_by_username(cls, username):
+        """Method for finding id of selected user without loading the user. Returns None if user doesn't exist"""
+        row = session.query(cls.id).filter_by(username=username).first()
+        return row.id if row else None
+
     @classmethod
     def find_by_email(cls, email, to_dict=True):
         """Method for finding selected user by email"""
@@ -450,10 +647,19 @@ class UserModel(base, UserMixin):
         else:
             return user
 
+    @classmethod
+    def return_page(cls, after=None, limit=100):
+        """
+            Method to return one page of users ordered by id, starting after selected id
+            Returns list of dictionaries
+        """
+        users = keyset(session.query(*projection(cls)), cls.id, after, limit)
+        return [cls.to_dict(user) for user in users]
+
     @classmethod
     def return_all(cls):
         """Method to return all users"""
-        users = session.query(cls).order_by(cls.id).all()
+        users = session.query(*projection(cls)).order_by(cls.id).all()
         return [cls.to_dict(user) for user in users]
 
     @classmethod
@@ -487,19 +693,31 @@ class UserModel(base, UserMixin):
     @staticmethod
     def generate_hash(password):
         """Method for generating hashed password"""
-        return sha256.hash(password)
+        return password_hasher.hash_password(password)
 
     @staticmethod
     def verify_hash(password, hash_):
         """Method to verify password"""
-        return sha256.verify(password, hash_)
+        return password_hasher.verify(password, hash_)
+
+    def check_password(self, password):
+        """
+            Method to verify password of this user.
+            Hash is updated when it was made with other hashing settings
+        """
+        is_valid, new_hash = password_hasher.verify_and_update(password, self.hashed_password)
+        if new_hash:
+            self.hashed_password = new_hash
+            self.save_to_db()
+        return is_valid
 
 
 class RevokedTokenModel(base):
     __tablename__ = 'revoked_tokens'
     id_ = Column(Integer, primary_key=True)
-    jti = Column(String(120))
+    jti = Column(String(120), unique=True, index=True)
     blacklisted_on = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, index=True)
 
     def add(self):
         """Method to save changes into DB"""
@@ -511,3 +729,21 @@ class RevokedTokenModel(base):
         """Method to check if this unique identifier for token is in blacklist"""
         query = session.query(cls).filter_by(jti=jti).first()
         return bool(query)
+
+    @classmethod
+    def find_jtis(cls):
+        """Method for reading jti of all revoked tokens"""
+        return [jti for jti, in session.query(cls.jti)]
+
+    @classmethod
+    def delete_expired(cls, now, revoked_before):
+        """
+            Method to delete tokens that have expired and can't be used anymore.
+            Rows without expires_at are deleted when they were revoked before revoked_before
+            Returns number of deleted rows
+        """
+        deleted = session.query(cls).filter(
+            (cls.expires_at < now) | (cls.expires_at.is_(None) & (cls.blacklisted_on < revoked_before))
+        ).delete(synchronize_session=False)
+        session.commit()
+        return deleted
@@ -0,0 +1,95 @@
+"""Reconciliation of per-session seat counters.
+
+sessions.sold_seats and sessions.number_seats (seats left) are maintained in the
+same transaction as every ticket insert and delete, so capacity is always read from
+the session row. Tickets written around the ORM (raw SQL, manual fixes) can still
+make them drift, so a background thread periodically recounts tickets of upcoming
+sessions and fixes the rows that disagree. Drifted rows are locked with
+SELECT ... FOR UPDATE SKIP LOCKED and recounted inside the lock, so a session that is
+being bought (app.booking holds its row) is left for the next run instead of being
+overwritten with a count that misses the purchase. Seat maps of fixed sessions, and
+maps whose number of taken seats disagrees with sold_seats, are reset and rebuilt
+from tickets on the next read.
+"""
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy import func, select, update
+
+from app.config import Config
+from app.database.database import db
+from app.models import SessionModel, TicketModel
+from app.seat_map import SeatMap
+
+logger = logging.getLogger(__name__)
+
+
+def reconcile(connection, since=None):
+    """
+        Recount sold seats of sessions starting after since (all sessions if not given) and fix drifted counters,
+        keeping capacity (number_seats + sold_seats) unchanged, then reset seat maps whose taken seats disagree
+        with sold_seats. Sessions locked by other transactions are skipped.
+        Returns number of fixed sessions
+    """
+    sessions = SessionModel.__table__
+    tickets = TicketModel.__table__
+    sold = select(func.count()).where(tickets.c.session_id == sessions.c.id).scalar_subquery()
+    sold_seats = func.coalesce(sessions.c.sold_seats, 0)
+    drifted = select(sessions.c.id).where(sold_seats != sold)
+    mapped = select(sessions.c.id, sold_seats, sessions.c.seat_map).where(sessions.c.seat_map.isnot(None))
+    if since is not None:
+        drifted = drifted.where(sessions.c.started_at >= since)
+        mapped = mapped.where(sessions.c.started_at >= since)
+    fixed = 0
+    ids = connection.execute(drifted.with_for_update(skip_locked=True)).scalars().all()
+    if ids:
+        query = update(sessions).where(sessions.c.id.in_(ids), sold_seats != sold).values({
+            sessions.c.number_seats: sessions.c.number_seats + sold_seats - sold,
+            sessions.c.sold_seats: sold,
+            sessions.c.seat_map: None
+        })
+        fixed += connection.execute(query.execution_options(synchronize_session=False)).rowcount
+    rows = connection.execute(mapped.with_for_update(skip_locked=True)).all()
+    ids = [id_ for id_, count, data in rows if SeatMap(data).count() != count]
+    if ids:
+        query = update(sessions).where(sessions.c.id.in_(ids)).values({sessions.c.seat_map: None})
+        fixed += connection.execute(query.execution_options(synchronize_session=False)).rowcount
+    return fixed
+
+
+class OccupancyReconciler(object):
+    def __init__(self, engine, interval=300):
+        self.engine = engine
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start background reconciliation, does nothing when interval is 0 or it is already running"""
+        if self.interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='occupancy-reconciler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run_once(self):
+        """Reconcile upcoming sessions in one transaction. Returns number of fixed sessions"""
+        with self.engine.begin() as connection:
+            fixed = reconcile(connection, since=datetime.now())
+        if fixed:
+            logger.warning('Fixed seat counters of %s sessions', fixed)
+        return fixed
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception('Seat counters reconciliation failed')
+
+
+occupancy_reconciler = OccupancyReconciler(db, interval=Config.OCCUPANCY_RECONCILE_INTERVAL)
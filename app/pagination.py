@@ -0,0 +1,46 @@
+"""Keyset (cursor) pagination for list endpoints.
+
+Pages are requested with ?after=<id>&limit=<n> and selected with "WHERE id > after
+ORDER BY id LIMIT n", so every page costs the same no matter how deep it is.
+The cursor of the next page is returned in the X-Next-Cursor and Link headers,
+and the body stays a plain list.
+"""
+from urllib.parse import urlencode
+
+from flask import jsonify, request
+
+from app.config import Config
+
+PAGE_ARGS_MESSAGE = '"after" and "limit" should be positive integers.'
+
+
+def page_args():
+    """
+        Read "after" and "limit" from query string.
+        Returns tuple (after, limit), raises ValueError when they are not positive integers
+    """
+    after = request.args.get('after')
+    after = int(after) if after else None
+    limit = int(request.args.get('limit', Config.PAGE_LIMIT_DEFAULT))
+    if limit < 1 or (after is not None and after < 0):
+        raise ValueError(PAGE_ARGS_MESSAGE)
+    return after, min(limit, Config.PAGE_LIMIT_MAX)
+
+
+def keyset(query, column, after, limit):
+    """Select one page of query ordered by column, starting after selected value"""
+    if after is not None:
+        query = query.filter(column > after)
+    return query.order_by(column).limit(limit).all()
+
+
+def page_response(items, limit, key='id'):
+    """jsonify one page and add cursor of the next page to headers"""
+    response = jsonify(items)
+    if len(items) == limit:
+        cursor = items[-1][key]
+        args = request.args.to_dict()
+        args.update(after=cursor, limit=limit)
+        response.headers['X-Next-Cursor'] = str(cursor)
+        response.headers['Link'] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    return response
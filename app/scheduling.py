@@ -0,0 +1,225 @@
+"""Session scheduling with per-hall conflict detection.
+
+A new session conflicts with an existing one in the same hall when their
+[started_at, started_at + film duration) intervals overlap. Candidates are found
+with a range scan on the (hall_id, started_at) index: only sessions starting less
+than the longest film duration before the new one can still be running. The hall
+row is locked while checking and inserting, so two admins can't book overlapping
+sessions at the same time. SQLite ignores the row lock, so there the whole database
+is locked for writing before the hall is read.
+"""
+import bisect
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert
+from sqlalchemy.exc import OperationalError
+
+from app.cache import catalogue_cache
+from app.database.database import lock_for_write
+from app.models import SessionModel, HallModel, FilmModel, session
+
+DEFAULT_DURATION = 120  # minutes
+MAX_RETRIES = 3
+
+
+class ScheduleError(Exception):
+    """Base class for scheduling failures"""
+
+
+class HallNotFoundError(ScheduleError):
+    """Selected hall doesn't exist"""
+
+
+class FilmNotFoundError(ScheduleError):
+    """Selected film doesn't exist"""
+
+
+class ScheduleConflictError(ScheduleError):
+    """Hall is busy with another session at this time"""
+
+    def __init__(self, session_id):
+        super().__init__(session_id)
+        self.session_id = session_id
+
+
+def longest_duration():
+    """Duration of the longest film, uses index on films.duration"""
+    return session.query(func.max(FilmModel.duration)).scalar() or DEFAULT_DURATION
+
+
+def find_conflict(hall_id, started_at, duration, max_duration=None):
+    """
+        Find session in hall that overlaps with [started_at, started_at + duration).
+        Returns id of conflicting session or None
+    """
+    max_duration = max_duration or longest_duration()
+    candidates = session.query(SessionModel.id, SessionModel.started_at, FilmModel.duration) \
+        .join(FilmModel, SessionModel.film_id == FilmModel.id) \
+        .filter(SessionModel.hall_id == hall_id,
+                SessionModel.started_at > started_at - timedelta(minutes=max_duration),
+                SessionModel.started_at < started_at + timedelta(minutes=duration)) \
+        .all()
+    for id_, other_started_at, other_duration in candidates:
+        if other_started_at + timedelta(minutes=other_duration or DEFAULT_DURATION) > started_at:
+            return id_
+    return None
+
+
+def schedule_session(film_id, hall_id, started_at, price=0):
+    """
+        Create session if hall is free for the whole film. Retries when the database reports a lock conflict.
+            Returns:
+                Created SessionModel
+            Raises:
+                HallNotFoundError, FilmNotFoundError, ScheduleConflictError
+    """
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            return _schedule_session(film_id, hall_id, started_at, price)
+        except OperationalError:
+            session.rollback()
+            if attempt == MAX_RETRIES:
+                raise
+        except ScheduleError:
+            session.rollback()
+            raise
+
+
+def _schedule_session(film_id, hall_id, started_at, price):
+    lock_for_write(session.connection())
+    hall = session.query(HallModel.capacity).filter(HallModel.id == hall_id).with_for_update().first()
+    if hall is None:
+        raise HallNotFoundError(hall_id)
+    duration = session.query(FilmModel.duration).filter(FilmModel.id == film_id).first()
+    if duration is None:
+        raise FilmNotFoundError(film_id)
+
+    conflict = find_conflict(hall_id, started_at, duration[0] or DEFAULT_DURATION)
+    if conflict:
+        raise ScheduleConflictError(conflict)
+
+    sess = SessionModel(film_id=film_id, hall_id=hall_id, started_at=started_at, number_seats=hall.capacity,
+                        price=price)
+    session.add(sess)
+    session.commit()
+    catalogue_cache.invalidate('schedule')
+    return sess
+
+
+def _parse_row(row):
+    if not isinstance(row, dict) or not (row.get("film_id") and row.get("hall_id") and row.get("started_at")):
+        raise ValueError('Please, specify "film_id", "hall_id" and "started_at".')
+    try:
+        started_at = datetime.strptime(row["started_at"], '%Y-%m-%d %H:%M:%S')
+    except (TypeError, ValueError):
+        raise ValueError('"started_at" should look like 2022-06-01 10:00:00.')
+    price = row.get("price") or 0
+    if not isinstance(price, (int, float)) or price < 0:
+        raise ValueError('"price" should be a positive number.')
+    try:
+        return int(row["film_id"]), int(row["hall_id"]), started_at, float(price)
+    except (TypeError, ValueError):
+        raise ValueError('"film_id" and "hall_id" should be numbers.')
+
+
+def _overlapping(intervals, started_at, ends_at, max_duration):
+    """
+        Find interval in sorted list of (started_at, ends_at, owner) that overlaps with new one. Existing
+        intervals can overlap each other (films get longer after scheduling), so every interval starting less
+        than max_duration minutes before the new one is checked, not only the nearest one
+    """
+    position = bisect.bisect_left(intervals, (started_at,))
+    if position < len(intervals) and intervals[position][0] < ends_at:
+        return intervals[position]
+    earliest = started_at - timedelta(minutes=max_duration)
+    for neighbour in reversed(intervals[:position]):
+        if neighbour[0] <= earliest:
+            break
+        if neighbour[1] > started_at:
+            return neighbour
+    return None
+
+
+def schedule_sessions(rows, atomic=False):
+    """
+        Create many sessions at once. Rows are checked against each other and against the existing schedule
+        in one pass: halls and films are read with one IN query each, existing sessions of all halls with one
+        range query, and accepted rows are inserted with one bulk insert. With atomic=True nothing is
+        inserted if any row fails.
+            Returns:
+                List with result of every row: {"index", "status": "created"|"error"|"conflict"|"skipped", "message"}
+    """
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            return _schedule_sessions(rows, atomic)
+        except OperationalError:
+            session.rollback()
+            if attempt == MAX_RETRIES:
+                raise
+
+
+def _schedule_sessions(rows, atomic):
+    results = [{"index": index, "status": "created"} for index in range(len(rows))]
+    parsed = {}
+    for index, row in enumerate(rows):
+        try:
+            parsed[index] = _parse_row(row)
+        except ValueError as e:
+            results[index].update(status="error", message=str(e))
+
+    hall_ids = sorted({hall_id for _, hall_id, _, _ in parsed.values()})
+    film_ids = {film_id for film_id, _, _, _ in parsed.values()}
+    lock_for_write(session.connection())
+    halls = dict(session.query(HallModel.id, HallModel.capacity).filter(HallModel.id.in_(hall_ids))
+                 .order_by(HallModel.id).with_for_update().all())
+    durations = dict(session.query(FilmModel.id, FilmModel.duration).filter(FilmModel.id.in_(film_ids)).all())
+
+    for index, (film_id, hall_id, _, _) in list(parsed.items()):
+        if hall_id not in halls:
+            results[index].update(status="error", message='Such hall not exist. Please, choose another one.')
+        elif film_id not in durations:
+            results[index].update(status="error", message='Such film not exist. Please, choose another one.')
+        else:
+            continue
+        del parsed[index]
+
+    schedule = {hall_id: [] for hall_id in halls}
+    if parsed:
+        max_duration = max(longest_duration(), *(d or DEFAULT_DURATION for d in durations.values()))
+        first = min(started_at for _, _, started_at, _ in parsed.values())
+        last = max(started_at + timedelta(minutes=durations[film_id] or DEFAULT_DURATION)
+                   for film_id, _, started_at, _ in parsed.values())
+        existing = session.query(SessionModel.id, SessionModel.hall_id, SessionModel.started_at, FilmModel.duration) \
+            .join(FilmModel, SessionModel.film_id == FilmModel.id) \
+            .filter(SessionModel.hall_id.in_(list(halls)),
+                    SessionModel.started_at > first - timedelta(minutes=max_duration),
+                    SessionModel.started_at < last) \
+            .all()
+        for id_, hall_id, started_at, duration in existing:
+            ends_at = started_at + timedelta(minutes=duration or DEFAULT_DURATION)
+            schedule[hall_id].append((started_at, ends_at, f'session {id_}'))
+        for intervals in schedule.values():
+            intervals.sort()
+
+    new_sessions = []
+    for index, (film_id, hall_id, started_at, price) in sorted(parsed.items(), key=lambda item: item[1][2]):
+        ends_at = started_at + timedelta(minutes=durations[film_id] or DEFAULT_DURATION)
+        conflict = _overlapping(schedule[hall_id], started_at, ends_at, max_duration)
+        if conflict:
+            results[index].update(status="conflict", message=f'Hall is busy with {conflict[2]}')
+            continue
+        bisect.insort(schedule[hall_id], (started_at, ends_at, f'row {index}'))
+        new_sessions.append({"film_id": film_id, "hall_id": hall_id, "started_at": started_at,
+                             "number_seats": halls[hall_id], "price": price})
+
+    failed = any(result["status"] != "created" for result in results)
+    if new_sessions and not (atomic and failed):
+        session.execute(insert(SessionModel.__table__), new_sessions)
+        session.commit()
+        catalogue_cache.invalidate('schedule')
+    else:
+        session.rollback()
+        for result in results:
+            if result["status"] == "created":
+                result.update(status="skipped", message="Nothing was inserted because other rows failed")
+    return results
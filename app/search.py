@@ -0,0 +1,260 @@
+"""In-process full-text search over films, their directors, genres and casts.
+
+Every film is split into lowercase words kept in an inverted index (word -> film ids
+with the weight of the field the word came from) next to a sorted list of all words,
+so a query word matches whole words and prefixes ("dar" finds "Dark") without
+touching the database. Films are ranked by the sum of weights of matched fields, then
+by rating.
+
+Mapper events only record ids of changed films and actors. After commit those films
+are re-read on the next search. A background thread rebuilds the whole index every
+SEARCH_INDEX_REBUILD_INTERVAL seconds to pick up writes of other processes, so
+searches never wait for a full rebuild (only the very first one builds the index).
+"""
+import bisect
+import heapq
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+
+from app.config import Config
+from app.models import FilmModel, ActorModel, film_actor, session
+
+logger = logging.getLogger(__name__)
+
+WEIGHTS = {'name': 5, 'actor': 3, 'director': 3, 'genre': 1}
+WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    """Lowercase words of text"""
+    return WORD.findall((text or '').lower())
+
+
+class SearchIndex(object):
+    def __init__(self, rebuild_interval=300):
+        self.rebuild_interval = rebuild_interval
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._films = {}  # film_id -> film dict
+        self._words = defaultdict(dict)  # word -> {film_id: weight}
+        self._film_words = {}  # film_id -> set of words
+        self._film_cast = {}  # film_id -> actor ids
+        self._actor_films = defaultdict(set)  # actor_id -> film ids
+        self._sorted_words = []
+        self._sorted_dirty = False
+        self._changed_films = set()
+        self._changed_actors = set()
+        self._refreshed_during_load = None
+        self._built_at = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start background rebuilds, does nothing when rebuild_interval is 0 or it is already running"""
+        if self.rebuild_interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='search-index-rebuild', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def film_changed(self, film_id):
+        """Re-read film on the next search"""
+        with self._lock:
+            self._changed_films.add(film_id)
+
+    def actor_changed(self, actor_id):
+        """Re-read all films of actor on the next search"""
+        with self._lock:
+            self._changed_actors.add(actor_id)
+
+    def load(self):
+        """
+            Build the index from scratch with three queries. Films re-read by searches meanwhile are
+            re-read again on the next search, the rebuild may have read them before they changed
+        """
+        with self._load_lock:
+            with self._lock:
+                changed = self._changed_films, self._changed_actors
+                self._changed_films, self._changed_actors = set(), set()
+                self._refreshed_during_load = set()
+            try:
+                self._load()
+            except Exception:
+                with self._lock:
+                    self._changed_films |= changed[0]
+                    self._changed_actors |= changed[1]
+                raise
+            finally:
+                with self._lock:
+                    self._changed_films |= self._refreshed_during_load
+                    self._refreshed_during_load = None
+
+    def _load(self):
+        films = {film.id: film for film in session.query(FilmModel).all()}
+        casts = defaultdict(list)
+        rows = session.query(film_actor.c.films_id, ActorModel.id, ActorModel.name, ActorModel.surname) \
+            .join(ActorModel, ActorModel.id == film_actor.c.actors_id).all()
+        for film_id, actor_id, name, surname in rows:
+            casts[film_id].append((actor_id, name, surname))
+        with self._lock:
+            self._films.clear()
+            self._words.clear()
+            self._film_words.clear()
+            self._film_cast.clear()
+            self._actor_films.clear()
+            for film_id, film in films.items():
+                self._add(film, casts[film_id])
+            self._sorted_words = sorted(self._words)
+            self._sorted_dirty = False
+            self._built_at = time.monotonic()
+
+    def search(self, query, limit=20):
+        """
+            Films matching every word of query, best first.
+            Returns list of film dictionaries with "score"
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        if self._built_at is None:
+            self.load()
+        else:
+            self._refresh()
+        with self._lock:
+            if self._sorted_dirty:
+                self._sorted_words = sorted(self._words)
+                self._sorted_dirty = False
+            scores = None
+            for term in terms:
+                term_scores = defaultdict(int)
+                for word in self._prefixed(term):
+                    weight = 2 if word == term else 1
+                    for film_id, field_weight in self._words.get(word, {}).items():
+                        term_scores[film_id] = max(term_scores[film_id], field_weight * weight)
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {film_id: score + term_scores[film_id] for film_id, score in scores.items()
+                              if film_id in term_scores}
+                if not scores:
+                    return []
+            ranked = heapq.nsmallest(limit, scores.items(),
+                                     key=lambda item: (-item[1], -(self._films[item[0]]['rating'] or 0), item[0]))
+            return [dict(self._films[film_id], score=score) for film_id, score in ranked]
+
+    def _prefixed(self, term):
+        position = bisect.bisect_left(self._sorted_words, term)
+        while position < len(self._sorted_words) and self._sorted_words[position].startswith(term):
+            yield self._sorted_words[position]
+            position += 1
+
+    def _refresh(self):
+        with self._lock:
+            film_ids, actor_ids = self._changed_films, self._changed_actors
+            self._changed_films, self._changed_actors = set(), set()
+            for actor_id in actor_ids:
+                film_ids |= self._actor_films.get(actor_id, set())
+        if not (film_ids or actor_ids):
+            return
+        if actor_ids:
+            film_ids |= set(session.execute(select(film_actor.c.films_id)
+                                            .where(film_actor.c.actors_id.in_(actor_ids))).scalars())
+        films = session.query(FilmModel).filter(FilmModel.id.in_(film_ids)).all()
+        casts = defaultdict(list)
+        rows = session.query(film_actor.c.films_id, ActorModel.id, ActorModel.name, ActorModel.surname) \
+            .join(ActorModel, ActorModel.id == film_actor.c.actors_id) \
+            .filter(film_actor.c.films_id.in_(film_ids)).all()
+        for film_id, actor_id, name, surname in rows:
+            casts[film_id].append((actor_id, name, surname))
+        with self._lock:
+            if self._refreshed_during_load is not None:
+                self._refreshed_during_load |= film_ids
+            for film_id in film_ids:
+                self._remove(film_id)
+            for film in films:
+                self._add(film, casts[film.id])
+
+    def _add(self, film, cast):
+        fields = [('name', film.name), ('director', film.director), ('genre', film.genre)]
+        fields += [('actor', f'{name} {surname}') for _, name, surname in cast]
+        words = set()
+        for field, text in fields:
+            for word in tokenize(text):
+                if word not in self._words:
+                    self._sorted_dirty = True
+                postings = self._words[word]
+                postings[film.id] = max(postings.get(film.id, 0), WEIGHTS[field])
+                words.add(word)
+        for actor_id, _, _ in cast:
+            self._actor_films[actor_id].add(film.id)
+        self._film_cast[film.id] = {actor_id for actor_id, _, _ in cast}
+        self._films[film.id] = FilmModel.to_dict(film)
+        self._film_words[film.id] = words
+
+    def _remove(self, film_id):
+        for word in self._film_words.pop(film_id, ()):
+            postings = self._words.get(word)
+            if postings is None:
+                continue
+            postings.pop(film_id, None)
+            if not postings:
+                del self._words[word]
+                self._sorted_dirty = True
+        for actor_id in self._film_cast.pop(film_id, ()):
+            self._actor_films[actor_id].discard(film_id)
+        self._films.pop(film_id, None)
+
+    def _run(self):
+        while not self._stopped.wait(self.rebuild_interval):
+            try:
+                self.load()
+            except Exception:
+                logger.exception('Rebuild of search index failed')
+            finally:
+                session.remove()
+
+
+search_index = SearchIndex(rebuild_interval=Config.SEARCH_INDEX_REBUILD_INTERVAL)
+
+
+def _record(target, key):
+    db_session = object_session(target)
+    if db_session is not None:
+        db_session.info.setdefault(key, set()).add(target.id)
+
+
+@event.listens_for(FilmModel, 'after_insert')
+@event.listens_for(FilmModel, 'after_update')
+@event.listens_for(FilmModel, 'after_delete')
+def _film_written(mapper, connection, target):
+    _record(target, 'search_films')
+
+
+@event.listens_for(ActorModel, 'after_insert')
+@event.listens_for(ActorModel, 'after_update')
+@event.listens_for(ActorModel, 'after_delete')
+def _actor_written(mapper, connection, target):
+    _record(target, 'search_actors')
+
+
+@event.listens_for(Session, 'after_commit')
+def _committed(db_session):
+    for film_id in db_session.info.pop('search_films', ()):
+        search_index.film_changed(film_id)
+    for actor_id in db_session.info.pop('search_actors', ()):
+        search_index.actor_changed(actor_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _rolled_back(db_session):
+    db_session.info.pop('search_films', None)
+    db_session.info.pop('search_actors', None)
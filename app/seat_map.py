@@ -0,0 +1,100 @@
+"""Compact seat-occupancy bitmap stored per session.
+
+Bit ``n`` of the map is set when seat ``n`` is sold, so checking a seat is O(1)
+and listing free seats only walks ``capacity / 8`` bytes instead of ticket rows.
+"""
+
+
+class SeatMap(object):
+    __slots__ = ('_bits',)
+
+    def __init__(self, data=b''):
+        self._bits = bytearray(data or b'')
+
+    @classmethod
+    def from_seats(cls, seats):
+        """Build a map from an iterable of sold seat numbers"""
+        seat_map = cls()
+        for seat in seats:
+            seat_map.take(seat)
+        return seat_map
+
+    def to_bytes(self):
+        """Serialized form stored in SessionModel.seat_map"""
+        return bytes(self._bits)
+
+    def is_taken(self, seat):
+        """Check if selected seat is already sold"""
+        if not isinstance(seat, int) or seat < 0:
+            return False
+        index, bit = divmod(seat, 8)
+        if index >= len(self._bits):
+            return False
+        return bool(self._bits[index] & (1 << bit))
+
+    def take(self, seat):
+        """Mark seat as sold, growing the map if needed. Seats are numbered from 1"""
+        if seat < 1:
+            raise ValueError(f'Seat numbers start from 1, got {seat}')
+        index, bit = divmod(seat, 8)
+        if index >= len(self._bits):
+            self._bits.extend(b'\x00' * (index + 1 - len(self._bits)))
+        self._bits[index] |= 1 << bit
+
+    def release(self, seat):
+        """Mark seat as free again"""
+        index, bit = divmod(seat, 8)
+        if index < len(self._bits):
+            self._bits[index] &= ~(1 << bit) & 0xFF
+
+    def taken(self):
+        """List of sold seats in ascending order"""
+        seats = []
+        for index, byte in enumerate(self._bits):
+            if not byte:
+                continue
+            for bit in range(8):
+                if byte & (1 << bit):
+                    seats.append(index * 8 + bit)
+        return seats
+
+    def count(self):
+        """Number of sold seats"""
+        return sum(bin(byte).count('1') for byte in self._bits)
+
+    def free(self, capacity):
+        """List of free seats numbered from 1 to capacity"""
+        seats = []
+        last = capacity // 8
+        for index in range(last + 1):
+            byte = self._bits[index] if index < len(self._bits) else 0
+            if byte == 0xFF:
+                continue
+            for bit in range(8):
+                seat = index * 8 + bit
+                if 1 <= seat <= capacity and not byte & (1 << bit):
+                    seats.append(seat)
+        return seats
+
+    def adjacent(self, count, capacity):
+        """
+            Best block of count consecutive free seats: among all free runs the block
+            closest to the middle of the hall is chosen. Returns list of seats or None
+        """
+        if count < 1:
+            return None
+        middle = (capacity + 1) / 2
+        best, best_distance = None, None
+        run_start = None
+        for seat in range(1, capacity + 2):
+            if seat <= capacity and not self.is_taken(seat):
+                if run_start is None:
+                    run_start = seat
+                continue
+            if run_start is not None and seat - run_start >= count:
+                start = min(max(round(middle - (count - 1) / 2), run_start), seat - count)
+                distance = abs(start + (count - 1) / 2 - middle)
+                if best_distance is None or distance < best_distance:
+                    best, best_distance = start, distance
+            run_start = None
+        return list(range(best, best + count)) if best is not None else None
@@ -5,3 +5,6 @@ from .sessions import sessions_bp
 from .halls import halls_bp
 from .tickets import tickets_bp
 from .actors import actors_bp
+from .holds import holds_bp
+from .analytics import analytics_bp
+from .search import search_bp
@@ -2,7 +2,9 @@ from flask import jsonify, request, Blueprint
 from flask_jwt_extended import jwt_required
 
 from app.models import ActorModel
+from app.config import Config
 from app.decorators import admin_group_required
+from app.pagination import page_args, page_response, PAGE_ARGS_MESSAGE
 
 actors_bp = Blueprint('actors', __name__)
 
@@ -12,15 +14,59 @@ actors_bp = Blueprint('actors', __name__)
 @admin_group_required
 def get_actors():
     """
-        Get all actors from database. This function does not accept parameters
+        Get actors from database page by page. Optional parameters: "after" - id of the last actor of previous page,
+        "limit" - size of the page, "film_id" - only actors of selected film.
             Returns:
-                All actors as list of dictionaries.
+                Actors as list of dictionaries.
     """
-    film_id = request.args.get('film_id')
-    result = ActorModel.return_all()
+    try:
+        after, limit = page_args()
+        film_id = request.args.get('film_id')
+        film_id = int(film_id) if film_id else None
+    except ValueError:
+        return jsonify({"message": PAGE_ARGS_MESSAGE}), 400
     if film_id:
-        result = ActorModel.find_by_film_id(film_id, 0, 20)
-    return jsonify(result)
+        result = ActorModel.find_by_film_id(film_id, after, limit)
+    else:
+        result = ActorModel.return_page(after, limit)
+    return page_response(result, limit)
+
+
+@actors_bp.route("/films/<int:id_>/actors", methods=["GET"])
+@jwt_required()
+def get_cast(id_):
+    """
+        Get cast of selected film page by page. Optional parameters: "after" - id of the last actor of previous page,
+        "limit" - size of the page.
+            Args:
+                id_: id of film
+            Returns:
+                Actors as list of dictionaries.
+    """
+    try:
+        after, limit = page_args()
+    except ValueError:
+        return jsonify({"message": PAGE_ARGS_MESSAGE}), 400
+    return page_response(ActorModel.find_by_film_id(id_, after, limit), limit)
+
+
+@actors_bp.route("/casts", methods=["GET"])
+@jwt_required()
+def get_casts():
+    """
+        Get casts of several films with one request.
+            Example:
+                >> /casts?film_ids=1,2,3
+            Returns:
+                {"1": [{"id": 1, "name": "Tom", "surname": "Holland"}], "2": [], "3": [...]}
+    """
+    try:
+        film_ids = [int(id_) for id_ in request.args.get('film_ids', '').split(',') if id_]
+    except ValueError:
+        return jsonify({"message": '"film_ids" should be integers separated by commas.'}), 400
+    if not film_ids or len(film_ids) > Config.PAGE_LIMIT_MAX:
+        return jsonify({"message": f'Please, specify from 1 to {Config.PAGE_LIMIT_MAX} "film_ids".'}), 400
+    return jsonify(ActorModel.find_by_film_ids(film_ids))
 
 
 @actors_bp.route("/actors", methods=["POST"])
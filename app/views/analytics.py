@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from flask import jsonify, request, Blueprint
+from flask_jwt_extended import jwt_required
+
+from app.analytics import sales, GROUP_MESSAGE
+from app.decorators import admin_group_required
+
+analytics_bp = Blueprint('analytics', __name__)
+
+
+@analytics_bp.route("/analytics/sales", methods=["GET"])
+@jwt_required()
+@admin_group_required
+def get_sales():
+    """
+        Admin can view sales statistic: number of sessions, sold tickets, occupancy in percent of hall capacity
+        and revenue grouped by film, hall, day or genre. Optional filters: "film_id", "from" and "to" dates.
+            Example:
+                >> /analytics/sales?group_by=day&from=2022-06-01&to=2022-07-01
+            Returns:
+                [{"day": "2022-06-01", "sessions": 8, "sold": 230, "capacity": 400, "occupancy": 57.5,
+                "revenue": 1725.0}, ...]
+        """
+    try:
+        date_from = request.args.get('from')
+        date_from = datetime.strptime(date_from, '%Y-%m-%d') if date_from else None
+        date_to = request.args.get('to')
+        date_to = datetime.strptime(date_to, '%Y-%m-%d') if date_to else None
+        film_id = request.args.get('film_id')
+        film_id = int(film_id) if film_id else None
+    except ValueError:
+        return jsonify({"message": '"from" and "to" should look like 2022-06-01, "film_id" should be integer.'}), 400
+
+    try:
+        result = sales(request.args.get('group_by', 'film'), film_id, date_from, date_to)
+    except ValueError:
+        return jsonify({"message": GROUP_MESSAGE}), 400
+    return jsonify(result)
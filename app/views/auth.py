@@ -3,7 +3,8 @@ from flask_jwt_extended import (
     create_access_token, create_refresh_token, get_jwt,
     jwt_required, get_jwt_identity, get_current_user, current_user)
 
-from app.models import UserModel, RevokedTokenModel
+from app.models import UserModel
+from app.blocklist import revoked_tokens
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -76,7 +77,7 @@ def login():
 
     groups = {"groups": lst}
 
-    if UserModel.verify_hash(password, current_user_.hashed_password):
+    if current_user_.check_password(password):
         access_token = create_access_token(identity=username, additional_claims=groups)
         refresh_token = create_refresh_token(identity=username, additional_claims=groups)
         return {
@@ -110,10 +111,8 @@ def post():
 @auth_bp.route("/auth/logout-access", methods=["POST"])
 @jwt_required()
 def logout_access():
-    jti = get_jwt()['jti']
     try:
-        revoked_token = RevokedTokenModel(jti=jti)
-        revoked_token.add()
+        revoked_tokens.revoke(get_jwt())
         return {'message': 'Access token has been revoked'}
     except Exception as e:
         return {
@@ -125,10 +124,8 @@ def logout_access():
 @auth_bp.route("/auth/logout-refresh", methods=["POST"])
 @jwt_required(refresh=True)
 def logout_refresh():
-    jti = get_jwt()['jti']  # id of a jwt accessing this post method
     try:
-        revoked_token = RevokedTokenModel(jti=jti)
-        revoked_token.add()
+        revoked_tokens.revoke(get_jwt())
         return {"message": "Refresh token has been revoked"}
     except Exception:
         return {"message": "Something went wrong while revoking token"}, 500
@@ -144,7 +141,7 @@ def update_password():
     if not user:
         return jsonify({"message": "User not found."}), 404
     if new_password:
-        if user.verify_hash(password, user.hashed_password):
+        if user.check_password(password):
 
             user.hashed_password = UserModel.generate_hash(new_password)
             user.save_to_db()
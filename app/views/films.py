@@ -3,24 +3,35 @@ from flask_jwt_extended import jwt_required
 
 from app.models import FilmModel
 from app.decorators import admin_group_required
+from app.http_cache import conditional
+from app.pagination import page_args, page_response, PAGE_ARGS_MESSAGE
 
 films_bp = Blueprint('films', __name__)
 
 
 @films_bp.route("/films", methods=["GET"])
 @jwt_required()
+@conditional('films')
 def get_films():
     """
-        Get all films from database. This function does not accept parameters
+        Get films from database page by page. Optional parameters: "after" - id of the last film of previous
+        page, "limit" - size of the page. Link to the next page is returned in "Link" and "X-Next-Cursor" headers.
+            Example:
+                >> /films?after=100&limit=50
             Returns:
-                All films as list of dictionaries.
+                Films as list of dictionaries.
     """
-    films = FilmModel.return_all()
-    return jsonify(films)
+    try:
+        after, limit = page_args()
+    except ValueError:
+        return jsonify({"message": PAGE_ARGS_MESSAGE}), 400
+    films = FilmModel.return_page(after, limit)
+    return page_response(films, limit)
 
 
 @films_bp.route("/films/<int:id_>", methods=["GET"])
 @jwt_required()
+@conditional('films')
 def get_film(id_):
     """
         Get some specific film from database. This function  accept id_ parameters.
@@ -45,7 +56,7 @@ def create_film():
             Example:
                 >> {"name":'Future',"genre":'superhero', "director":'Bob Ace',
                  "image":"https://planetakino.ua/res/get-poster/00000000000000000000000000003493/vend.jpg",
-                 "rating":8.9}
+                 "rating":8.9, "duration":125}
             Returns:
                 "id":1, "name": Future
         """
@@ -57,11 +68,14 @@ def create_film():
     director = request.json.get("director")
     rating = request.json.get("rating")
     image = request.json.get("image")
+    duration = request.json.get("duration")
     if not (genre and name and director and rating and image):
         return jsonify({"message": 'Please, specify "name", "genre", "director", "image" and "rating".'}), 400
+    if duration is not None and (not isinstance(duration, int) or isinstance(duration, bool) or duration < 1):
+        return jsonify({"message": '"duration" should be a positive integer (minutes).'}), 400
 
     film = FilmModel(
-        name=name, genre=genre, director=director, rating=rating, image=image)
+        name=name, genre=genre, director=director, rating=rating, image=image, duration=duration)
 
     film.save_to_db()
 
@@ -87,6 +101,9 @@ def update_film(id_):
     director = request.json.get("director")
     rating = request.json.get("rating")
     image = request.json.get("image")
+    duration = request.json.get("duration")
+    if duration is not None and (not isinstance(duration, int) or isinstance(duration, bool) or duration < 1):
+        return jsonify({"message": '"duration" should be a positive integer (minutes).'}), 400
 
     film = FilmModel.find_by_id(id_, to_dict=False)
     if not film:
@@ -102,6 +119,8 @@ def update_film(id_):
         film.rating = rating
     if image:
         film.image = image
+    if duration is not None:
+        film.duration = duration
     film.save_to_db()
     return jsonify({"message": "Updated"})
 
@@ -3,6 +3,8 @@ from flask_jwt_extended import jwt_required
 
 from app.models import HallModel
 from app.decorators import admin_group_required
+from app.http_cache import conditional
+from app.pagination import page_args, page_response, PAGE_ARGS_MESSAGE
 
 halls_bp = Blueprint('halls', __name__)
 
@@ -10,19 +12,26 @@ halls_bp = Blueprint('halls', __name__)
 @halls_bp.route("/halls", methods=["GET"])
 @jwt_required()
 @admin_group_required
+@conditional('halls')
 def get_halls():
     """
-        Get all halls in cinema. Only admins can get halls.
+        Get halls in cinema page by page. Only admins can get halls.
+        Optional parameters: "after" - id of the last hall of previous page, "limit" - size of the page.
             Returns:
-                All halls as list of dictionaries.
+                Halls as list of dictionaries.
         """
-    halls = HallModel.return_all()
-    return jsonify(halls)
+    try:
+        after, limit = page_args()
+    except ValueError:
+        return jsonify({"message": PAGE_ARGS_MESSAGE}), 400
+    halls = HallModel.return_page(after, limit)
+    return page_response(halls, limit)
 
 
 @halls_bp.route("/halls/<int:id_>", methods=["GET"])
 @jwt_required()
 @admin_group_required
+@conditional('halls')
 def get_hall(id_):
     """
         Get some specific hall from database. This function  accept id_ parameters.
@@ -0,0 +1,72 @@
+from flask import jsonify, request, Blueprint
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from app.booking import hold_seats, InvalidSeatError, SeatTakenError, NoAdjacentSeatsError, SessionNotFoundError
+from app.config import Config
+from app.holds import seat_holds, HoldNotFoundError
+from app.models import UserModel
+
+holds_bp = Blueprint('holds', __name__)
+
+
+@holds_bp.route("/holds", methods=["POST"])
+@jwt_required()
+def create_hold():
+    """
+        Hold seats of a session while user goes through checkout. Held seats are not shown as available
+        and can't be bought by other users until the hold expires or is released.
+        Pass list of "seats" or "count" to hold the best block of adjacent free seats.
+        Seats are held for the user of the access token.
+            Example:
+                >> {"seats": [10, 11], "session_id": 1}
+            Returns:
+                "id": "3f2a...", "session_id": 1, "seats": [10, 11], "expires_in": 300
+        """
+    message = f'Please, specify "session_id" and "seats" or "count" (at most {Config.GROUP_BOOKING_MAX}).'
+    if not request.json:
+        return jsonify({"message": message}), 400
+    seats = request.json.get("seats")
+    count = request.json.get("count")
+    session_id = request.json.get("session_id")
+    if seats is not None:
+        valid = isinstance(seats, list) and 0 < len(seats) <= Config.GROUP_BOOKING_MAX \
+            and all(isinstance(seat, int) and seat > 0 for seat in seats)
+    else:
+        valid = isinstance(count, int) and 0 < count <= Config.GROUP_BOOKING_MAX
+    if not (valid and session_id):
+        return jsonify({"message": message}), 400
+    user_id = UserModel.find_id_by_username(get_jwt_identity())
+    if user_id is None:
+        return jsonify({"message": "User not found."}), 401
+
+    try:
+        hold = hold_seats(session_id, user_id, seats=seats, count=None if seats is not None else count)
+    except InvalidSeatError as e:
+        return jsonify({"message": f'"seats" should be numbers from 1 to {e.capacity}.'}), 400
+    except SeatTakenError as e:
+        return jsonify({'Please, choose another seat. Places that are not available': e.taken}), 409
+    except NoAdjacentSeatsError:
+        return jsonify({"message": "Sorry, but there are not enough seats next to each other"}), 409
+    except SessionNotFoundError:
+        return jsonify({"message": "Such session not exist. Please,try another one"}), 400
+    return jsonify(hold.to_dict()), 201
+
+
+@holds_bp.route("/holds/<hold_id>", methods=["DELETE"])
+@jwt_required()
+def delete_hold(hold_id):
+    """
+        Release held seats before the hold expires. Only the user who made the hold can release it.
+            Args:
+                hold_id: id of hold returned by POST /holds
+            Returns:
+                "message":"Seats were released"
+        """
+    user_id = UserModel.find_id_by_username(get_jwt_identity())
+    if user_id is None:
+        return jsonify({"message": "User not found."}), 401
+    try:
+        seat_holds.release(hold_id, user_id)
+    except HoldNotFoundError:
+        return jsonify({"message": "Hold not found."}), 404
+    return jsonify({"message": "Seats were released"})
@@ -0,0 +1,36 @@
+from flask import jsonify, request, Blueprint
+from flask_jwt_extended import jwt_required
+
+from app.models import SessionModel
+from app.search import search_index
+
+search_bp = Blueprint('search', __name__)
+
+
+@search_bp.route("/search", methods=["GET"])
+@jwt_required()
+def search():
+    """
+        Search films by words of name, director, genre and actors. Words may be partial and case doesn't matter,
+        every word has to match. Films are ranked by where the words were found, then by rating.
+        Upcoming sessions of found films are returned in the same response.
+            Example:
+                >> /search?q=dark nol&limit=5
+            Returns:
+                "films": [{"id": 3, "name": "The Dark Knight", ..., "score": 13}],
+                "sessions": [{"id": 12, "film_id": 3, "started_at": ...}]
+        """
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({"message": 'Please, specify "q".'}), 400
+    try:
+        limit = int(request.args.get('limit', 20))
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        return jsonify({"message": '"limit" should be positive integer.'}), 400
+    limit = min(limit, 100)
+
+    films = search_index.search(q, limit=limit)
+    sessions = SessionModel.find_upcoming_by_film_ids([film['id'] for film in films]) if films else []
+    return jsonify({"films": films, "sessions": sessions})
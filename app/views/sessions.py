@@ -1,11 +1,15 @@
-import math
 from datetime import datetime
 
 from flask import jsonify, request, Blueprint
 from flask_jwt_extended import jwt_required
 
-from app.models import SessionModel, HallModel, FilmModel, session
+from app.models import SessionModel
+from app.config import Config
+from app.scheduling import schedule_session, schedule_sessions
+from app.scheduling import HallNotFoundError, FilmNotFoundError, ScheduleConflictError
 from app.decorators import admin_group_required
+from app.export import export_format, stream_export
+from app.pagination import page_args, page_response, PAGE_ARGS_MESSAGE
 
 
 sessions_bp = Blueprint('sessions', __name__)
@@ -15,8 +19,11 @@ sessions_bp = Blueprint('sessions', __name__)
 @jwt_required()
 def get_sessions():
     """
-        Get all sessions with some filter of film fields or without it. You can filter by: film genre,name,actor,
-        director, started time of session. Also, you can sort sessions by date.
+        Get upcoming sessions with some filter of film fields or without it. You can filter by: film genre,name,actor,
+        director, started time of session. Filters can be combined. Also, you can sort sessions by date.
+        Sessions are returned page by page: "after" - id of the last session of previous page, "limit" - size
+        of the page. Link to the next page is returned in "Link" and "X-Next-Cursor" headers.
+        With ?format=ndjson or ?format=csv (or the same Accept header) all matching sessions are streamed as a file.
             Example 1:
                 >> /sessions?genre=superhero
             Returns:
@@ -25,32 +32,36 @@ def get_sessions():
                 >> /sessions?sort=True
             Returns:
                 Session(s) sorted by datetime
+            Example 3:
+                >> /sessions?genre=superhero&director=Bob Ace&after=20&limit=10
+            Returns:
+                Page of superhero sessions directed by Bob Ace after session with id 20
         """
-    genre = request.args.get('genre')
-    name = request.args.get('film_name')
-    actor_name = request.args.get('actor_name')
-    director = request.args.get('director')
     started_at = request.args.get('started_at')
-    sorted_sessions = request.args.get('sort')
-    result = SessionModel.return_all()
-    if genre:
-        result = SessionModel.find_by_genre(genre)
-    if name:
-        result = SessionModel.find_by_name(name)
-    if actor_name:
-        result = SessionModel.find_by_actor(actor_name)
-    if director:
-        result = SessionModel.find_by_director(director)
     if started_at:
-        started_time = datetime.strptime(started_at, '%Y-%m-%d %H:%M:%S')
-        result = SessionModel.find_by_date(started_time)
-    if sorted_sessions == 'True' or sorted_sessions == '1':
-        sessions = SessionModel.return_all()
-        result = sorted(
-            sessions,
-            key=lambda x: (x['started_at']), reverse=False
-        )
-    return jsonify(result)
+        started_at = datetime.strptime(started_at, '%Y-%m-%d %H:%M:%S')
+    try:
+        after, limit = page_args()
+    except ValueError:
+        return jsonify({"message": PAGE_ARGS_MESSAGE}), 400
+
+    filters = dict(
+        genre=request.args.get('genre'),
+        film_name=request.args.get('film_name'),
+        actor_name=request.args.get('actor_name'),
+        director=request.args.get('director'),
+        started_at=started_at,
+        sort=request.args.get('sort') in ('True', '1'),
+        after=after)
+    try:
+        fmt = export_format()
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    if fmt:
+        return stream_export(SessionModel.search_query(**filters), SessionModel, fmt, 'sessions')
+
+    result = SessionModel.search(limit=limit, **filters)
+    return page_response(result, limit)
 
 
 @sessions_bp.route("/sessions", methods=["POST"])
@@ -58,56 +69,68 @@ def get_sessions():
 @admin_group_required
 def create_session():
     """
-        Create  session with some fields. Only admins can create session.
-        If timeline in hall is already reserved by another session then you will get message with info about it
+        Create  session with some fields. Only admins can create session. Number of seats is taken from the hall.
+        Optional "price" is the price of one ticket.
+        If timeline in hall is already reserved by another session for the duration of its film
+        then you will get message with info about it
             Example:
-                >> {"film_id":1, "hall_id":1, "started_at":'2022-06-01 10:00:00', "number_seats":50}
+                >> {"film_id":1, "hall_id":1, "started_at":'2022-06-01 10:00:00', "price": 7.5}
             Returns:
                 "id":1, "started_at": '2022-06-01 10:00:00'
         """
     if not request.json:
-        return jsonify({"message": 'Please, specify "film_id", "hall_id", "number_seats" and "started_at".'}), 400
+        return jsonify({"message": 'Please, specify "film_id", "hall_id" and "started_at".'}), 400
 
     film_id = request.json.get("film_id")
     hall_id = request.json.get("hall_id")
     started_at = request.json.get("started_at")
+    if not (film_id and hall_id and started_at):
+        return jsonify({"message": 'Please, specify "film_id", "hall_id" and "started_at".'}), 400
     started_at = datetime.strptime(started_at, '%Y-%m-%d %H:%M:%S')
-    number_seats = session.query(HallModel.capacity).filter(HallModel.id == hall_id)
-
-    sessions = SessionModel.return_all()
-    for elem in sessions:
-        if hall_id == elem['hall_id']:
-            difference = started_at - elem['started_at']
-            difference = difference.total_seconds() / 60
-            difference = math.fabs(difference)
-            if difference < 120:
-                return jsonify({"message": 'At this time, another film has already been registered in the hall.'
-                                           ' Please choose another time'})
-
-    if not (film_id and hall_id and started_at and number_seats):
-        return jsonify({"message": 'Please, specify "film_id", "hall_id", "number_seats" and "started_at".'}), 400
-
-    lst_halls = []
-    lst_films = []
-    halls = HallModel.return_all()
-    films = FilmModel.return_all()
-    for h in halls:
-        lst_halls.append(h['id'])
-    for f in films:
-        lst_films.append(f['id'])
-
-    if hall_id not in lst_halls:
+    price = request.json.get("price") or 0
+    if not isinstance(price, (int, float)) or price < 0:
+        return jsonify({"message": '"price" should be a positive number.'}), 400
+
+    try:
+        sess = schedule_session(film_id, hall_id, started_at, price)
+    except HallNotFoundError:
         return jsonify({"message": 'Such hall not exist. Please, choose another one.'}), 400
-    if film_id not in lst_films:
+    except FilmNotFoundError:
         return jsonify({"message": 'Such film not exist. Please, choose another one.'}), 400
-
-    sess = SessionModel(
-        film_id=film_id, hall_id=hall_id, started_at=started_at, number_seats=number_seats)
-    sess.save_to_db()
+    except ScheduleConflictError:
+        return jsonify({"message": 'At this time, another film has already been registered in the hall.'
+                                   ' Please choose another time'}), 409
 
     return jsonify({"id": sess.id, "started_at": sess.started_at, "film_id": sess.film_id}), 201
 
 
+@sessions_bp.route("/sessions/bulk", methods=["POST"])
+@jwt_required()
+@admin_group_required
+def create_sessions():
+    """
+        Create many sessions at once, e.g. the programme of a whole week. Only admins can create sessions.
+        Rows are checked against each other and against existing sessions, result is reported for every row.
+        With "atomic": true nothing is created if any row fails.
+            Example:
+                >> {"sessions": [{"film_id":1, "hall_id":1, "started_at":'2022-06-01 10:00:00'},
+                                 {"film_id":2, "hall_id":1, "started_at":'2022-06-01 11:00:00'}]}
+            Returns:
+                "created": 1, "failed": 1, "results": [{"index": 0, "status": "created"},
+                {"index": 1, "status": "conflict", "message": "Hall is busy with row 0"}]
+        """
+    rows = request.json.get("sessions") if isinstance(request.json, dict) else None
+    if not rows or not isinstance(rows, list):
+        return jsonify({"message": 'Please, specify list of "sessions".'}), 400
+    if len(rows) > Config.BULK_SESSIONS_MAX:
+        return jsonify({"message": f'Too many sessions, at most {Config.BULK_SESSIONS_MAX} are allowed.'}), 400
+
+    results = schedule_sessions(rows, atomic=bool(request.json.get("atomic")))
+    created = sum(result["status"] == "created" for result in results)
+    return jsonify({"created": created, "failed": len(results) - created, "results": results}), \
+        201 if created else 400
+
+
 @sessions_bp.route("/sessions/<int:id_>", methods=["DELETE"])
 @jwt_required()
 @admin_group_required
@@ -1,8 +1,14 @@
 from flask import jsonify, request, Blueprint
-from flask_jwt_extended import jwt_required, get_jwt
+from flask_jwt_extended import jwt_required, get_jwt_identity
 
 from app.models import TicketModel, SessionModel, UserModel, session
+from app.booking import buy_seats, InvalidSeatError, SeatTakenError, SoldOutError, SessionNotFoundError, \
+    NoAdjacentSeatsError
+from app.config import Config
+from app.holds import seat_holds
 from app.decorators import admin_group_required
+from app.export import export_format, stream_export
+from app.pagination import page_args, page_response, PAGE_ARGS_MESSAGE
 
 tickets_bp = Blueprint('tickets', __name__)
 
@@ -12,28 +18,45 @@ tickets_bp = Blueprint('tickets', __name__)
 @admin_group_required
 def get_tickets():
     """
-        Get all tickets from database. This function does not accept parameters
+        Get tickets from database page by page. Optional parameters: "after" - id of the last ticket of previous page,
+        "limit" - size of the page. With ?format=ndjson or ?format=csv (or the same Accept header) all tickets
+        are streamed as a file instead.
             Returns:
-                All tickets as list of dictionaries.
+                Tickets as list of dictionaries.
     """
-    tickets = TicketModel.return_all()
-    return jsonify(tickets)
+    try:
+        fmt = export_format()
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    if fmt:
+        return stream_export(session.query(TicketModel).order_by(TicketModel.id), TicketModel, fmt, 'tickets')
+
+    try:
+        after, limit = page_args()
+    except ValueError:
+        return jsonify({"message": PAGE_ARGS_MESSAGE}), 400
+    tickets = TicketModel.return_page(after, limit)
+    return page_response(tickets, limit)
 
 
 @tickets_bp.route("/mytickets", methods=["GET"])
 @jwt_required()
 def get_my_tickets():
     """
-        User can view the history of ticket purchases. This function does not accept parameters
+        User can view the history of ticket purchases page by page. Optional parameters: "after" - id of the last
+        ticket of previous page, "limit" - size of the page.
                 Returns:
-                    All user's tickets as list of dictionaries.
+                    User's tickets as list of dictionaries.
         """
-    jwt = get_jwt()
-    name = jwt.get("sub")
-    user = session.query(UserModel).filter(UserModel.name == name).first()
-    id_ = user.id
-    tickets = TicketModel.find_by_user_id(id_, 0, 10)
-    return jsonify(tickets)
+    try:
+        after, limit = page_args()
+    except ValueError:
+        return jsonify({"message": PAGE_ARGS_MESSAGE}), 400
+    user_id = UserModel.find_id_by_username(get_jwt_identity())
+    if user_id is None:
+        return jsonify({"message": "User not found."}), 401
+    tickets = TicketModel.find_by_user_id(user_id, after, limit)
+    return page_response(tickets, limit)
 
 
 @tickets_bp.route("/free_seats/<int:id_>", methods=["GET"])
@@ -41,29 +64,18 @@ def get_my_tickets():
 def get_free_seats_by_session(id_):
     """
         User can see which places are available for a particular session.This function accept parameter: session id
+        Seats held by users during checkout are not available.
                     Returns:
                         All available places for session.
             """
-    blocked = session.query(TicketModel).filter(TicketModel.session_id == id_).all()
-    lst = []
-    lst_seats = []
-    lst_sessions = []
-    for s in blocked:
-        lst.append(s.seat)
-    session_ = session.query(SessionModel).filter(SessionModel.id == id_).first()
-    session__ = SessionModel.return_all()
-
-    for s in session__:
-        lst_sessions.append(s['id'])
-
-    if id_ not in lst_sessions:
+    seats = SessionModel.find_seats(id_, upcoming=True)
+    if seats is None:
         return jsonify({"message": "Such session not exist. Please,try another one"}), 400
 
-    count_seats = len(lst) + session_.number_seats
-    for i in range(1, count_seats + 1):
-        if i not in lst:
-            lst_seats.append(i)
-    result = lst_seats
+    number_seats, sold_seats, seat_map = seats
+    count_seats = number_seats + sold_seats
+    held = seat_holds.held_seats(id_)
+    result = [seat for seat in seat_map.free(count_seats) if seat not in held]
     return jsonify({"Available seats for this session": result})
 
 
@@ -79,11 +91,15 @@ def get_tickets_by_session_id(id_):
             Returns:
                 Tickets with bring session_id.
         """
-    tickets = TicketModel.find_by_session_id(id_, 0, 75)
+    try:
+        after, limit = page_args()
+    except ValueError:
+        return jsonify({"message": PAGE_ARGS_MESSAGE}), 400
+    tickets = TicketModel.find_by_session_id(id_, after, limit)
     if not tickets:
         return jsonify({"message": "Tickets not found."}), 404
 
-    return jsonify(tickets)
+    return page_response(tickets, limit)
 
 
 @tickets_bp.route("/sold_tickets/<int:id_>", methods=["GET"])
@@ -92,20 +108,14 @@ def get_tickets_by_session_id(id_):
 def get_tickets_by_film_id(id_):
     """
         Admin can view a statistic of sold tickets for selected film.
-        He can check how many tickets were sold for a particular movie
+        He can check how many tickets were sold for a particular movie, past sessions included.
+        More detailed statistic is available at /analytics/sales
         Args:
                 id_: id of film about which you want to get statistic
             Returns:
                 Number of tickets that were sold for a particular movie
     """
-    sessions = SessionModel.find_by_film_id(id_, 0, 120)
-    lst = []
-    for elem in sessions:
-        blocked = session.query(TicketModel).filter(TicketModel.session_id == elem["id"]).all()
-        for s in blocked:
-            lst.append(s.seat)
-    result = len(lst)
-    return jsonify({"Sold tickets for this film": result})
+    return jsonify({"Sold tickets for this film": TicketModel.count_by_film_id(id_)})
 
 
 @tickets_bp.route("/tickets", methods=["POST"])
@@ -115,35 +125,80 @@ def create_ticket():
         The main method of this program is responsible for buying a ticket.
         If there are no more seats for the session or selected seat is not available, you will be notified.
         Using the method above, you can see which seats are available and buy a ticket.
+        The ticket is bought for the user of the access token.
             Example:
-                >> {"seat":50,"user_id":1, "session_id":1}
+                >> {"seat":50, "session_id":1}
             Returns:
                 "id":1, "seat": 50
         """
     if not request.json:
-        return jsonify({"message": 'Please, specify "seat", "user_id" and "session_id".'}), 400
+        return jsonify({"message": 'Please, specify "seat" and "session_id".'}), 400
     seat = request.json.get("seat")
-    user_id = request.json.get("user_id")
     session_id = request.json.get("session_id")
-    blocked = session.query(TicketModel).filter(TicketModel.session_id == session_id).all()
-    lst = []
-    for s in blocked:
-        lst.append(s.seat)
-    if not (seat and user_id and session_id):
-        return jsonify({"message": 'Please, specify "seat", "user_id" and "session_id".'}), 400
-
-    if seat in lst:
-        return jsonify({'Please, choose another seat. Places that are not available': lst})
-
-    session_ = session.query(SessionModel).filter(SessionModel.id == session_id).first()
-
-    if session_.number_seats > 0:
-        ticket = TicketModel(
-            seat=seat, user_id=user_id, session_id=session_id)
-        ticket.save_to_db()
-        session_.number_seats -= 1
-        session_.save_to_db()
-        return jsonify({"id": ticket.id, "seat": ticket.seat}), 201
-
-    if session_.number_seats <= 0:
+    if not (seat and session_id):
+        return jsonify({"message": 'Please, specify "seat" and "session_id".'}), 400
+    user_id = UserModel.find_id_by_username(get_jwt_identity())
+    if user_id is None:
+        return jsonify({"message": "User not found."}), 401
+
+    try:
+        ticket, = buy_seats(session_id, user_id, [seat])
+    except InvalidSeatError as e:
+        return jsonify({"message": f'"seat" should be a number from 1 to {e.capacity}.'}), 400
+    except SeatTakenError as e:
+        return jsonify({'Please, choose another seat. Places that are not available': e.taken})
+    except SoldOutError:
         return jsonify({"message": "Sorry,but there are no more tickets available for this session"})
+    except SessionNotFoundError:
+        return jsonify({"message": "Such session not exist. Please,try another one"}), 400
+
+    return jsonify({"id": ticket.id, "seat": ticket.seat}), 201
+
+
+@tickets_bp.route("/tickets/group", methods=["POST"])
+@jwt_required()
+def create_group_tickets():
+    """
+        Buy tickets for several seats at once in one transaction: either all of them are bought or none.
+        Pass list of "seats" or "count" to get the best block of adjacent free seats.
+        Tickets are bought for the user of the access token.
+            Example 1:
+                >> {"seats": [10, 11, 12], "session_id": 1}
+            Returns:
+                "tickets": [{"id": 1, "seat": 10}, {"id": 2, "seat": 11}, {"id": 3, "seat": 12}]
+            Example 2:
+                >> {"count": 4, "session_id": 1}
+            Returns:
+                "tickets": [{"id": 4, "seat": 24}, {"id": 5, "seat": 25}, {"id": 6, "seat": 26}, {"id": 7, "seat": 27}]
+        """
+    message = f'Please, specify "session_id" and "seats" or "count" (at most {Config.GROUP_BOOKING_MAX}).'
+    if not request.json:
+        return jsonify({"message": message}), 400
+    seats = request.json.get("seats")
+    count = request.json.get("count")
+    session_id = request.json.get("session_id")
+    if seats is not None:
+        valid = isinstance(seats, list) and 0 < len(seats) <= Config.GROUP_BOOKING_MAX \
+            and all(isinstance(seat, int) and seat > 0 for seat in seats)
+    else:
+        valid = isinstance(count, int) and 0 < count <= Config.GROUP_BOOKING_MAX
+    if not (valid and session_id):
+        return jsonify({"message": message}), 400
+    user_id = UserModel.find_id_by_username(get_jwt_identity())
+    if user_id is None:
+        return jsonify({"message": "User not found."}), 401
+
+    try:
+        tickets = buy_seats(session_id, user_id, seats=seats, count=None if seats is not None else count)
+    except InvalidSeatError as e:
+        return jsonify({"message": f'"seats" should be numbers from 1 to {e.capacity}.'}), 400
+    except SeatTakenError as e:
+        return jsonify({'Please, choose another seat. Places that are not available': e.taken}), 409
+    except NoAdjacentSeatsError:
+        return jsonify({"message": "Sorry, but there are not enough seats next to each other"}), 409
+    except SoldOutError:
+        return jsonify({"message": "Sorry,but there are no more tickets available for this session"}), 409
+    except SessionNotFoundError:
+        return jsonify({"message": "Such session not exist. Please,try another one"}), 400
+
+    return jsonify({"tickets": [{"id": id_, "seat": seat} for id_, seat in tickets]}), 201
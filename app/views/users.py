@@ -1,8 +1,10 @@
 from flask import jsonify, request, Blueprint
 from flask_jwt_extended import jwt_required
 
-from app.models import UserModel
+from app.models import UserModel, session
 from app.decorators import admin_group_required
+from app.export import export_format, stream_export
+from app.pagination import page_args, page_response, PAGE_ARGS_MESSAGE
 
 users_bp = Blueprint('users', __name__)
 
@@ -12,12 +14,25 @@ users_bp = Blueprint('users', __name__)
 @admin_group_required
 def get_users():
     """
-        Get all users from database. This function does not accept parameters and can be called only by admin
+        Get users from database page by page. Can be called only by admin.
+        Optional parameters: "after" - id of the last user of previous page, "limit" - size of the page.
+        With ?format=ndjson or ?format=csv (or the same Accept header) all users are streamed as a file instead.
             Returns:
-                All users as list of dictionaries.
+                Users as list of dictionaries.
         """
-    users = UserModel.return_all()
-    return jsonify(users)
+    try:
+        fmt = export_format()
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    if fmt:
+        return stream_export(session.query(UserModel).order_by(UserModel.id), UserModel, fmt, 'users')
+
+    try:
+        after, limit = page_args()
+    except ValueError:
+        return jsonify({"message": PAGE_ARGS_MESSAGE}), 400
+    users = UserModel.return_page(after, limit)
+    return page_response(users, limit)
 
 
 @users_bp.route("/users/<int:id_>", methods=["GET"])
@@ -0,0 +1,7 @@
+"""Load tests of the booking hot paths.
+
+generate fills a database with synthetic films, halls, sessions and tickets and
+writes a manifest describing them, run drives concurrent clients against
+POST /tickets, GET /free_seats/<id>, GET /sessions and POST /auth/login and writes
+a JSON report, compare checks two reports for regressions.
+"""
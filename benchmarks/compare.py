@@ -0,0 +1,57 @@
+"""Compare two benchmark reports and fail on regressions.
+
+A scenario regresses when its p95 or p99 latency grows or its throughput drops by
+more than --threshold (10% by default), or when it runs more SQL statements per
+request than before.
+
+    python -m benchmarks.compare base.json head.json
+"""
+import argparse
+import json
+import sys
+
+
+def compare(base, head, threshold=0.1):
+    """
+        Compare scenarios present in both reports.
+            Returns:
+                list of (scenario, metric, base value, head value, regressed)
+    """
+    rows = []
+    for scenario, new in head['scenarios'].items():
+        old = base['scenarios'].get(scenario)
+        if old is None:
+            continue
+        for metric in ('p50', 'p95', 'p99'):
+            before, after = old['latency_ms'][metric], new['latency_ms'][metric]
+            regressed = metric != 'p50' and bool(before and after) and after > before * (1 + threshold)
+            rows.append((scenario, f'{metric} ms', before, after, regressed))
+        before, after = old['req_per_s'], new['req_per_s']
+        rows.append((scenario, 'req/s', before, after, bool(before) and after < before * (1 - threshold)))
+        before, after = old['queries_per_request'], new['queries_per_request']
+        rows.append((scenario, 'queries/request', before, after,
+                     before is not None and after is not None and after > before))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark reports')
+    parser.add_argument('base')
+    parser.add_argument('head')
+    parser.add_argument('--threshold', type=float, default=0.1, help='allowed relative change of latency and req/s')
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+    rows = compare(base, head, args.threshold)
+    print(f"{'scenario':16} {'metric':16} {base.get('commit') or 'base':>12} {head.get('commit') or 'head':>12}")
+    for scenario, metric, before, after, regressed in rows:
+        print(f"{scenario:16} {metric:16} {before!s:>12} {after!s:>12}{'  REGRESSION' if regressed else ''}")
+    if any(row[-1] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
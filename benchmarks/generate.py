@@ -0,0 +1,135 @@
+"""Synthetic data for benchmarks.
+
+Rows are written with executemany in batches straight through the tables, so
+millions of tickets take minutes rather than hours. Seat maps and seat counters of
+sessions are filled together with their tickets, the same way the app keeps them.
+The same seed always gives the same data.
+
+    SQLALCHEMY_DATABASE_URI=sqlite:///bench.db python -m benchmarks.generate --tickets 1000000
+"""
+import argparse
+import json
+import random
+from datetime import datetime, timedelta
+
+from passlib.hash import pbkdf2_sha256
+from sqlalchemy import func, insert, select
+
+from app.config import Config
+from app.database.migrations import upgrade
+from app.http_cache import bump
+from app.models import ActorModel, FilmModel, HallModel, SessionModel, TicketModel, UserModel, film_actor
+from app.seat_map import SeatMap
+
+GENRES = ('drama', 'comedy', 'thriller', 'horror', 'superhero', 'animation', 'documentary', 'romance')
+WORDS = ('dark', 'night', 'return', 'last', 'city', 'storm', 'king', 'silent', 'river', 'star', 'iron', 'blue')
+PASSWORD = 'benchmark'
+BATCH_SIZE = 10000
+
+
+def _batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(connection, table, rows):
+    for batch in _batches(rows):
+        connection.execute(insert(table), batch)
+
+
+def generate(engine, films=2000, halls=50, sessions=20000, tickets=1000000, users=1000, actors=5000,
+             capacity=120, seed=1):
+    """
+        Apply migrations and fill the database with synthetic rows. Ids start after the rows already there.
+            Returns:
+                manifest dict with counts, credentials of users and ids of sessions for the driver
+    """
+    rng = random.Random(seed)
+    upgrade(engine)
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    hashed_password = pbkdf2_sha256.using(rounds=Config.PASSWORD_HASH_ROUNDS).hash(PASSWORD)
+    sold_per_session = min(tickets // max(sessions, 1), capacity * 4 // 5)
+    with engine.begin() as connection:
+        first = {model: (connection.execute(select(func.max(model.id))).scalar() or 0) + 1
+                 for model in (FilmModel, HallModel, SessionModel, UserModel, ActorModel)}
+
+        film_ids = range(first[FilmModel], first[FilmModel] + films)
+        _insert(connection, FilmModel.__table__, (
+            {'id': id_, 'name': f'{rng.choice(WORDS).title()} {rng.choice(WORDS)} {id_}',
+             'genre': rng.choice(GENRES), 'director': f'Director {rng.randrange(films // 4 + 1)}',
+             'image': 'https://example.com/poster.png', 'rating': round(rng.uniform(1, 10), 1),
+             'duration': rng.randrange(80, 180)} for id_ in film_ids))
+
+        actor_ids = range(first[ActorModel], first[ActorModel] + actors)
+        _insert(connection, ActorModel.__table__, (
+            {'id': id_, 'name': f'Actor{id_}', 'surname': rng.choice(WORDS).title()} for id_ in actor_ids))
+        if actors:
+            _insert(connection, film_actor, (
+                {'films_id': film_id, 'actors_id': actor_id} for film_id in film_ids
+                for actor_id in rng.sample(actor_ids, min(5, actors))))
+
+        hall_ids = range(first[HallModel], first[HallModel] + halls)
+        _insert(connection, HallModel.__table__, (
+            {'id': id_, 'name': f'Hall {id_}', 'capacity': capacity} for id_ in hall_ids))
+
+        user_ids = range(first[UserModel], first[UserModel] + users)
+        _insert(connection, UserModel.__table__, (
+            {'id': id_, 'name': f'Bench {id_}', 'age': 30, 'username': f'bench{id_}',
+             'email': f'bench{id_}@example.com', 'hashed_password': hashed_password, 'is_admin': False}
+            for id_ in user_ids))
+
+        session_ids = range(first[SessionModel], first[SessionModel] + sessions)
+        sold = {id_: sorted(rng.sample(range(1, capacity + 1), sold_per_session)) for id_ in session_ids}
+        # sessions of one hall follow each other every 3 hours, starting tomorrow
+        _insert(connection, SessionModel.__table__, (
+            {'id': id_, 'film_id': rng.choice(film_ids), 'hall_id': hall_ids[number % halls],
+             'started_at': now + timedelta(days=1, hours=3 * (number // halls)),
+             'number_seats': capacity - len(sold[id_]), 'sold_seats': len(sold[id_]),
+             'price': rng.choice((5.0, 7.5, 10.0)), 'seat_map': SeatMap.from_seats(sold[id_]).to_bytes()}
+            for number, id_ in enumerate(session_ids)))
+        _insert(connection, TicketModel.__table__, (
+            {'seat': seat, 'session_id': id_, 'user_id': rng.choice(user_ids)}
+            for id_ in session_ids for seat in sold[id_]))
+        # rows were inserted around the ORM, so ETags of the catalogue have to be invalidated here
+        bump(connection, {'films', 'halls', 'actors'})
+
+    return {
+        'seed': seed,
+        'counts': {'films': films, 'halls': halls, 'sessions': sessions, 'tickets': sold_per_session * sessions,
+                   'users': users, 'actors': actors},
+        'capacity': capacity,
+        'genres': list(GENRES),
+        'users': [{'id': id_, 'username': f'bench{id_}', 'password': PASSWORD} for id_ in user_ids],
+        'session_ids': list(session_ids),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill the database from SQLALCHEMY_DATABASE_URI with benchmark data')
+    parser.add_argument('--films', type=int, default=2000)
+    parser.add_argument('--halls', type=int, default=50)
+    parser.add_argument('--sessions', type=int, default=20000)
+    parser.add_argument('--tickets', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--actors', type=int, default=5000)
+    parser.add_argument('--capacity', type=int, default=120, help='seats per hall')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--manifest', default='bench_data.json', help='where to write ids and credentials for run')
+    args = parser.parse_args()
+
+    from app.database.database import db
+    manifest = generate(db, films=args.films, halls=args.halls, sessions=args.sessions, tickets=args.tickets,
+                        users=args.users, actors=args.actors, capacity=args.capacity, seed=args.seed)
+    with open(args.manifest, 'w') as f:
+        json.dump(manifest, f)
+    print(f"Generated {manifest['counts']}, manifest written to {args.manifest}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+"""Concurrent load driver for the booking hot paths.
+
+Every scenario runs for --duration seconds with --concurrency client threads, each
+logged in as its own generated user. Requests go to the app in this process (Flask
+test client, the default) or to a running server given with --url. Queries per
+request are read from the difference of /metrics before and after the scenario.
+
+    SQLALCHEMY_DATABASE_URI=sqlite:///bench.db python -m benchmarks.run --output report.json
+"""
+import argparse
+import http.client
+import json
+import math
+import platform
+import random
+import re
+import subprocess
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlencode, urlsplit
+
+SCENARIOS = ('buy_ticket', 'free_seats', 'sessions_filter', 'login')
+ENDPOINTS = {
+    'buy_ticket': ('tickets.create_ticket', 'POST'),
+    'free_seats': ('tickets.get_free_seats_by_session', 'GET'),
+    'sessions_filter': ('sessions.get_sessions', 'GET'),
+    'login': ('auth.login', 'POST'),
+}
+QUERIES_METRIC = re.compile(r'^cinema_http_request_queries_(sum|count)\{endpoint="([^"]*)",method="([^"]*)"\} (\S+)$',
+                            re.MULTILINE)
+
+
+class InProcessClient(object):
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method, path, body=None, headers=None):
+        resp = self._client.open(path, method=method, json=body, headers=headers)
+        return resp.status_code, resp.data
+
+
+class HttpClient(object):
+    def __init__(self, url, timeout=30):
+        parts = urlsplit(url)
+        self._connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self._netloc = parts.netloc
+        self._timeout = timeout
+        self._connection = None
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        data = None
+        if body is not None:
+            data = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        if self._connection is None:
+            self._connection = self._connection_class(self._netloc, timeout=self._timeout)
+        try:
+            self._connection.request(method, path, body=data, headers=headers)
+            resp = self._connection.getresponse()
+            return resp.status, resp.read()
+        except (http.client.HTTPException, OSError):
+            self._connection.close()
+            self._connection = None
+            raise
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def query_counts(metrics_text):
+    """(endpoint, method) -> (sum, count) of SQL statements per request from /metrics output"""
+    counts = {}
+    for kind, endpoint, method, value in QUERIES_METRIC.findall(metrics_text):
+        total, count = counts.get((endpoint, method), (0, 0))
+        if kind == 'sum':
+            total = float(value)
+        else:
+            count = float(value)
+        counts[(endpoint, method)] = (total, count)
+    return counts
+
+
+class Worker(object):
+    def __init__(self, client, user, manifest, seed):
+        self.client = client
+        self.user = user
+        self.manifest = manifest
+        self.rng = random.Random(seed)
+        self.headers = {}
+
+    def login(self):
+        status, data = self.client.request('POST', '/auth/login', self._credentials())
+        token = json.loads(data).get('access_token') if status == 200 else None
+        if not token:
+            raise RuntimeError(f"Can't log in as {self.user['username']}: {status} {data[:200]!r}")
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def _credentials(self):
+        return {'username': self.user['username'], 'password': self.user['password']}
+
+    def next_request(self, scenario):
+        """(method, path, body) of the next request of scenario"""
+        if scenario == 'buy_ticket':
+            return 'POST', '/tickets', {'seat': self.rng.randint(1, self.manifest['capacity']),
+                                        'session_id': self.rng.choice(self.manifest['session_ids'])}
+        if scenario == 'free_seats':
+            return 'GET', f"/free_seats/{self.rng.choice(self.manifest['session_ids'])}", None
+        if scenario == 'sessions_filter':
+            query = urlencode({'genre': self.rng.choice(self.manifest['genres']), 'limit': 20})
+            return 'GET', f'/sessions?{query}', None
+        return 'POST', '/auth/login', self._credentials()
+
+    def run(self, scenario, deadline, latencies, statuses):
+        while time.perf_counter() < deadline:
+            method, path, body = self.next_request(scenario)
+            started_at = time.perf_counter()
+            try:
+                status, _ = self.client.request(method, path, body, self.headers)
+            except Exception:
+                status = 'exception'
+            latencies.append(time.perf_counter() - started_at)
+            statuses[status] = statuses.get(status, 0) + 1
+
+
+def run_scenario(scenario, workers, duration, metrics_client):
+    """Run scenario on all workers at once. Returns its report"""
+    before = _scrape(metrics_client)
+    results = [([], {}) for _ in workers]
+    deadline = time.perf_counter() + duration
+    started_at = time.perf_counter()
+    threads = [threading.Thread(target=worker.run, args=(scenario, deadline) + result)
+               for worker, result in zip(workers, results)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started_at
+    after = _scrape(metrics_client)
+
+    latencies = sorted(latency for result in results for latency in result[0])
+    statuses = {}
+    for _, result_statuses in results:
+        for status, count in result_statuses.items():
+            statuses[str(status)] = statuses.get(str(status), 0) + count
+    errors = sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 500)
+
+    queries_per_request = None
+    key = ENDPOINTS[scenario]
+    if before is not None and after is not None and key in after:
+        total, count = after[key]
+        total_before, count_before = before.get(key, (0, 0))
+        if count > count_before:
+            queries_per_request = round((total - total_before) / (count - count_before), 2)
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'statuses': statuses,
+        'req_per_s': round(len(latencies) / elapsed, 2),
+        'latency_ms': {
+            'mean': ms(sum(latencies) / len(latencies)) if latencies else None,
+            'p50': ms(percentile(latencies, 50)),
+            'p95': ms(percentile(latencies, 95)),
+            'p99': ms(percentile(latencies, 99)),
+            'max': ms(latencies[-1]) if latencies else None,
+        },
+        'queries_per_request': queries_per_request,
+    }
+
+
+def _scrape(client):
+    status, data = client.request('GET', '/metrics')
+    return query_counts(data.decode()) if status == 200 else None
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test booking endpoints and write a JSON report')
+    parser.add_argument('--manifest', default='bench_data.json', help='written by benchmarks.generate')
+    parser.add_argument('--url', help='base URL of a running server, the app is run in this process if not given')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10, help='seconds per scenario')
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='run only selected scenarios')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='bench_report.json')
+    args = parser.parse_args()
+
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+    if args.url:
+        def make_client():
+            return HttpClient(args.url)
+    else:
+        from app.main import create_app
+        app = create_app()
+
+        def make_client():
+            return InProcessClient(app)
+
+    workers = [Worker(make_client(), manifest['users'][number % len(manifest['users'])], manifest, args.seed + number)
+               for number in range(args.concurrency)]
+    for worker in workers:
+        worker.login()
+
+    report = {
+        'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'target': args.url or 'in-process',
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'seed': args.seed,
+        'data': manifest['counts'],
+        'scenarios': {},
+    }
+    metrics_client = make_client()
+    for scenario in args.scenario or SCENARIOS:
+        result = run_scenario(scenario, workers, args.duration, metrics_client)
+        report['scenarios'][scenario] = result
+        latency = result['latency_ms']
+        print(f"{scenario:16} {result['req_per_s']:>9} req/s  p50 {latency['p50']} ms  p95 {latency['p95']} ms  "
+              f"p99 {latency['p99']} ms  queries/request {result['queries_per_request']}  errors {result['errors']}")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Report written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
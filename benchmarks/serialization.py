@@ -0,0 +1,69 @@
+"""Time and memory of reading list pages as entities or as projected rows.
+
+For every model one page of rows is read both ways and turned into dicts with
+to_dict: as ORM entities (session.query(Model)) and as the columns of
+projection(Model), which the list endpoints use. Peak memory is measured with
+tracemalloc, the session is cleared between runs so the identity map is empty.
+
+    SQLALCHEMY_DATABASE_URI=sqlite:///bench.db python -m benchmarks.serialization --limit 1000
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from app.models import ActorModel, FilmModel, HallModel, SessionModel, TicketModel, UserModel, projection, session
+
+MODELS = (FilmModel, HallModel, UserModel, ActorModel, TicketModel, SessionModel)
+
+
+def measure(read, repeat=5):
+    """Best time in ms and peak of allocated KiB of read() run repeat times"""
+    best = None
+    for _ in range(repeat):
+        session.expunge_all()
+        started_at = time.perf_counter()
+        read()
+        elapsed = time.perf_counter() - started_at
+        best = elapsed if best is None else min(best, elapsed)
+    session.expunge_all()
+    tracemalloc.start()
+    read()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    session.expunge_all()
+    return round(best * 1000, 3), round(peak / 1024, 1)
+
+
+def compare(model, limit, repeat=5):
+    def entities():
+        return [model.to_dict(row) for row in session.query(model).order_by(model.id).limit(limit)]
+
+    def rows():
+        return [model.to_dict(row) for row in session.query(*projection(model)).order_by(model.id).limit(limit)]
+
+    entity_ms, entity_kib = measure(entities, repeat)
+    row_ms, row_kib = measure(rows, repeat)
+    return {'entities': {'ms': entity_ms, 'peak_kib': entity_kib}, 'rows': {'ms': row_ms, 'peak_kib': row_kib}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare entity and projected reads of list endpoints')
+    parser.add_argument('--limit', type=int, default=1000, help='rows per page')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='write results as JSON')
+    args = parser.parse_args()
+
+    results = {}
+    for model in MODELS:
+        results[model.__tablename__] = result = compare(model, args.limit, args.repeat)
+        entities, rows = result['entities'], result['rows']
+        print(f"{model.__tablename__:10} entities {entities['ms']:>8} ms {entities['peak_kib']:>9} KiB   "
+              f"rows {rows['ms']:>8} ms {rows['peak_kib']:>9} KiB")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,9 @@ TEST_PASSWORD = "test@example.com"
 ADMIN_TEST_USERNAME = "admintest@example.com"
 ADMIN_TEST_PASSWORD = "admintest@example.com"
 
+# test modules import app.models at collection time, before the app fixture runs
+os.environ.setdefault('SQLALCHEMY_DATABASE_URI', f"sqlite:///{os.path.abspath('test.db')}")
+
 
 @pytest.fixture
 def app(monkeypatch):
@@ -64,3 +67,28 @@ def authentication_headers(client):
         return headers
 
     return _authentication_headers
+
+
+@pytest.fixture
+def film_session(client, authentication_headers):
+    """
+        Create a hall, a film and, if started_at is given, a session of the film in the hall through the API.
+        Extra keyword arguments are sent with the film.
+            Returns:
+                Tuple (hall_id, film_id, session_id), session_id is None without started_at
+    """
+    headers = authentication_headers(is_admin=True)
+
+    def _film_session(name, capacity=30, started_at=None, price=None, **film):
+        hall_id = client.post('/halls', json={'name': name, 'capacity': capacity}, headers=headers).json['id']
+        film = dict({'name': name, 'genre': 'test', 'director': 'test', 'rating': 5, 'image': "test"}, **film)
+        film_id = client.post('/films', json=film, headers=headers).json['id']
+        if started_at is None:
+            return hall_id, film_id, None
+        sess = {'film_id': film_id, 'hall_id': hall_id, 'started_at': started_at}
+        if price is not None:
+            sess['price'] = price
+        session_id = client.post('/sessions', json=sess, headers=headers).json['id']
+        return hall_id, film_id, session_id
+
+    return _film_session
@@ -57,3 +57,9 @@ def test_login_wrong_password(client, app):
             "password": "23",
         }
     ).json["message"] == 'Wrong password'
+
+
+def test_logout_access_revokes_token(client, app, authentication_headers):
+    headers = authentication_headers(is_admin=True)
+    assert client.post('/auth/logout-access', headers=headers).json['message'] == 'Access token has been revoked'
+    assert client.get('/films', headers=headers).status_code == 401
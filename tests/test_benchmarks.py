@@ -0,0 +1,43 @@
+from sqlalchemy import create_engine, func, select
+
+from app.models import SessionModel, TicketModel
+from app.seat_map import SeatMap
+from benchmarks.compare import compare
+from benchmarks.generate import generate
+from benchmarks.run import percentile, query_counts
+
+
+def test_generate():
+    engine = create_engine('sqlite://')
+    manifest = generate(engine, films=5, halls=2, sessions=10, tickets=200, users=3, actors=10, capacity=30)
+    assert manifest['counts']['tickets'] == 200
+    assert len(manifest['session_ids']) == 10
+    with engine.connect() as connection:
+        assert connection.execute(select(func.count()).select_from(TicketModel.__table__)).scalar() == 200
+        for number_seats, sold_seats, seat_map in connection.execute(
+                select(SessionModel.number_seats, SessionModel.sold_seats, SessionModel.seat_map)):
+            assert (number_seats, sold_seats, SeatMap(seat_map).count()) == (10, 20, 20)
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 50) is None
+
+
+def test_query_counts():
+    text = ('cinema_http_request_queries_sum{endpoint="auth.login",method="POST"} 6\n'
+            'cinema_http_request_queries_count{endpoint="auth.login",method="POST"} 3\n')
+    assert query_counts(text) == {('auth.login', 'POST'): (6, 3)}
+
+
+def test_compare_flags_regressions():
+    def report(p95, req_per_s, queries):
+        latency = {'p50': 1, 'p95': p95, 'p99': p95}
+        return {'scenarios': {'login': {'latency_ms': latency, 'req_per_s': req_per_s,
+                                        'queries_per_request': queries}}}
+
+    assert not any(row[-1] for row in compare(report(10, 100, 1), report(10.5, 95, 1)))
+    regressed = {row[1] for row in compare(report(10, 100, 1), report(20, 50, 2)) if row[-1]}
+    assert regressed == {'p95 ms', 'p99 ms', 'req/s', 'queries/request'}
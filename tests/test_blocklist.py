@@ -0,0 +1,51 @@
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from app.blocklist import BloomFilter, RevokedTokens
+from app.models import RevokedTokenModel, session
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=100)
+    keys = [f"jti-{i}" for i in range(100)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    assert sum(f"other-{i}" in bloom for i in range(1000)) < 50
+
+
+def test_revoked_tokens_purge_expired(client, app):
+    client.get('/')
+    expired, active = str(uuid.uuid4()), str(uuid.uuid4())
+    RevokedTokenModel(jti=expired, expires_at=datetime.utcnow() - timedelta(seconds=1)).add()
+    RevokedTokenModel(jti=active, expires_at=datetime.utcnow() + timedelta(hours=1)).add()
+    revoked = RevokedTokens()
+    revoked.load()
+    assert not revoked.is_revoked(expired)
+    assert not RevokedTokenModel.is_jti_blacklisted(expired)
+    assert revoked.is_revoked(active)
+
+
+def test_revoked_tokens_sync_rows_committed_out_of_order(client, app):
+    client.get('/')
+    first, second = str(uuid.uuid4()), str(uuid.uuid4())
+    last_id = session.query(func.max(RevokedTokenModel.id_)).scalar() or 0
+    RevokedTokenModel(id_=last_id + 2, jti=first, expires_at=datetime.utcnow() + timedelta(hours=1)).add()
+    revoked = RevokedTokens(sync_interval=0)
+    assert revoked.is_revoked(first)
+    # a transaction that got a lower id commits after the sync
+    RevokedTokenModel(id_=last_id + 1, jti=second, expires_at=datetime.utcnow() + timedelta(hours=1)).add()
+    assert revoked.is_revoked(second)
+
+
+def test_revoked_tokens_check_doesnt_purge(client, app):
+    client.get('/')
+    expired = str(uuid.uuid4())
+    RevokedTokenModel(jti=expired, expires_at=datetime.utcnow() - timedelta(seconds=1)).add()
+    revoked = RevokedTokens(sync_interval=0, purge_interval=0)
+    assert revoked.is_revoked(expired)
+    assert RevokedTokenModel.is_jti_blacklisted(expired)
+    assert revoked.purge() >= 1
+    assert not RevokedTokenModel.is_jti_blacklisted(expired)
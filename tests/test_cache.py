@@ -0,0 +1,36 @@
+from app.cache import TTLCache
+
+
+def test_cache_get_set():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.put(('films', 1), 'film')
+    assert cache.get(('films', 1)) == 'film'
+    assert cache.get(('films', 2)) is None
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.put(('films', 1), 1)
+    cache.put(('films', 2), 2)
+    cache.get(('films', 1))
+    cache.put(('films', 3), 3)
+    assert cache.get(('films', 2)) is None
+    assert cache.get(('films', 1)) == 1
+    assert len(cache) == 2
+
+
+def test_cache_expires(monkeypatch):
+    cache = TTLCache(maxsize=2, ttl=10)
+    monkeypatch.setattr('app.cache.time.monotonic', lambda: 100)
+    cache.put(('halls', 1), 1)
+    monkeypatch.setattr('app.cache.time.monotonic', lambda: 111)
+    assert cache.get(('halls', 1)) is None
+
+
+def test_cache_invalidate_namespace():
+    cache = TTLCache()
+    cache.put(('films', 1), 1)
+    cache.put(('halls', 1), 1)
+    cache.invalidate('films')
+    assert cache.get(('films', 1)) is None
+    assert cache.get(('halls', 1)) == 1
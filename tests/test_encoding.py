@@ -0,0 +1,43 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from app.encoding import JSONEncoder, OrjsonEncoder, encoder_class, json_array_chunks, orjson
+
+needs_orjson = pytest.mark.skipif(orjson is None, reason='orjson is not installed')
+
+
+@pytest.mark.parametrize("encoder", [JSONEncoder, pytest.param(OrjsonEncoder, marks=needs_orjson)])
+def test_encoders_write_iso_dates(encoder):
+    data = {"started_at": datetime(2040, 9, 1, 10, 0), "day": date(2040, 9, 1), "price": Decimal('7.5')}
+    encoded = encoder(separators=(',', ':'), sort_keys=True).encode(data)
+    assert encoded == '{"day":"2040-09-01","price":"7.5","started_at":"2040-09-01T10:00:00"}'
+    assert json.loads(encoder().encode({2: [1.5, None]})) == {"2": [1.5, None]}
+
+
+@needs_orjson
+def test_orjson_encoder_falls_back_to_json():
+    assert OrjsonEncoder().encode({"big": 2 ** 70}) == '{"big": 1180591620717411303424}'
+    with pytest.raises(TypeError):
+        OrjsonEncoder().encode({"bad": object()})
+
+
+def test_encoder_class():
+    assert encoder_class('json') is JSONEncoder
+    assert encoder_class('auto') is (JSONEncoder if orjson is None else OrjsonEncoder)
+    with pytest.raises(ValueError):
+        encoder_class('pickle')
+
+
+def test_json_array_chunks():
+    chunks = list(json_array_chunks(range(5), str, batch_size=2))
+    assert chunks == ['[', '0,1', ',2,3', ',4', ']\n']
+    assert json.loads(''.join(json_array_chunks([], str))) == []
+
+
+def test_api_dates_are_iso(client, app, authentication_headers):
+    resp = client.get('/sessions?limit=1', headers=authentication_headers(is_admin=True))
+    for sess in resp.json:
+        datetime.fromisoformat(sess['started_at'])
@@ -55,4 +55,59 @@ def test_create_film_fail(client, app, authentication_headers):
         },
         headers=authentication_headers(is_admin=True)
     )
-    assert resp.json['message'] == 'Please, specify "name", "genre", "director", "image" and "rating".'
\ No newline at end of file
+    assert resp.json['message'] == 'Please, specify "name", "genre", "director", "image" and "rating".'
+
+
+def test_films_list_updated_after_create(client, app, authentication_headers):
+    headers = authentication_headers(is_admin=True)
+    # the new film goes to the last page, read it once so that it is cached
+    url = '/films'
+    resp = client.get(url, headers=headers)
+    while 'X-Next-Cursor' in resp.headers:
+        url = f"/films?after={resp.headers['X-Next-Cursor']}"
+        resp = client.get(url, headers=headers)
+    film_id = client.post(
+        '/films',
+        json={
+            'name': 'cached',
+            'genre': 'test',
+            'director': 'test',
+            'rating': 5,
+            'image': "test"
+        }, headers=headers
+    ).json['id']
+    assert film_id in [film['id'] for film in client.get(url, headers=headers).json]
+
+
+def test_films_keyset_pagination(client, app, authentication_headers):
+    headers = authentication_headers(is_admin=True)
+    for name in ('first', 'second'):
+        client.post(
+            '/films',
+            json={'name': name, 'genre': 'test', 'director': 'test', 'rating': 5, 'image': "test"},
+            headers=headers
+        )
+    first_page = client.get('/films?limit=1', headers=headers)
+    assert len(first_page.json) == 1
+    cursor = first_page.headers['X-Next-Cursor']
+    second_page = client.get(f'/films?after={cursor}&limit=1', headers=headers)
+    assert second_page.json[0]['id'] > first_page.json[0]['id']
+
+
+def test_films_pagination_fail(client, app, authentication_headers):
+    resp = client.get(
+        '/films?after=abc',
+        headers=authentication_headers(is_admin=True)
+    )
+    assert resp.json['message'] == '"after" and "limit" should be positive integers.'
+
+
+def test_film_duration_must_be_positive(client, app, authentication_headers):
+    headers = authentication_headers(is_admin=True)
+    film = {'name': 'duration check', 'genre': 'test', 'director': 'test', 'rating': 5, 'image': "test"}
+    for duration in (0, -90, "90", 1.5, True):
+        assert client.post('/films', json=dict(film, duration=duration), headers=headers).status_code == 400
+    film_id = client.post('/films', json=dict(film, duration=95), headers=headers).json['id']
+    for duration in (0, -90, "90"):
+        assert client.patch(f'/films/{film_id}', json={'duration': duration}, headers=headers).status_code == 400
+    assert client.get(f'/films/{film_id}', headers=headers).json['duration'] == 95
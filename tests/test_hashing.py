@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+
+from app.hashing import PasswordHasher, HashingOverloadedError
+
+
+def test_hash_and_verify():
+    hasher = PasswordHasher(rounds=1000, workers=1)
+    hash_ = hasher.hash_password("secret")
+    assert hasher.verify("secret", hash_)
+    assert not hasher.verify("wrong", hash_)
+
+
+def test_rehash_when_rounds_change():
+    old_hash = PasswordHasher(rounds=1000, workers=1).hash_password("secret")
+    is_valid, new_hash = PasswordHasher(rounds=2000, workers=1).verify_and_update("secret", old_hash)
+    assert is_valid
+    assert new_hash and "$2000$" in new_hash
+    assert PasswordHasher(rounds=1000, workers=1).verify_and_update("secret", old_hash) == (True, None)
+
+
+def test_overloaded_pool_sheds_load(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    def slow_hash(password, rounds):
+        started.set()
+        release.wait(5)
+        return password
+
+    monkeypatch.setattr('app.hashing._hash', slow_hash)
+    hasher = PasswordHasher(workers=1, queue_limit=0)
+    thread = threading.Thread(target=hasher.hash_password, args=("first",))
+    thread.start()
+    started.wait(5)
+    with pytest.raises(HashingOverloadedError):
+        hasher.hash_password("second")
+    release.set()
+    thread.join()
+
+
+def test_timed_out_hash_keeps_its_slot(monkeypatch):
+    release = threading.Event()
+
+    def slow_hash(password, rounds):
+        release.wait(5)
+        return password
+
+    monkeypatch.setattr('app.hashing._hash', slow_hash)
+    hasher = PasswordHasher(workers=1, queue_limit=0, timeout=0.05)
+    with pytest.raises(HashingOverloadedError):
+        hasher.hash_password("first")
+    # the first hash is still running, so there is no free slot
+    with pytest.raises(HashingOverloadedError):
+        hasher.hash_password("second")
+    release.set()
+    hasher._get_executor().shutdown(wait=True)
+    assert hasher._slots.acquire(blocking=False)
@@ -0,0 +1,36 @@
+import time
+
+import pytest
+
+from app.holds import SeatHolds, SeatHeldError, HoldNotFoundError
+
+
+def test_hold_hides_seats_from_other_users():
+    holds = SeatHolds(ttl=60)
+    holds.hold(1, user_id=1, seats=[3, 4])
+    assert holds.held_seats(1) == {3, 4}
+    assert holds.held_seats(1, user_id=1) == set()
+    with pytest.raises(SeatHeldError) as e:
+        holds.hold(1, user_id=2, seats=[4, 5])
+    assert e.value.held == [4]
+
+
+def test_hold_release():
+    holds = SeatHolds(ttl=60)
+    hold = holds.hold(1, user_id=1, seats=[3, 4])
+    holds.release_seats(1, [3])
+    assert holds.held_seats(1) == {4}
+    holds.release(hold.id)
+    assert holds.held_seats(1) == set()
+    assert len(holds) == 0
+    with pytest.raises(HoldNotFoundError):
+        holds.release(hold.id)
+
+
+def test_hold_expires():
+    holds = SeatHolds(ttl=60)
+    holds.hold(1, user_id=1, seats=[3], ttl=0.01)
+    holds.hold(1, user_id=1, seats=[5])
+    time.sleep(0.02)
+    assert holds.held_seats(1) == {5}
+    assert len(holds) == 1
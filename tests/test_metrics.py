@@ -0,0 +1,48 @@
+import logging
+
+from sqlalchemy import create_engine, text
+
+from app.metrics import Histogram, RequestMetrics
+
+
+def test_histogram_buckets():
+    histogram = Histogram((1, 5))
+    for value in (0, 1, 3, 7):
+        histogram.observe(value)
+    assert list(histogram.cumulative()) == [(1, 2), (5, 3), (float('inf'), 4)]
+    assert histogram.sum == 11
+    assert histogram.count == 4
+
+
+def test_render_prometheus_format():
+    metrics = RequestMetrics()
+    metrics.observe_request('films.get_films', 'GET', 200, 0.02, queries=3, query_time=0.004)
+    metrics.observe_request('films.get_films', 'GET', 200, 0.2, queries=3, query_time=0.01)
+    body = metrics.render()
+    assert 'cinema_http_requests_total{endpoint="films.get_films",method="GET",status="200"} 2' in body
+    assert 'cinema_http_request_duration_seconds_bucket{endpoint="films.get_films",method="GET",le="0.025"} 1' in body
+    assert 'cinema_http_request_duration_seconds_bucket{endpoint="films.get_films",method="GET",le="+Inf"} 2' in body
+    assert 'cinema_http_request_queries_sum{endpoint="films.get_films",method="GET"} 6' in body
+
+
+def test_slow_statements_logged(caplog):
+    engine = create_engine('sqlite://')
+    metrics = RequestMetrics(slow_query_threshold=0)
+    metrics.instrument(engine)
+    metrics.instrument(engine)
+    with caplog.at_level(logging.WARNING, logger='app.metrics'), engine.connect() as connection:
+        connection.execute(text('SELECT 1'))
+    assert 'cinema_sql_statements_total 1\n' in metrics.render()
+    assert 'cinema_sql_slow_statements_total 1\n' in metrics.render()
+    assert 'SELECT 1' in caplog.text
+
+
+def test_metrics_endpoint_counts_queries(client, app):
+    app.config['LOGIN_DISABLED'] = True
+    client.get('/home')
+    resp = client.get('/metrics')
+    assert resp.status_code == 200
+    assert resp.content_type.startswith('text/plain')
+    queries = [line for line in resp.data.decode().splitlines()
+               if line.startswith('cinema_http_request_queries_count{endpoint="cinema.index",method="GET"}')]
+    assert queries and int(queries[0].split()[-1]) >= 1
@@ -0,0 +1,109 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine, inspect, select, text
+
+from app.database.database import base
+from app.database.migrations import upgrade, MIGRATIONS
+from app.http_cache import bump
+from app.models import catalogue_versions
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine('sqlite://')
+    upgrade(engine)
+    return engine
+
+
+def test_upgrade_new_database():
+    engine = create_engine('sqlite://')
+    assert upgrade(engine) == [func.__name__ for func in MIGRATIONS]
+    assert upgrade(engine) == []
+
+
+def test_upgrade_database_created_without_migrations():
+    engine = create_engine('sqlite://')
+    with engine.begin() as connection:
+        connection.execute(text('CREATE TABLE sessions (id INTEGER PRIMARY KEY, started_at DATETIME, '
+                                'number_seats INTEGER, hall_id INTEGER, film_id INTEGER)'))
+        connection.execute(text('CREATE TABLE tickets (id INTEGER PRIMARY KEY, seat INTEGER NOT NULL, '
+                                'user_id INTEGER, session_id INTEGER)'))
+        connection.execute(text('CREATE TABLE revoked_tokens (id_ INTEGER PRIMARY KEY, jti VARCHAR(120), '
+                                'blacklisted_on DATETIME)'))
+    upgrade(engine)
+    assert 'expires_at' in {column['name'] for column in inspect(engine).get_columns('revoked_tokens')}
+    assert 'seat_map' in {column['name'] for column in inspect(engine).get_columns('sessions')}
+    assert 'ix_tickets_session_seat' in {index['name'] for index in inspect(engine).get_indexes('tickets')}
+
+
+def test_upgrade_new_database_matches_models(engine):
+    inspector = inspect(engine)
+    for table in base.metadata.sorted_tables:
+        assert {column['name'] for column in inspector.get_columns(table.name)} == set(table.columns.keys())
+        indexes = {index['name']: index['unique'] for index in inspector.get_indexes(table.name)}
+        assert {index.name: bool(index.unique) for index in table.indexes}.items() <= indexes.items()
+
+
+def test_upgrade_with_duplicated_users(caplog):
+    engine = create_engine('sqlite://')
+    with engine.begin() as connection:
+        connection.execute(text('CREATE TABLE users (id INTEGER PRIMARY KEY, name VARCHAR(30), age INTEGER, '
+                                'username VARCHAR(30), email VARCHAR(30), hashed_password VARCHAR(50), '
+                                'is_admin BOOLEAN)'))
+        connection.execute(text("INSERT INTO users (name, age, username, email, hashed_password) VALUES "
+                                "('a', 20, 'bob', 'a@example.com', 'x'), ('b', 30, 'bob', 'b@example.com', 'x')"))
+    upgrade(engine)
+    indexes = {index['name']: index['unique'] for index in inspect(engine).get_indexes('users')}
+    assert indexes == {'ix_users_username': False, 'ix_users_email': True}
+    assert "duplicated (username), for example [('bob',)]" in caplog.text
+
+
+def test_concurrent_upgrades_apply_migrations_once(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'concurrent.db'}", connect_args={'timeout': 30})
+    results, errors = [], []
+
+    def run():
+        try:
+            results.append(upgrade(engine))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert sorted(results, key=len) == [[], [], [], [func.__name__ for func in MIGRATIONS]]
+
+
+def test_catalogue_versions_are_seeded(engine):
+    with engine.begin() as connection:
+        bump(connection, {'films'})
+        rows = connection.execute(select(catalogue_versions.c.namespace, catalogue_versions.c.version)
+                                  .order_by(catalogue_versions.c.namespace)).all()
+    assert [tuple(row) for row in rows] == [('actors', 0), ('films', 1), ('halls', 0)]
+
+
+@pytest.mark.parametrize(
+    "query, index",
+    [
+        ("SELECT seat FROM tickets WHERE session_id = 1", "ix_tickets_session_seat"),
+        ("SELECT * FROM tickets WHERE user_id = 1 ORDER BY id", "ix_tickets_user_id"),
+        ("SELECT * FROM sessions WHERE started_at >= '2030-01-01'", "ix_sessions_started_at"),
+        ("SELECT * FROM sessions WHERE hall_id = 1 AND started_at < '2030-01-01'", "ix_sessions_hall_started"),
+        ("SELECT * FROM sessions WHERE film_id = 1", "ix_sessions_film_id"),
+        ("SELECT * FROM films WHERE genre = 'drama'", "ix_films_genre"),
+        ("SELECT * FROM films WHERE name = 'Uncharted'", "ix_films_name"),
+        ("SELECT * FROM films WHERE director = 'Nolan'", "ix_films_director"),
+        ("SELECT * FROM users WHERE username = 'bob'", "ix_users_username"),
+        ("SELECT * FROM users WHERE email = 'bob@example.com'", "ix_users_email"),
+        ("SELECT * FROM revoked_tokens WHERE jti = 'abc'", "ix_revoked_tokens_jti"),
+        ("SELECT films_id FROM association WHERE actors_id = 1", "ix_association_actor_film"),
+    ]
+)
+def test_query_plan_uses_index(engine, query, index):
+    with engine.connect() as connection:
+        plan = ' '.join(row[-1] for row in connection.execute(text('EXPLAIN QUERY PLAN ' + query)))
+    assert index in plan
@@ -0,0 +1,72 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.dialects import postgresql
+
+from app.database.migrations import upgrade
+from app.models import SessionModel, TicketModel
+from app.occupancy import OccupancyReconciler, reconcile
+from app.seat_map import SeatMap
+
+
+def test_reconcile_fixes_drifted_counters():
+    engine = create_engine('sqlite://')
+    upgrade(engine)
+    sessions, tickets = SessionModel.__table__, TicketModel.__table__
+    with engine.begin() as connection:
+        connection.execute(insert(sessions), [
+            {'id': 1, 'started_at': datetime(2040, 1, 1), 'number_seats': 10, 'sold_seats': 0},
+            {'id': 2, 'started_at': datetime(2040, 1, 1), 'number_seats': 9, 'sold_seats': 1},
+            {'id': 3, 'started_at': datetime(2000, 1, 1), 'number_seats': 10, 'sold_seats': 0},
+        ])
+        connection.execute(insert(tickets), [
+            {'seat': 1, 'session_id': 1}, {'seat': 2, 'session_id': 1},
+            {'seat': 1, 'session_id': 2}, {'seat': 1, 'session_id': 3},
+        ])
+
+    assert OccupancyReconciler(engine).run_once() == 1
+    with engine.connect() as connection:
+        rows = connection.execute(select(sessions.c.id, sessions.c.number_seats, sessions.c.sold_seats)
+                                  .order_by(sessions.c.id)).all()
+    assert [tuple(row) for row in rows] == [(1, 8, 2), (2, 9, 1), (3, 10, 0)]
+
+    with engine.begin() as connection:
+        assert reconcile(connection) == 1
+        assert reconcile(connection) == 0
+
+
+def test_reconcile_skips_locked_sessions():
+    statements = []
+
+    class Connection(object):
+        def execute(self, statement):
+            statements.append(statement)
+            return SimpleNamespace(scalars=lambda: SimpleNamespace(all=list), all=list)
+
+    assert reconcile(Connection()) == 0
+    assert len(statements) == 2
+    for statement in statements:
+        assert 'FOR UPDATE SKIP LOCKED' in str(statement.compile(dialect=postgresql.dialect()))
+
+
+def test_reconcile_resets_stale_seat_maps():
+    engine = create_engine('sqlite://')
+    upgrade(engine)
+    sessions, tickets = SessionModel.__table__, TicketModel.__table__
+    with engine.begin() as connection:
+        connection.execute(insert(sessions), [
+            {'id': 1, 'started_at': datetime(2040, 1, 1), 'number_seats': 8, 'sold_seats': 2,
+             'seat_map': SeatMap.from_seats([1]).to_bytes()},
+            {'id': 2, 'started_at': datetime(2040, 1, 1), 'number_seats': 9, 'sold_seats': 1,
+             'seat_map': SeatMap.from_seats([1]).to_bytes()},
+        ])
+        connection.execute(insert(tickets), [
+            {'seat': 1, 'session_id': 1}, {'seat': 2, 'session_id': 1}, {'seat': 1, 'session_id': 2},
+        ])
+
+    assert OccupancyReconciler(engine).run_once() == 1
+    with engine.connect() as connection:
+        rows = connection.execute(select(sessions.c.id, sessions.c.sold_seats, sessions.c.seat_map)
+                                  .order_by(sessions.c.id)).all()
+    assert [tuple(row) for row in rows] == [(1, 2, None), (2, 1, SeatMap.from_seats([1]).to_bytes())]
@@ -0,0 +1,67 @@
+import threading
+import time
+import uuid
+
+from app.search import SearchIndex, tokenize
+
+
+def test_tokenize():
+    assert tokenize("The Dark Knight: Rises!") == ['the', 'dark', 'knight', 'rises']
+    assert tokenize(None) == []
+
+
+def test_search_films_and_sessions(client, app, authentication_headers):
+    headers = authentication_headers(is_admin=True)
+    hall_id = client.post('/halls', json={'name': 'search', 'capacity': 30}, headers=headers).json['id']
+    # every run searches for its own director, films of earlier runs don't match
+    tag = f'q{uuid.uuid4().hex[:8]}'
+    film = {'genre': 'Thriller', 'director': f'Quentin {tag}', 'rating': 7, 'image': "test"}
+    first_id = client.post('/films', json=dict(film, name='Xylophone Nights'), headers=headers).json['id']
+    second_id = client.post('/films', json=dict(film, name='Quiet Xylo', rating=9), headers=headers).json['id']
+    session_id = client.post('/sessions', json={'film_id': first_id, 'hall_id': hall_id,
+                                                'started_at': "2040-10-01 10:00:00"}, headers=headers).json['id']
+
+    resp = client.get(f'/search?q=xylophone {tag}', headers=headers)
+    assert [film['id'] for film in resp.json['films']] == [first_id]
+    assert [sess['film_id'] for sess in resp.json['sessions']] == [first_id]
+
+    resp = client.get(f'/search?q=XYLO {tag.upper()}', headers=headers)
+    assert [film['id'] for film in resp.json['films']] == [second_id, first_id]
+
+    client.patch(f'/films/{second_id}', json={'name': 'Loud Drums'}, headers=headers)
+    resp = client.get(f'/search?q=xylo {tag}', headers=headers)
+    assert [film['id'] for film in resp.json['films']] == [first_id]
+
+    assert client.get('/search?q=', headers=headers).status_code == 400
+    for limit in (0, -1, 'x'):
+        assert client.get(f'/search?q=xylo&limit={limit}', headers=headers).status_code == 400
+
+    # session and ticket tests count on the ids that follow the rows they created
+    client.delete(f'/sessions/{session_id}', headers=headers)
+    for film_id in (first_id, second_id):
+        client.delete(f'/films/{film_id}', headers=headers)
+    client.delete(f'/halls/{hall_id}', headers=headers)
+
+
+def test_search_index_rebuilds_in_background(monkeypatch):
+    index = SearchIndex(rebuild_interval=0.01)
+    loaded_by = []
+
+    def load():
+        loaded_by.append(threading.current_thread().name)
+        index._built_at = time.monotonic()
+
+    monkeypatch.setattr(index, '_load', load)
+    monkeypatch.setattr(index, '_refresh', lambda: None)
+    index.search('first')
+    index.start()
+    try:
+        deadline = time.monotonic() + 5
+        while len(loaded_by) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        index.search('again')
+    finally:
+        index.stop()
+    assert loaded_by[0] == threading.current_thread().name
+    assert len(loaded_by) >= 2
+    assert set(loaded_by[1:]) == {'search-index-rebuild'}
@@ -0,0 +1,42 @@
+import pytest
+
+from app.seat_map import SeatMap
+
+
+def test_seat_map_take_and_release():
+    seat_map = SeatMap()
+    seat_map.take(3)
+    seat_map.take(17)
+    assert seat_map.is_taken(3)
+    assert not seat_map.is_taken(4)
+    seat_map.release(3)
+    assert not seat_map.is_taken(3)
+    assert seat_map.taken() == [17]
+
+
+def test_seat_map_free_seats():
+    seat_map = SeatMap.from_seats([1, 2, 10])
+    assert seat_map.count() == 3
+    assert seat_map.free(12) == [3, 4, 5, 6, 7, 8, 9, 11, 12]
+
+
+def test_seat_map_roundtrip():
+    seat_map = SeatMap.from_seats(range(1, 20))
+    assert SeatMap(seat_map.to_bytes()).taken() == list(range(1, 20))
+    assert SeatMap(seat_map.to_bytes()).free(20) == [20]
+
+
+def test_seat_map_adjacent_seats():
+    seat_map = SeatMap.from_seats([4, 5, 6, 9])
+    assert seat_map.adjacent(2, 10) == [7, 8]
+    assert seat_map.adjacent(3, 10) == [1, 2, 3]
+    assert seat_map.adjacent(5, 10) is None
+    assert SeatMap().adjacent(4, 20) == [9, 10, 11, 12]
+
+
+def test_seat_map_take_rejects_seats_below_one():
+    seat_map = SeatMap()
+    for seat in (0, -1):
+        with pytest.raises(ValueError):
+            seat_map.take(seat)
+    assert seat_map.taken() == []
@@ -1,3 +1,12 @@
+import re
+import threading
+import uuid
+from datetime import datetime
+
+from app.models import ActorModel, FilmModel, session
+from app.scheduling import ScheduleConflictError, schedule_session
+
+
 def test_get_films_if_not_exist(client, app, authentication_headers):
     resp = client.get(
         '/sessions',
@@ -47,3 +56,213 @@ def test_session_filter_film_name(client, app, authentication_headers):
         headers=authentication_headers(is_admin=True)
     )
     assert resp.json[0]['film_id'] == 1
+
+
+def test_session_filters_combined(client, app, authentication_headers):
+    resp = client.get(
+        '/sessions?film_name=Uncharted&genre=NotEXIST&sort=True',
+        headers=authentication_headers(is_admin=True)
+    )
+    assert resp.json == []
+
+
+def test_session_pagination_fail(client, app, authentication_headers):
+    resp = client.get(
+        '/sessions?limit=ten',
+        headers=authentication_headers(is_admin=True)
+    )
+    assert resp.status_code == 400
+
+
+def test_create_session_uses_film_duration(client, app, authentication_headers, film_session):
+    headers = authentication_headers(is_admin=True)
+    hall_id, film_id, _ = film_session('duration', capacity=50, duration=90)
+
+    def create(started_at):
+        return client.post(
+            '/sessions',
+            json={'film_id': film_id, 'hall_id': hall_id, 'started_at': started_at},
+            headers=headers
+        )
+
+    assert create("2040-01-01 10:00:00").status_code == 201
+    assert create("2040-01-01 11:29:00").status_code == 409
+    assert create("2040-01-01 08:31:00").status_code == 409
+    assert create("2040-01-01 11:30:00").status_code == 201
+    assert create("2040-01-01 08:30:00").status_code == 201
+
+
+def test_create_sessions_bulk(client, app, authentication_headers, film_session):
+    headers = authentication_headers(is_admin=True)
+    hall_id, film_id, _ = film_session('bulk', capacity=40, started_at="2040-02-01 10:00:00", duration=60)
+
+    rows = [
+        {'film_id': film_id, 'hall_id': hall_id, 'started_at': "2040-02-01 12:00:00"},
+        {'film_id': film_id, 'hall_id': hall_id, 'started_at': "2040-02-01 10:30:00"},
+        {'film_id': film_id, 'hall_id': hall_id, 'started_at': "2040-02-01 12:59:00"},
+        {'film_id': film_id, 'hall_id': 0, 'started_at': "2040-02-01 15:00:00"},
+        {'film_id': film_id, 'hall_id': hall_id, 'started_at': "tomorrow"},
+        {'film_id': film_id, 'hall_id': hall_id, 'started_at': "2040-02-01 13:00:00"},
+    ]
+    response = client.post('/sessions/bulk', json={'sessions': rows}, headers=headers)
+
+    assert response.status_code == 201
+    assert response.json['created'] == 2
+    assert [result['status'] for result in response.json['results']] == \
+        ['created', 'conflict', 'conflict', 'error', 'error', 'created']
+
+
+def test_create_sessions_bulk_atomic(client, app, authentication_headers):
+    headers = authentication_headers(is_admin=True)
+    rows = [
+        {'film_id': 1, 'hall_id': 0, 'started_at': "2040-03-01 10:00:00"},
+    ]
+    response = client.post('/sessions/bulk', json={'sessions': rows, 'atomic': True}, headers=headers)
+
+    assert response.status_code == 400
+    assert response.json['results'][0]['status'] == 'error'
+
+
+def test_schedule_page_cache_is_invalidated(client, app, authentication_headers, film_session):
+    app.config['LOGIN_DISABLED'] = True
+    headers = authentication_headers(is_admin=True)
+    name = f'Scheduled {uuid.uuid4().hex[:8]}'
+    hall_id, film_id, _ = film_session(name)
+    total = schedule_total(client.get('/schedule').data)
+
+    session_id = client.post(
+        '/sessions', json={'film_id': film_id, 'hall_id': hall_id, 'started_at': "2040-08-01 10:00:00"},
+        headers=headers
+    ).json['id']
+    assert schedule_total(client.get('/schedule').data) == total + 1
+    rows = client.get('/schedule/data', query_string={'search[value]': name}).json['data']
+    assert [(row['sess_id'], row['name']) for row in rows] == [(session_id, name)]
+
+    client.delete(f'/sessions/{session_id}', headers=headers)
+    assert schedule_total(client.get('/schedule').data) == total
+    assert client.get('/schedule/data', query_string={'search[value]': name}).json['data'] == []
+
+
+def schedule_total(page):
+    """Number of upcoming sessions rendered into the cached schedule page"""
+    return int(re.search(rb'deferLoading: (\d+)', page).group(1))
+
+
+def test_schedule_datatables_data(client, app, authentication_headers, film_session):
+    app.config['LOGIN_DISABLED'] = True
+    headers = authentication_headers(is_admin=True)
+    prefix = f'Zz{uuid.uuid4().hex[:8]}'
+    hall_id, film_id, _ = film_session(f'{prefix} datatables')
+    session_ids = [client.post('/sessions', json={'film_id': film_id, 'hall_id': hall_id,
+                                                  'started_at': f"2040-09-0{day} 10:00:00"}, headers=headers).json['id']
+                   for day in (1, 2, 3)]
+
+    args = {'draw': 3, 'start': 1, 'length': 5, 'search[value]': f'{prefix.lower()} DATA',
+            'order[0][column]': 1, 'order[0][dir]': 'desc', 'columns[1][data]': 'started_at'}
+    resp = client.get('/schedule/data', query_string=args)
+    assert resp.json['draw'] == 3
+    assert resp.json['recordsFiltered'] == 3
+    assert resp.json['recordsTotal'] >= 3
+    assert [(row['sess_id'], row['started_at']) for row in resp.json['data']] == [
+        (session_ids[1], '2040-09-02 10:00:00'), (session_ids[0], '2040-09-01 10:00:00')]
+
+    resp = client.get('/schedule/data', query_string=dict(args, start=10))
+    assert resp.json['data'] == []
+    assert resp.json['recordsFiltered'] == 3
+    assert client.get('/schedule/data?start=x').status_code == 400
+
+
+def test_film_cast(client, app, authentication_headers):
+    headers = authentication_headers(is_admin=True)
+    film = {'genre': 'test', 'director': 'test', 'rating': 5, 'image': "test"}
+    first_id = client.post('/films', json=dict(film, name='Cast first'), headers=headers).json['id']
+    second_id = client.post('/films', json=dict(film, name='Cast second'), headers=headers).json['id']
+    actor_ids = [client.post('/actors', json={'name': 'Cast', 'surname': f'Member{i}'}, headers=headers).json['id']
+                 for i in range(3)]
+    first = session.get(FilmModel, first_id)
+    first.actors.extend(session.get(ActorModel, actor_id) for actor_id in actor_ids)
+    first.save_to_db()
+
+    resp = client.get(f'/films/{first_id}/actors?limit=2', headers=headers)
+    assert [actor['id'] for actor in resp.json] == actor_ids[:2]
+    resp = client.get(f'/films/{first_id}/actors?after={actor_ids[1]}', headers=headers)
+    assert [actor['id'] for actor in resp.json] == actor_ids[2:]
+    resp = client.get(f'/actors?film_id={first_id}', headers=headers)
+    assert [actor['surname'] for actor in resp.json] == ['Member0', 'Member1', 'Member2']
+
+    resp = client.get(f'/casts?film_ids={first_id},{second_id}', headers=headers)
+    assert [actor['id'] for actor in resp.json[str(first_id)]] == actor_ids
+    assert resp.json[str(second_id)] == []
+    assert client.get('/casts?film_ids=a', headers=headers).status_code == 400
+
+
+def test_create_sessions_bulk_rejects_negative_price(client, app, authentication_headers, film_session):
+    headers = authentication_headers(is_admin=True)
+    hall_id, film_id, _ = film_session('bulk price', capacity=20, duration=60)
+    rows = [
+        {'film_id': film_id, 'hall_id': hall_id, 'started_at': "2040-11-01 10:00:00", 'price': -5},
+        {'film_id': film_id, 'hall_id': hall_id, 'started_at': "2040-11-01 12:00:00", 'price': "7"},
+        {'film_id': film_id, 'hall_id': hall_id, 'started_at': "2040-11-01 14:00:00", 'price': 7.5},
+    ]
+    response = client.post('/sessions/bulk', json={'sessions': rows}, headers=headers)
+
+    assert response.json['created'] == 1
+    results = response.json['results']
+    assert [result['status'] for result in results] == ['error', 'error', 'created']
+    assert results[0] == {'index': 0, 'status': 'error', 'message': '"price" should be a positive number.'}
+
+
+def test_concurrent_scheduling_keeps_hall_free_of_overlaps(client, app, authentication_headers, film_session):
+    headers = authentication_headers(is_admin=True)
+    hall_id, film_id, _ = film_session('concurrent')
+    session.remove()
+    created, conflicts, errors = [], [], []
+
+    def schedule(minute):
+        try:
+            created.append(schedule_session(film_id, hall_id, datetime(2040, 9, 4, 10, minute)).id)
+        except ScheduleConflictError:
+            conflicts.append(minute)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            session.remove()
+
+    threads = [threading.Thread(target=schedule, args=(minute,)) for minute in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert (len(created), len(conflicts)) == (1, 7)
+    for id_ in created:
+        client.delete(f'/sessions/{id_}', headers=headers)
+    client.delete(f'/films/{film_id}', headers=headers)
+    client.delete(f'/halls/{hall_id}', headers=headers)
+
+
+def test_create_sessions_bulk_sees_lengthened_films(client, app, authentication_headers, film_session):
+    headers = authentication_headers(is_admin=True)
+    hall_id, long_id, long_session_id = film_session('lengthened', capacity=20, started_at="2040-12-01 10:00:00",
+                                                     duration=30)
+    film_id = client.post(
+        '/films',
+        json={'name': 'lengthened', 'genre': 'test', 'director': 'test', 'rating': 5, 'image': "test", 'duration': 30},
+        headers=headers
+    ).json['id']
+    film_ids = [long_id, film_id]
+    session_ids = [long_session_id, client.post(
+        '/sessions', json={'film_id': film_id, 'hall_id': hall_id, 'started_at': "2040-12-01 11:00:00"}, headers=headers
+    ).json['id']]
+    client.patch(f'/films/{film_ids[0]}', json={'duration': 240}, headers=headers)
+
+    rows = [{'film_id': film_ids[1], 'hall_id': hall_id, 'started_at': "2040-12-01 12:00:00"}]
+    response = client.post('/sessions/bulk', json={'sessions': rows}, headers=headers)
+
+    assert response.json['results'][0] == \
+        {'index': 0, 'status': 'conflict', 'message': f'Hall is busy with session {session_ids[0]}'}
+    for id_ in session_ids:
+        client.delete(f'/sessions/{id_}', headers=headers)
+    for id_ in film_ids:
+        client.delete(f'/films/{id_}', headers=headers)
+    client.delete(f'/halls/{hall_id}', headers=headers)
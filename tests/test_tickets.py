@@ -1,4 +1,9 @@
-from app.models import SessionModel, TicketModel, session
+import threading
+import uuid
+
+from app.booking import buy_seats
+from app.models import SessionModel, TicketModel, UserModel, session
+from tests.conftest import ADMIN_TEST_USERNAME
 
 
 def test_free_seats(client, app, authentication_headers):
@@ -32,24 +37,22 @@ def test_buy_ticket(client, app, authentication_headers):
     resp = client.post(
         '/tickets',
         json={
-            'seat': 75,
-            'user_id': 1,
+            'seat': 45,
             'session_id': 2
         }, headers=authentication_headers(is_admin=True)
     )
-    assert resp.json['seat'] == 75
+    assert resp.json['seat'] == 45
 
 
 def test_seat_not_allowed(client, app, authentication_headers):
     resp = client.post(
         '/tickets',
         json={
-            'seat': 75,
-            'user_id': 1,
+            'seat': 45,
             'session_id': 2
         }, headers=authentication_headers(is_admin=True)
     )
-    assert resp.json['Please, choose another seat. Places that are not available'] == [75]
+    assert resp.json['Please, choose another seat. Places that are not available'] == [45]
 
 
 def test_no_seats_available(client, app, authentication_headers):
@@ -61,9 +64,164 @@ def test_no_seats_available(client, app, authentication_headers):
     resp = client.post(
         '/tickets',
         json={
-            'seat': 75,
-            'user_id': 1,
+            'seat': 45,
             'session_id': 2
         }, headers=authentication_headers(is_admin=True)
     )
     assert resp.json['message'] == "Sorry,but there are no more tickets available for this session"
+
+
+def test_export_tickets_csv(client, app, authentication_headers):
+    headers = dict(authentication_headers(is_admin=True), Accept='text/csv')
+    resp = client.get('/tickets', headers=headers)
+    assert resp.mimetype == 'text/csv'
+    assert resp.data.decode().splitlines()[0] == 'id,seat,user_id,session_id'
+
+
+def test_buy_group_tickets(client, app, authentication_headers, film_session):
+    headers = authentication_headers(is_admin=True)
+    _, _, session_id = film_session('group', capacity=10, started_at="2040-04-01 10:00:00")
+
+    resp = client.post('/tickets/group', json={'seats': [4, 5, 6], 'session_id': session_id}, headers=headers)
+    assert resp.status_code == 201
+    assert [ticket['seat'] for ticket in resp.json['tickets']] == [4, 5, 6]
+
+    resp = client.post('/tickets/group', json={'count': 3, 'session_id': session_id}, headers=headers)
+    assert [ticket['seat'] for ticket in resp.json['tickets']] == [7, 8, 9]
+
+    resp = client.post('/tickets/group', json={'seats': [1, 6], 'session_id': session_id}, headers=headers)
+    assert resp.status_code == 409
+    resp = client.post('/tickets/group', json={'count': 4, 'session_id': session_id}, headers=headers)
+    assert resp.status_code == 409
+
+    resp = client.get(f'/free_seats/{session_id}', headers=headers)
+    assert resp.json['Available seats for this session'] == [1, 2, 3, 10]
+
+
+def test_hold_api(client, app, authentication_headers, film_session):
+    headers = authentication_headers(is_admin=True)
+    _, _, session_id = film_session('holds', capacity=6, started_at="2040-05-01 10:00:00")
+
+    resp = client.post('/holds', json={'count': 2, 'session_id': session_id}, headers=headers)
+    assert resp.status_code == 201
+    assert resp.json['seats'] == [3, 4]
+    hold_id = resp.json['id']
+
+    resp = client.get(f'/free_seats/{session_id}', headers=headers)
+    assert resp.json['Available seats for this session'] == [1, 2, 5, 6]
+    # the user comes from the access token, not from the body
+    username = f'holds-{uuid.uuid4().hex}@example.com'
+    other_token = client.post('/auth/registration', json={
+        'name': 'holds', 'age': 18, 'username': username, 'password': 'holds', 'email': username
+    }).json['access_token']
+    other_headers = {'Authorization': f'Bearer {other_token}'}
+    resp = client.post('/tickets', json={'seat': 3, 'user_id': 1, 'session_id': session_id}, headers=other_headers)
+    assert resp.json['Please, choose another seat. Places that are not available'] == [3, 4]
+    assert client.delete(f'/holds/{hold_id}', headers=other_headers).status_code == 404
+    resp = client.post('/tickets', json={'seat': 3, 'session_id': session_id}, headers=headers)
+    assert resp.status_code == 201
+    admin_id = UserModel.find_id_by_username(ADMIN_TEST_USERNAME)
+    assert session.get(TicketModel, resp.json['id']).user_id == admin_id
+
+    assert client.delete(f'/holds/{hold_id}', headers=headers).status_code == 200
+    assert client.delete(f'/holds/{hold_id}', headers=headers).status_code == 404
+    resp = client.get(f'/free_seats/{session_id}', headers=headers)
+    assert resp.json['Available seats for this session'] == [1, 2, 4, 5, 6]
+
+
+def test_sales_analytics(client, app, authentication_headers, film_session):
+    headers = authentication_headers(is_admin=True)
+    hall_id, film_id, session_id = film_session('analytics', capacity=8, started_at="2040-06-01 10:00:00", price=5)
+    client.post('/tickets/group', json={'count': 2, 'session_id': session_id}, headers=headers)
+    session_id = client.post(
+        '/sessions', json={'film_id': film_id, 'hall_id': hall_id, 'started_at': "2040-06-02 10:00:00", 'price': 10},
+        headers=headers
+    ).json['id']
+    client.post('/tickets/group', json={'count': 2, 'session_id': session_id}, headers=headers)
+
+    resp = client.get(f'/analytics/sales?group_by=film&film_id={film_id}', headers=headers)
+    assert resp.json == [{'film_id': film_id, 'film': 'analytics', 'sessions': 2, 'sold': 4, 'capacity': 16,
+                          'occupancy': 25.0, 'revenue': 30.0}]
+    resp = client.get(f'/analytics/sales?group_by=day&film_id={film_id}&from=2040-06-02', headers=headers)
+    assert resp.json == [{'day': '2040-06-02', 'sessions': 1, 'sold': 2, 'capacity': 8,
+                          'occupancy': 25.0, 'revenue': 20.0}]
+    assert client.get('/analytics/sales?group_by=month', headers=headers).status_code == 400
+
+    resp = client.get(f'/sold_tickets/{film_id}', headers=headers)
+    assert resp.json['Sold tickets for this film'] == 4
+
+
+def test_deleted_ticket_returns_seat(client, app, authentication_headers, film_session):
+    headers = authentication_headers(is_admin=True)
+    _, _, session_id = film_session('occupancy', capacity=5, started_at="2040-07-01 10:00:00")
+    tickets = client.post('/tickets/group', json={'seats': [1, 2], 'session_id': session_id},
+                          headers=headers).json['tickets']
+    assert SessionModel.find_seats(session_id)[:2] == (3, 2)
+
+    TicketModel.delete_by_id(tickets[0]['id'])
+    assert SessionModel.find_seats(session_id)[:2] == (4, 1)
+    resp = client.get(f'/free_seats/{session_id}', headers=headers)
+    assert resp.json['Available seats for this session'] == [1, 3, 4, 5]
+
+
+def test_buy_ticket_invalid_seat(client, app, authentication_headers, film_session):
+    headers = authentication_headers(is_admin=True)
+    _, _, session_id = film_session('invalid seats', capacity=20, started_at="2040-09-01 10:00:00")
+
+    for seat in (500, 21, -1, "7", 2.5):
+        resp = client.post('/tickets', json={'seat': seat, 'session_id': session_id}, headers=headers)
+        assert resp.status_code == 400
+    number_seats, sold_seats, seat_map = SessionModel.find_seats(session_id)
+    assert (number_seats, sold_seats, seat_map.taken()) == (20, 0, [])
+    resp = client.post('/tickets', json={'seat': 20, 'session_id': session_id}, headers=headers)
+    assert resp.status_code == 201
+
+
+def test_buy_group_tickets_outside_hall(client, app, authentication_headers, film_session):
+    headers = authentication_headers(is_admin=True)
+    _, _, session_id = film_session('group outside', capacity=20, started_at="2040-09-02 10:00:00")
+
+    for seats in ([900, 901], [19, 20, 21]):
+        resp = client.post('/tickets/group', json={'seats': seats, 'session_id': session_id}, headers=headers)
+        assert resp.status_code == 400
+        resp = client.post('/holds', json={'seats': seats, 'session_id': session_id}, headers=headers)
+        assert resp.status_code == 400
+    number_seats, sold_seats, seat_map = SessionModel.find_seats(session_id)
+    assert (number_seats, sold_seats, seat_map.taken()) == (20, 0, [])
+    resp = client.post('/tickets/group', json={'seats': [19, 20], 'session_id': session_id}, headers=headers)
+    assert resp.status_code == 201
+
+
+def test_concurrent_purchases_keep_seat_map(client, app, film_session):
+    _, _, session_id = film_session('concurrent', capacity=30, started_at="2040-09-03 10:00:00")
+    user_id = UserModel.find_id_by_username(ADMIN_TEST_USERNAME)
+    session.remove()
+    errors = []
+
+    def buy(seat):
+        try:
+            buy_seats(session_id, user_id, [seat])
+        except Exception as e:
+            errors.append(e)
+        finally:
+            session.remove()
+
+    threads = [threading.Thread(target=buy, args=(seat,)) for seat in range(1, 21)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    number_seats, sold_seats, seat_map = SessionModel.find_seats(session_id)
+    assert (number_seats, sold_seats, seat_map.taken()) == (10, 20, list(range(1, 21)))
+
+
+def test_my_tickets_of_user_named_differently(client, app):
+    username = f'mytickets-{uuid.uuid4().hex}@example.com'
+    token = client.post('/auth/registration', json={
+        'name': 'John Doe', 'age': 18, 'username': username, 'password': 'mytickets', 'email': username
+    }).json['access_token']
+    resp = client.get('/mytickets', headers={'Authorization': f'Bearer {token}'})
+
+    assert resp.status_code == 200
+    assert resp.json == []
@@ -1,3 +1,5 @@
+import json
+
 import pytest
 
 
@@ -97,3 +99,31 @@ def test_update_user_fail(client, app, authentication_headers, current_str, expe
         headers=authentication_headers(is_admin=True)
     )
     assert resp.json['message'] == expected_str
+
+
+def test_export_users_ndjson(client, app, authentication_headers):
+    resp = client.get(
+        '/users?format=ndjson',
+        headers=authentication_headers(is_admin=True)
+    )
+    assert resp.mimetype == 'application/x-ndjson'
+    users = [json.loads(line) for line in resp.data.decode().splitlines()]
+    assert users and all('hashed_password' not in user for user in users)
+
+
+def test_export_users_json_array(client, app, authentication_headers):
+    headers = authentication_headers(is_admin=True)
+    resp = client.get('/users?format=json', headers=headers)
+    assert 'Content-Length' not in resp.headers
+    assert resp.json and all('hashed_password' not in user for user in resp.json)
+    resp = client.get('/users?limit=1', headers=dict(headers, Accept='application/json'))
+    assert 'Content-Disposition' not in resp.headers
+    assert len(resp.json) == 1
+
+
+def test_export_unknown_format(client, app, authentication_headers):
+    resp = client.get(
+        '/users?format=xml',
+        headers=authentication_headers(is_admin=True)
+    )
+    assert resp.status_code == 400